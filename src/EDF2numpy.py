@@ -28,8 +28,17 @@ This code illustrates how to utilize the functions of the EDFACCESSwraper.py to
 To utilize the code one must first install the EyeLink Developers Kit:https://www.sr-research.com/support/thread-13.html and will also need to install numpy for you python environment: https://numpy.org/install/
 """
 
-import os, sys
+import os, re
+from collections import namedtuple
+from types import MappingProxyType
 from EDFACCESSwrapper import *
+from EDF2numpyMessages import MessageArray, concatenateMessages
+from EDF2numpyIndex import openIndex, tableElementTypes
+from EDF2numpyCapture import EDF2numpyCapture, openCapture, loadCapture
+from EDF2numpyResult import EDF2numpyResult
+from EDF2numpyDebug import DEBUG_BUFFER_SIZE, BinaryDebugFile, formatRows, formatGroup, groupOrder
+from EDF2numpyProgress import ProgressTracker, printProgress
+from EDF2numpyProfile import ElementProfiler
 try:
     import numpy as np
 except ModuleNotFoundError as e:
@@ -83,6 +92,56 @@ PARSEDBY_GAZE = int(0x00C0)
 PARSEDBY_HREF = int(0x0080)
 PARSEDBY_RAW = int(0x0040)
 ##-----------------------------------------------------
+# names written to EVENTdata['eventType'] for each parser event type
+eventNames = {STARTBLINK:'STARTBLINK', ENDBLINK:'ENDBLINK', STARTSACC:'STARTSACC', ENDSACC:'ENDSACC', STARTFIX:'STARTFIX', ENDFIX:'ENDFIX', FIXUPDATE:'FIXUPDATE'}
+# names written to IOEVENTdata['ioEventType'] for each IO event type
+ioEventNames = {BUTTONEVENT:'BUTTONEVENT', INPUTEVENT:'INPUTEVENT'}
+# schema attribute of each table
+tableTypes = {'RECORDINGS':'RECORDINGStype', 'MESSAGES':'MESSAGETtype', 'SAMPLES':'SAMPLEtype', 'EVENTS':'EVENTtype', 'IOEVENTS':'IOEVENTtype'}
+##-----------------------------------------------------
+## Dictionary-encoded columns, see categorical_columns_enabled
+# values of the dictionary-encoded columns of each table. A column holds the position of its value in the list as a CODE_TYPE
+# integer, or MISSING_CODE if the value is missing
+categories = {
+    'EVENTS': {'eventType': list(eventNames.values()), 'eyeTracked': EyesTracked, 'gazeType': parseType},
+    'RECORDINGS': {'eyeTracked': EyesTracked, 'pupilDataType': pupilData, 'trackerState': recState, 'recordType': dataTypes,
+        'parsedbyType': parseType, 'filterType': filterType, 'recordingMode': trackMode},
+    'IOEVENTS': {'ioEventType': list(ioEventNames.values())}}
+CODE_TYPE = 'i1'        # numpy type of a dictionary-encoded column
+MISSING_CODE = -1       # code of a missing value
+# code of each parser event type in EVENTdata['eventType'], indexed by the EDF data type
+eventCodes = np.full(max(eventNames) + 1, MISSING_CODE, dtype=CODE_TYPE)
+eventCodes[list(eventNames)] = np.arange(len(eventNames))
+# code of each posType in RECORDINGdata['parsedbyType']
+parsedbyCodes = {PARSEDBY_RAW:0, PARSEDBY_HREF:1, PARSEDBY_GAZE:2}
+# data array, record counter and first row index attributes of each table streamed by iterBatches()
+batchTables = {'RECORDINGS':('RECORDINGdata','recCount','recBase'), 'MESSAGES':('MESSAGEdata','msgCount','msgBase'), 'SAMPLES':('SAMPLEdata','sampleCount','sampleBase'),
+    'EVENTS':('EVENTdata','eventCount','eventBase'), 'IOEVENTS':('IOEVENTdata','IOCount','IOBase')}
+# tables that are written straight into .npy files when options['memmap_output_dir'] is set
+memmapTables = ['SAMPLES','EVENTS']
+# tables narrowed to the columns in options['output_columns']
+projectionTables = ['SAMPLES','EVENTS']
+# parser event types that carry end of event data
+endEventTypes = [ENDBLINK,ENDFIX,ENDSACC,FIXUPDATE]
+# EDF data types that decodeElements() skips without counting them in the elementIndex column
+uncountedTypes = [STARTPARSE,ENDPARSE,BREAKPARSE,STARTSAMPLES,ENDSAMPLES,STARTEVENTS,ENDEVENTS]
+# the option that enables each data array
+tableOptions = {'RECORDINGS':'recinfo_enabled','MESSAGES':'messages_enabled','SAMPLES':'samples_enabled','EVENTS':'events_enabled','IOEVENTS':'ioevents_enabled'}
+##-----------------------------------------------------
+## Decode plan - see EDF2numpy.compileDecodePlan()
+# One output column: the destination column, the source field in the raw structure ('gx.left' reads block['gx']['left'],
+# 'entime-sttime' the difference of two fields), the value written when there is no source or a row is masked out,
+# and the name of the row mask ('selected', 'end' or 'headTarget') that chooses which rows copy the source.
+DecodeStep = namedtuple('DecodeStep', ['column','source','fill','mask'])
+# The options compiled once per file: the EDF data types that are decoded, the steps of each output table and the
+# remaining settings used while decoding.
+DecodePlan = namedtuple('DecodePlan', ['elementTypes','SAMPLE','EVENT','MESSAGE','IOEVENT','RECORDING','settings'])
+##-----------------------------------------------------
+## Element filters - see EDF2numpy.compileFilters()
+# The predicates of readFiltered(), tested on the raw elements before they are decoded. A predicate that is None keeps
+# every element: the time window in milliseconds, the set of parser event types, the eye index of the events and the
+# compiled bytes pattern searched in the message text.
+ElementFilter = namedtuple('ElementFilter', ['startTime','endTime','eventTypes','eye','messagePattern'])
 
 ##--------------------------------------------------------------------------------------------------------------------------------
 ## EDF2numpy functions
@@ -90,9 +149,13 @@ PARSEDBY_RAW = int(0x0040)
 class EDF2numpy:
     """
     This class wraps the functions defined in EDFACCESSwrapper.py to extract the data from an EDF file into a series of structured Numpy arrays.
+    An instance converts one file at a time. To convert files concurrently on threads give each thread its own instance, the
+    instances can share one EDFACCESSwrapper as every open file has its own EDFfile handle.
+    Parameters
+        Edfwrapper = optional EDFACCESSwrapper with the API already loaded. A new one is created if None.
     """
-    def __init__(self):
-        self.Edfwrapper = EDFACCESSwrapper()        # import EDFAccess wrapper DDL/class
+    def __init__(self, Edfwrapper=None):
+        self.Edfwrapper = EDFACCESSwrapper() if Edfwrapper == None else Edfwrapper  # import EDFAccess wrapper DDL/class
         self.EDFData = None                         # pointer for EDF file
         self.errmsg = None                          # holder for exceptions
         self.CurrentEyeTracked = 0                  # The eye currently being tracked based on the RecordINFO
@@ -103,7 +166,29 @@ class EDF2numpy:
         self.IOCount = 0                            # number of button events detected
         self.recCount = 0                           # number of start recordings events detected
         self.trialCount = 0                         # number of trials detected in the file
+        self.trials = []                            # (start time, end time) of each trial of the file streamed by iterBatches()
         self.debugfile = None                       # place holder for debug file handle
+        self.debugGroup = None                      # (rows, EDF buffer indexes) of the sample and event blocks decoded together, see flushStaging()
+        self.sampleBlockSize = 4096                 # number of raw samples staged before they are decoded in bulk
+        self.sampleStaging = None                   # staging block of raw FSAMPLE structures
+        self.sampleStagingElements = None           # EDF buffer index of each staged sample
+        self.stagedSamples = 0                      # number of samples waiting in the staging block
+        self.eventBlockSize = 1024                  # number of raw events staged before they are decoded in bulk
+        self.eventStaging = None                    # staging block of raw FEVENT structures
+        self.eventStagingTypes = None               # EDF data type of each staged event
+        self.eventStagingElements = None            # EDF buffer index of each staged event
+        self.stagedEvents = 0                       # number of events waiting in the staging block
+        self.decodePlan = None                      # options compiled by compileDecodePlan(), used by every decode path
+        self.decodeTables = None                    # names of the data arrays that are read, None for every array enabled in options (see EDF2numpyResult)
+        self.index = None                           # EDF2numpyIndex of the file being read, see loadIndex()
+        self.progress = ProgressTracker()           # phase timings of the last read, set progress.callback to receive ProgressEvents (see EDF2numpyProgress)
+        self.profiler = None                        # ElementProfiler of the last read when profile_enabled is set (see EDF2numpyProfile)
+        self.sampleBase = 0                         # sample index of the first row of SAMPLEdata, only moves while streaming with iterBatches()
+        self.eventBase = 0                          # event index of the first row of EVENTdata
+        self.msgBase = 0                            # message index of the first row of MESSAGEdata
+        self.IOBase = 0                             # IO event index of the first row of IOEVENTdata
+        self.recBase = 0                            # recording index of the first row of RECORDINGdata
+        self.messageHeap = bytearray()              # UTF-8 text of the messages of MESSAGEdata when compact_messages_enabled is set
         self.options = {
             'output_left_eye': 1,                   # 0 = Left eye data disabled;       1 = Left eye data enabled
             'output_right_eye': 1,                  # 0 = Right eye data disabled;      1 = Right eye data enabled
@@ -117,6 +202,18 @@ class EDF2numpy:
             'output_data_pupilsize': 1,             # 0 = Pupil Data disabled;          1 = Pupil Data enabled
             'output_data_debugflags': 1,            # 0 = Flag Data disabled;           1 = Flag Data enabled
             'output_dataviewer_commands': 1,        # 0 = Mask DV commands from output  1 = Include DV commands in output
+            'single_pass_enabled': 1,               # 0 = Open the EDF twice (count, then read); 1 = Open the EDF once and rewind with a bookmark
+            'memmap_output_dir': '',                # '' = Keep SAMPLEdata and EVENTdata in memory;  a directory = write them to SAMPLES.npy and EVENTS.npy in that directory
+            'compact_messages_enabled': 0,          # 0 = Fixed-width message column;  1 = Message text in one UTF-8 heap (see EDF2numpyMessages)
+            'output_columns': '',                   # '' = All SAMPLEdata and EVENTdata columns;   names separated by spaces = Only these columns, e.g. 'time posXLeft posYLeft pupilSizeLeft'
+            'categorical_columns_enabled': 0,       # 0 = Text columns for event types, eyes and other labels;   1 = Small integer codes, see categories and decodeCategories()
+            'binary_debug_enabled': 0,              # 0 = Text debug file (.debug);   1 = Binary debug file (.debugbin), turned into text with EDF2numpyDebug.debugToText(). Recommended, the text file more than doubles the read time
+            'progress_enabled': 0,                  # 0 = Quiet, progress only goes to progress.callback;   1 = Print the phases of each read and its progress once a second
+            'verbose_enabled': 0,                   # 0 = Quiet;   1 = Print the status lines and the preamble of each read
+            'profile_enabled': 0,                   # 0 = No profiling;   1 = Time each EDF data type in the decode loop, print a summary with verbose_enabled and write <EDF name>.trace.json
+            'capture_enabled': 0,                   # 0 = Read the EDF with the EDF Access API;   1 = Keep a capture of the elements next to the EDF and convert from it (see EDF2numpyCapture)
+            'index_enabled': 0,                     # 0 = Count the records of the EDF on every read;   1 = Keep a sidecar index next to the EDF (see EDF2numpyIndex)
+            'cache_enabled': 0,                     # 0 = Always convert the EDF;       1 = Reuse earlier conversions from the on-disk cache (see EDF2numpyCache)
         #Consistency check toggles
             'enable_consistency_check': 2,          # 0 = consistency check disabled;   1 = enable consistency check and report;       2 = enable consistency check and fix.
             'enable_failsafe': 0,                   # 0 = fail-safe mode disabled;      1 = fail-safe enabled
@@ -263,6 +360,8 @@ class EDF2numpy:
         self.SAMPLEdata = np.empty(1,dtype=self.SAMPLEtype)#: SAMPLEdata Structure
         self.IOEVENTdata = np.empty(1,dtype=self.IOEVENTtype)#: IOEVENTdata Structure
         #MASTERdata = np.array([self.HEADERdata,self.RECORDINGdata,self.MESSAGEdata, self.SAMPLEdata,self.EVENTdata,self.IOEVENTdata],dtype=self.MASTERtype)
+        # compile the default options
+        self.compileDecodePlan()
 ##--------------------------------------------------------------------------------------------------------------------------------
 ## import functions
 ##--------------------------------------------------------------------------------------------------------------------------------
@@ -286,7 +385,7 @@ class EDF2numpy:
                 # break list into attribute and value pairs
                 for i in args:
                     attribute =i.split(':')[0].strip()
-                    value = i.split(':')[1].strip()
+                    value = i.split(':',1)[1].strip()
                     # Check that attribute is a valid option
                     if attribute in self.options:
                         # validate the value contents 
@@ -297,17 +396,23 @@ class EDF2numpy:
                                 updates[attribute]=int(value)
                             else:
                                 print('\n!! Invalid input value assignment: "' + str(i) + '". This option will be ignored!')
-                        elif attribute == 'trial_parse_start' or attribute == 'trial_parse_end' or attribute == 'text_data_type': 
+                        elif attribute == 'trial_parse_start' or attribute == 'trial_parse_end' or attribute == 'text_data_type' or attribute == 'memmap_output_dir' or attribute == 'output_columns': 
                             updates[attribute]=str(value)
+                            if attribute == 'output_columns':
+                                for column in value.split():
+                                    if column not in self.SAMPLEtype.names and column not in self.EVENTtype.names:
+                                        print('\n!! Invalid output column: "' + column + '". This column will be ignored!')
                         else:
                             print('\n!! Invalid input value assignment: "' + str(i) + '". This option will be ignored!')
                     else:
                         print('\n!! Invalid input argument: "' + str(i) + '". This option will be ignored!\n')
-                print('...Updating the following options: '+ str(updates))
                 # Force the updates to override the defaults
                 self.options.update(updates)
+                self.printStatus('...Updating the following options: '+ str(updates))
                 # Encode consistency options into binary form
                 self.combineConsistencyArgs()
+                # Compile the updated options into the decode plan
+                self.compileDecodePlan()
                 return 0
             else:
                 return 0
@@ -321,10 +426,11 @@ class EDF2numpy:
         Parameters
             edfFilename = The path or filename of the EDF you want to open
         Return
-            EDFData = the handle for the EDF data contents
+            EDFData = the EDFfile handle for the EDF data contents
         """
         try:
-            print('...Attempting to Open ' + str(edfFilename)+ "...")
+            self.printStatus('...Attempting to Open ' + str(edfFilename)+ "...")
+            self.progress.start('open')
             if os.path.isfile(edfFilename):
                 if self.options['output_data_debugflags'] ==1:
                     #opening debugging file
@@ -333,9 +439,10 @@ class EDF2numpy:
                     else:
                         self.debugfile = self.openDebugFile(os.path.join(edfFilename +'.debug'))
                 # Open EDF file and read in the data
-                EDFData = self.Edfwrapper.edf_open_file(edfFilename, self.consistencyArgs, self.options['events_enabled'], self.options['samples_enabled']) # read in EDF file
+                EDFData = self.Edfwrapper.openFile(edfFilename, self.consistencyArgs, self.options['events_enabled'], self.options['samples_enabled']) # read in EDF file
                 # Set trial identifiers
                 self.Edfwrapper.edf_set_trial_identifier(EDFData, self.options['trial_parse_start'], self.options['trial_parse_end'])
+                self.progress.end('open')
                 return EDFData
             else:
                 raise Exception(str(edfFilename)+' is not a valid EDF filename')
@@ -352,6 +459,7 @@ class EDF2numpy:
             Returns 0 if the operation is successful..
         """
         try:
+            self.progress.start('close')
             # If there is a debug file open, close it
             if self.debugfile != None:
                 self.closeDebugFile(self.debugfile)
@@ -359,7 +467,9 @@ class EDF2numpy:
             if edfHandle != None:
                 self.Edfwrapper.edf_close_file(edfHandle) # destroy handle
                 self.EDFData = None # clear pointer
+                self.progress.end('close')
                 return 0
+            self.progress.end('close')
         except Exception as e:
             raise Exception('An error has occurred with closeEDF: ' + str(e))
         except:
@@ -378,146 +488,364 @@ class EDF2numpy:
             raise Exception('An error has occurred with combineConsistencyArgs: ' + str(e))
         except:
             raise Exception('An unhandled exception has occurred with combineConsistencyArgs')
-    def prealocateArraySize(self, edfFilename):
+    def compileDecodePlan(self):
+        """
+        Compile self.options into an immutable decode plan so that the decode paths do not look up the options for every record.
+        The plan lists for each output table the source field, fill value and row mask of every column the table copies
+        from the raw records, and the set of EDF data types that are decoded at all.
+        Note: readEDF() compiles the plan again before it reads a file, so changes made directly to self.options are picked up.
+        Return
+            Returns the DecodePlan, which is also stored in self.decodePlan
+        """
+        try:
+            opts = self.options
+            debug = opts['output_data_debugflags'] == 1
+            pupil = opts['output_data_pupilsize'] == 1
+            ppd = opts['output_data_ppd'] == 1
+            velocity = opts['output_data_velocity'] == 1
+            categorical = opts['categorical_columns_enabled'] == 1
+            def step(dtype, column, source, enabled=True, mask=None):
+                # disabled columns are filled with the missing value of their type
+                fill = MISSING_TEXT if dtype[column].kind == 'U' else MISSING_CODE if dtype[column] == CODE_TYPE else MISSING_VALUE
+                return DecodeStep(column, source if enabled else None, fill, mask if enabled else None)
+            #Sample columns for the selected gaze data type and velocity model, the steps are narrowed to options['output_columns'] below
+            S = self.SAMPLEtype
+            gaze = opts['gaze_data_type']
+            posX, posY = [('px','py'),('hx','hY'),('gx','gy')][gaze]
+            if opts['output_samplevel_model_type'] == 1:
+                velX, velY = [('frxvel','fryvel'),('fhxvel','fhyvel'),('fgxvel','fgyvel')][gaze]
+            else:
+                velX, velY = [('rxvel','ryvel'),('hxvel','hyvel'),('gxvel','gyvel')][gaze]
+            head = opts['output_headtargetdata_enabled'] == 1
+            io = opts['ioevents_enabled'] == 1
+            samples = (
+                step(S,'time','time'),
+                step(S,'posXLeft',posX+'.left'),
+                step(S,'posYLeft',posY+'.left'),
+                step(S,'pupilSizeLeft','pa.left',pupil),
+                step(S,'posXRight',posX+'.right'),
+                step(S,'posYRight',posY+'.right'),
+                step(S,'pupilSizeRight','pa.right',pupil),
+                step(S,'PpdX','rx',ppd),
+                step(S,'PpdY','ry',ppd),
+                step(S,'velXLeft',velX+'.left',velocity),
+                step(S,'velYLeft',velY+'.left',velocity),
+                step(S,'velXRight',velX+'.right',velocity),
+                step(S,'velYRight',velY+'.right',velocity),
+                step(S,'headTrackerType','htype',head,'headTarget'),
+                step(S,'headTargetDataX','hdata.targetX',head,'headTarget'),
+                step(S,'headTargetDataY','hdata.targetY',head,'headTarget'),
+                step(S,'headTargetDataZ','hdata.targetDist',head,'headTarget'),
+                step(S,'headTargetDataFlags','hdata.targetFlags',head,'headTarget'),
+                step(S,'inputPortData','inputs',io),
+                step(S,'buttonData','buttons',io),
+                step(S,'flags','flags',debug),
+                step(S,'errors','errors',debug))
+            #Event columns, parsed positions are only available as HREF or GAZE data
+            E = self.outputType('EVENTS',projected=False)
+            parsed = gaze in [1,2]
+            if parsed:
+                startX, startY, endX, endY, avgX, avgY = [('hstx','hsty','henx','heny','havx','havy'),('gstx','gsty','genx','geny','gavx','gavy')][gaze-1]
+            else:
+                startX = startY = endX = endY = avgX = avgY = None
+            start = opts['output_eventtype_start'] == 1
+            end = opts['output_eventtype_end'] == 1
+            events = (
+                DecodeStep('gazeType', None, gaze if categorical else parseType[gaze], None),
+                step(E,'time','entime',end,'end'),
+                step(E,'startTime','sttime',start,'selected'),
+                step(E,'startPosX',startX,start and parsed,'selected'),
+                step(E,'startPosY',startY,start and parsed,'selected'),
+                step(E,'StartPupilSize','sta',start and pupil,'selected'),
+                step(E,'startVEL','svel',start and velocity,'selected'),
+                step(E,'startPPDX','supd_x',start and ppd,'selected'),
+                step(E,'startPPDY','supd_y',start and ppd,'selected'),
+                step(E,'endTime','entime',end,'end'),
+                step(E,'duration','entime-sttime',end,'end'),
+                step(E,'endPosX',endX,end and parsed,'end'),
+                step(E,'endPosY',endY,end and parsed,'end'),
+                step(E,'endPupilSize','ena',end and pupil,'end'),
+                step(E,'endVEL','evel',end and velocity,'end'),
+                step(E,'endPPDX','eupd_x',end and ppd,'end'),
+                step(E,'endPPDY','eupd_y',end and ppd,'end'),
+                step(E,'avgPosX',avgX,end and parsed,'end'),
+                step(E,'avgPosY',avgY,end and parsed,'end'),
+                step(E,'avgPupilSize','ava',end and pupil,'end'),
+                step(E,'avgVEL','avel',end and velocity,'end'),
+                step(E,'peakVEL','pvel',end and velocity,'end'),
+                step(E,'readFlags','read',debug,'selected'),
+                step(E,'flags','flags',debug,'selected'),
+                step(E,'parsedby','parsedby',debug,'selected'),
+                step(E,'status','status',debug,'selected'))
+            #Only decode the columns of the projected tables
+            sampleColumns = frozenset(self.outputType('SAMPLES').names)
+            eventColumns = frozenset(self.outputType('EVENTS').names)
+            samples = tuple([i for i in samples if i.column in sampleColumns])
+            events = tuple([i for i in events if i.column in eventColumns])
+            #Message, IO event and recording columns are read from the ctypes structures
+            messages = (
+                step(self.MESSAGETtype,'time','sttime'),
+                step(self.MESSAGETtype,'messageLength','message.contents.length',debug))
+            ioevents = (
+                step(self.outputType('IOEVENTS'),'time','FEVENT.sttime'),
+                step(self.outputType('IOEVENTS'),'IOData','IOEVENT.data'),
+                step(self.outputType('IOEVENTS'),'iotype','IOEVENT.itype',debug))
+            recordings = (
+                step(self.outputType('RECORDINGS'),'samplingRate','sample_rate'),
+                step(self.outputType('RECORDINGS'),'endflags','eflags',debug),
+                step(self.outputType('RECORDINGS'),'startflags','sflags',debug))
+            #The EDF data types that are decoded, everything else is skipped by readEDF()
+            elementTypes = set()
+            if opts['samples_enabled'] == 1:
+                elementTypes.add(SAMPLE_TYPE)
+            if opts['events_enabled'] == 1:
+                for enabled, startType, endType in [(opts['output_eventtype_blink'],STARTBLINK,ENDBLINK),(opts['output_eventtype_saccade'],STARTSACC,ENDSACC),(opts['output_eventtype_fixation'],STARTFIX,ENDFIX)]:
+                    if enabled == 1 and start:
+                        elementTypes.add(startType)
+                    if enabled == 1 and end:
+                        elementTypes.add(endType)
+                if opts['output_eventtype_fixupdate'] == 1:
+                    elementTypes.add(FIXUPDATE)
+                if opts['messages_enabled'] == 1:
+                    elementTypes.add(MESSAGEEVENT)
+                if io:
+                    elementTypes.update([BUTTONEVENT,INPUTEVENT])
+            if opts['recinfo_enabled'] == 1:
+                elementTypes.add(RECORDING_INFO)
+            if self.decodeTables != None:
+                #Only decode the data types of the arrays that are read, the EDF is still opened with the same options
+                elementTypes &= set([i for table in self.decodeTables for i in tableElementTypes[table]])
+            settings = MappingProxyType({
+                'debug': debug,                                                 # write decoded records to the debug file
+                'leftEye': opts['output_left_eye'] == 1,                        # output events of the left eye
+                'rightEye': opts['output_right_eye'] == 1,                      # output events of the right eye
+                'textEncoding': opts['text_data_type'],                         # encoding of message text
+                'msgOffset': opts['msg_offset_enabled'] == 1,                   # subtract leading integer offsets from message times
+                'maskDataViewer': opts['output_dataviewer_commands'] == 0,      # mask Data Viewer (!V) commands
+                'compactMessages': opts['compact_messages_enabled'] == 1,       # store message text in messageHeap
+                'categorical': categorical,                                     # write codes to the dictionary-encoded columns
+                'sampleColumns': sampleColumns,                                 # columns of SAMPLEdata
+                'eventColumns': eventColumns,                                   # columns of EVENTdata
+                'ioEventTypes': MappingProxyType(dict([(i, categories['IOEVENTS']['ioEventType'].index(ioEventNames[i]) if categorical else ioEventNames[i]) for i in ioEventNames]))})  # ioEventType of each IO event type
+            self.decodePlan = DecodePlan(frozenset(elementTypes), samples, events, messages, ioevents, recordings, settings)
+            return self.decodePlan
+        except Exception as e:
+            raise Exception('An error has occurred with compileDecodePlan: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with compileDecodePlan')
+    def describeDecodePlan(self):
+        """
+        Describe the compiled decode plan, listing where each output column comes from.
+        Return
+            Returns the description as a string
+        """
+        try:
+            plan = self.decodePlan
+            names = {SAMPLE_TYPE:'SAMPLE_TYPE', MESSAGEEVENT:'MESSAGEEVENT', BUTTONEVENT:'BUTTONEVENT', INPUTEVENT:'INPUTEVENT', RECORDING_INFO:'RECORDING_INFO'}
+            names.update(eventNames)
+            lines = ['Decoded data types: ' + ', '.join([names[i] for i in sorted(plan.elementTypes)])]
+            for table in ['SAMPLE','EVENT','MESSAGE','IOEVENT','RECORDING']:
+                lines.append(table + 'data:')
+                for i in getattr(plan, table):
+                    if i.source == None:
+                        lines.append('\t%-20s = %s' % (i.column, repr(i.fill)))
+                    elif i.mask == None:
+                        lines.append('\t%-20s <- %s' % (i.column, i.source))
+                    else:
+                        lines.append('\t%-20s <- %s where %s, else %s' % (i.column, i.source, i.mask, repr(i.fill)))
+            lines.append('Settings: ' + str(dict(plan.settings)))
+            return '\n'.join(lines)
+        except Exception as e:
+            raise Exception('An error has occurred with describeDecodePlan: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with describeDecodePlan')
+    def decodeSource(self,data,source):
+        """
+        Read the source field of a decode step from raw data.
+        Parameters
+            data = A numpy block of raw structures or a ctypes structure from edf_get_float_data()
+            source = The field path of a DecodeStep, e.g. 'gx.left' or 'entime-sttime'
+        Return
+            Returns the field values
+        """
+        if '-' in source:
+            first, second = source.split('-')
+            return np.asarray(self.decodeSource(data,first),dtype='i8') - self.decodeSource(data,second)
+        for i in source.split('.'):
+            data = data[i] if isinstance(data, np.ndarray) else getattr(data, i)
+        return data
+    def applyDecodeSteps(self,output,data,steps,masks=None):
+        """
+        Copy the columns of a decode plan table from raw data into the output rows.
+        Parameters
+            output = The output rows, either a slice of a data array or a single record
+            data = A numpy block of raw structures or a ctypes structure from edf_get_float_data()
+            steps = The DecodeSteps of the output table from self.decodePlan
+            masks = Dictionary of boolean row masks named by the steps
+        Return
+            Returns 0 if the operation is successful.
+        """
+        for i in steps:
+            if i.source == None:
+                output[i.column] = i.fill
+            else:
+                output[i.column] = self.decodeSource(data, i.source)
+                if i.mask != None:
+                    output[i.column][~masks[i.mask]] = i.fill
+        return 0
+    def prealocateArraySize(self, edfFilename, edfHandle=None):
         """
         Resize the data arrays to close to their expected size for better memory management.
+        If an index was loaded by loadIndex() the arrays are sized exactly from it and the records are not counted.
         Note: may over-provision so make sure to trim the arrays afterwards
         Parameters
-            edfFilename = the handle to the EDF data contents generated by openEDF().
+            edfFilename = the path/filename of the EDF you want to extract the contents of.
+            edfHandle = optional handle created by openEDF(). If given the records are counted on this handle, which is
+                then rewound to the start of the file with a bookmark, instead of opening the EDF a second time.
         Return
             Returns 0 if the operation is successful..
         """
         #print('...Allocating data arrays...')
         try:
-            #import data
-            tempData = self.Edfwrapper.edf_open_file(edfFilename, self.consistencyArgs, self.options['events_enabled'],self.options['samples_enabled']) # read in EDF file
-            #set trial identifiers
-            self.Edfwrapper.edf_set_trial_identifier(tempData, self.options['trial_parse_start'], self.options['trial_parse_end'])
-            #initialize counters
-            numberOfElements = self.Edfwrapper.edf_get_element_count(tempData)
-            numberOfSamples = 0
-            numberOfEvents = 0
-            numberOfIOEvents = 0
-            numberOfParseEvents = 0
-            numberOfRecordings = 0
-            numberOfMessages = 0
-            maxStrLength = 0
-            #Get the trial count from the API
-            self.trialCount = self.Edfwrapper.edf_get_trial_count(tempData) 
-            if(self.trialCount%2):
-                print('There are trials not starting or ending properly.\n')
-            # Cycle through buffer to count records
-            while(True):
-                #get current record
-                DataType = self.Edfwrapper.edf_get_next_data(tempData)
-                #check record type and increment counter
-                if DataType == STARTSACC or DataType == STARTBLINK or DataType == STARTFIX or DataType == ENDSACC or DataType == ENDBLINK or DataType == ENDFIX or DataType == FIXUPDATE:
-                    numberOfEvents +=1
-                elif DataType == MESSAGEEVENT:
-                    numberOfMessages +=1
-                    #get the size of the message
-                    strlen = self.Edfwrapper.edf_get_float_data(tempData).FEVENT.message.contents.length
-                    #check if this is the longest message
-                    if strlen>maxStrLength:
-                        #update maximum string length
-                        maxStrLength = strlen
-                        strlen = None
+            self.progress.start('count')
+            if self.index != None:
+                # take the exact number of rows of each array from the index instead of counting the records
+                counts = self.index.tableCounts(self.decodePlan.elementTypes)
+                numberOfElements = self.index.elementCount
+                numberOfSamples = counts['SAMPLES']
+                numberOfEvents = counts['EVENTS']
+                numberOfIOEvents = counts['IOEVENTS']
+                numberOfParseEvents = sum([self.index.counts.get(i, 0) for i in [STARTPARSE,ENDPARSE,BREAKPARSE]])
+                numberOfRecordings = counts['RECORDINGS']
+                numberOfMessages = counts['MESSAGES']
+                maxStrLength = self.index.maxMessageLength
+                self.trialCount = self.index.trialCount
+            else:
+                if edfHandle == None:
+                    #import data
+                    tempData = self.Edfwrapper.openFile(edfFilename, self.consistencyArgs, self.options['events_enabled'],self.options['samples_enabled']) # read in EDF file
+                    #set trial identifiers
+                    self.Edfwrapper.edf_set_trial_identifier(tempData, self.options['trial_parse_start'], self.options['trial_parse_end'])
+                else:
+                    #count the records on the open handle and bookmark the start so we can rewind afterwards
+                    tempData = edfHandle
+                    bookmark = BOOKMARK()
+                    if self.Edfwrapper.edf_set_bookmark(tempData, byref(bookmark)) != 0:
+                        raise Exception('Could not bookmark the start of the EDF file')
+                #initialize counters
+                numberOfElements = self.Edfwrapper.edf_get_element_count(tempData)
+                numberOfSamples = 0
+                numberOfEvents = 0
+                numberOfIOEvents = 0
+                numberOfParseEvents = 0
+                numberOfRecordings = 0
+                numberOfMessages = 0
+                maxStrLength = 0
+                #Get the trial count from the API
+                self.trialCount = self.Edfwrapper.edf_get_trial_count(tempData) 
+                if(self.trialCount%2):
+                    print('There are trials not starting or ending properly.\n')
+                # Cycle through buffer to count records
+                while(True):
+                    #get current record
+                    DataType = self.Edfwrapper.edf_get_next_data(tempData)
+                    #check record type and increment counter (samples first as they are the most common record)
+                    if DataType == SAMPLE_TYPE:
+                        numberOfSamples += 1
+                    elif DataType == STARTSACC or DataType == STARTBLINK or DataType == STARTFIX or DataType == ENDSACC or DataType == ENDBLINK or DataType == ENDFIX or DataType == FIXUPDATE:
+                        numberOfEvents +=1
+                    elif DataType == MESSAGEEVENT:
+                        numberOfMessages +=1
+                        #get the size of the message
+                        strlen = self.Edfwrapper.edf_get_float_data(tempData).FEVENT.message.contents.length
+                        #check if this is the longest message
+                        if strlen>maxStrLength:
+                            #update maximum string length
+                            maxStrLength = strlen
+                            strlen = None
+                        else:
+                            strlen = None
+                    elif DataType == BUTTONEVENT or DataType == INPUTEVENT:
+                        numberOfIOEvents +=1
+                    elif DataType == STARTEVENTS or DataType == ENDEVENTS:
+                        numberOfEvents +=1
+                    elif DataType == STARTSAMPLES or DataType == ENDSAMPLES:
+                        numberOfSamples += 1
+                    elif DataType == RECORDING_INFO:
+                        self.progress.update()
+                        numberOfRecordings +=1
+                    elif DataType == STARTPARSE or DataType == ENDPARSE or DataType == BREAKPARSE:
+                        numberOfParseEvents +=1
+                    elif DataType == NO_PENDING_ITEMS:
+                        break
                     else:
-                        strlen = None
-                elif DataType == BUTTONEVENT or DataType == INPUTEVENT:
-                    numberOfIOEvents +=1
-                elif DataType == STARTEVENTS or DataType == ENDEVENTS:
-                    numberOfEvents +=1
-                elif DataType == SAMPLE_TYPE:
-                    numberOfSamples += 1
-                elif DataType == STARTSAMPLES or DataType == ENDSAMPLES:
-                    numberOfSamples += 1
-                elif DataType == RECORDING_INFO:
-                    sys.stdout.write('. ')
-                    sys.stdout.flush()
-                    numberOfRecordings +=1
-                elif DataType == STARTPARSE or DataType == ENDPARSE or DataType == BREAKPARSE:
-                    numberOfParseEvents +=1
-                elif DataType == NO_PENDING_ITEMS:
-                    sys.stdout.write('. ')
-                    sys.stdout.flush()
-                    break
+                        raise Exception('Datatype unknown: ' + str(DataType) + ' cannot allocate data value')
+                if edfHandle == None:
+                    # release the counting handle so that only one copy of the file is held by the API
+                    self.Edfwrapper.edf_close_file(tempData)
                 else:
-                    raise Exception('Datatype unknown: ' + str(DataType) + ' cannot allocate data value')
+                    # rewind the handle to the start of the file for the decoding pass
+                    if self.Edfwrapper.edf_goto_bookmark(tempData, byref(bookmark)) != 0:
+                        raise Exception('Could not rewind the EDF file to its start')
+                    self.Edfwrapper.edf_free_bookmark(tempData, byref(bookmark))
             # resize arrays to appropriate size (may over-provision)
             strSize = '<U'+str(maxStrLength)
             # if recinfo enabled, resize RECORDINGdata structure
-            if self.options['recinfo_enabled']==1:
+            if self.tableEnabled('RECORDINGS'):
                 #preallocate arrays to the proper size
-                self.RECORDINGdata = np.resize(self.RECORDINGdata,numberOfRecordings)
-                #print a dot as a pseudo progress bar
-                sys.stdout.write('. ')
-                sys.stdout.flush()
+                self.RECORDINGdata = np.empty(numberOfRecordings,dtype=self.outputType('RECORDINGS'))
             else:
                 self.RECORDINGdata = None
             # if messages enabled, resize MESSAGEdata structure
-            if self.options['messages_enabled']==1:
+            if self.tableEnabled('MESSAGES'):
                 #update the size of the message container to max message size - This needs to be optimized
-                self.MESSAGETtype = np.dtype([('time','i8'),('message',strSize),('TimingCorrected','?'),('messageLength','i4'),('readFlags','i4'),('flags','f4'),('parsedby',np.str_),('status','i4'),('elementIndex','i8'),('msgIndex','i8')])
-                #reassign data type to proper size
-                self.MESSAGEdata = np.empty(1,dtype=self.MESSAGETtype)
+                self.MESSAGETtype = self.messageType(strSize)
                 #preallocate arrays to the proper size
-                self.MESSAGEdata = np.resize(self.MESSAGEdata,numberOfMessages)
-                #print a dot as a pseudo progress bar
-                sys.stdout.write('. ')
-                sys.stdout.flush()
+                self.MESSAGEdata = np.empty(numberOfMessages,dtype=self.MESSAGETtype)
             else:
                 self.MESSAGEdata = None
             # if events are enabled, resize EVENTdata structure
-            if self.options['events_enabled'] ==1:
+            if self.tableEnabled('EVENTS'):
                 #preallocate arrays to the proper size
-                self.EVENTdata = np.resize(self.EVENTdata,numberOfEvents)
-                #print a dot as a pseudo progress bar
-                sys.stdout.write('. ')
-                sys.stdout.flush()
+                self.EVENTdata = self.allocateTable('EVENTS',numberOfEvents,self.outputType('EVENTS'))
             else:
                 self.EVENTdata = None
             # if samples are enabled, resize SAMPLEdata structure
-            if self.options['samples_enabled']==1:
+            if self.tableEnabled('SAMPLES'):
                 #preallocate arrays to the proper size
-                self.SAMPLEdata = np.resize(self.SAMPLEdata,numberOfSamples)
-                #print a dot as a pseudo progress bar
-                sys.stdout.write('. ')
-                sys.stdout.flush()
+                self.SAMPLEdata = self.allocateTable('SAMPLES',numberOfSamples,self.outputType('SAMPLES'))
             else:
                 self.SAMPLEdata = None
             # if ioevents are enabled, resize IOEVENTdata structure
-            if self.options['ioevents_enabled']==1:
+            if self.tableEnabled('IOEVENTS'):
                 #preallocate arrays to the proper size
-                self.IOEVENTdata = np.resize(self.IOEVENTdata,numberOfIOEvents)
-                #print a dot as a pseudo progress bar
-                sys.stdout.write('. ')
-                sys.stdout.flush()
+                self.IOEVENTdata = np.empty(numberOfIOEvents,dtype=self.outputType('IOEVENTS'))
             else:
                 self.IOEVENTdata = None
-            #end pseudo progress bar
-            sys.stdout.write('. \n')
-            sys.stdout.flush()
+            #allocate the staging blocks used to decode samples and events in bulk, and start the tables from the first row
+            self.allocateStaging(numberOfSamples, numberOfEvents)
+            self.resetCounters()
+            self.progress.end('count', numberOfElements, self.allocatedBytes())
             # print counts for validation
             if self.options['output_data_debugflags'] ==1: 
-                print('Detected Number of Elements: ' + str(numberOfElements))
-                print('Detected Number of Trials: ' + str(self.trialCount))
-                if self.options['samples_enabled']==1:
-                    print('Detected Number of Samples: ' + str(numberOfSamples))
-                    print('Size of SAMPLEdata: ' + str(self.SAMPLEdata.size))
-                if self.options['events_enabled'] ==1:
-                    print('Detected Number of Events: ' + str(numberOfEvents))
-                    print('Size of EVENTdata: ' + str(self.EVENTdata.size))
-                if self.options['messages_enabled']==1:
-                    print('Detected Number of Messages: ' + str(numberOfMessages))
-                    print('Size of MESSAGEdata: ' + str(self.MESSAGEdata.size))
-                if self.options['recinfo_enabled']==1:
-                    print('Detected Number of Recordings: ' + str(numberOfRecordings))
-                    print('Size of RECORDINGdata: ' + str(self.RECORDINGdata.size))
-                if self.options['ioevents_enabled']==1:
-                    print('Detected Number of IOEvents: ' + str(numberOfIOEvents))
-                    print('Size of IOEVENTdata: ' + str(self.IOEVENTdata.size))
-                print('Detected Number of ParseEvents: ' + str(numberOfParseEvents))
+                self.printStatus('Detected Number of Elements: ' + str(numberOfElements))
+                self.printStatus('Detected Number of Trials: ' + str(self.trialCount))
+                if self.tableEnabled('SAMPLES'):
+                    self.printStatus('Detected Number of Samples: ' + str(numberOfSamples))
+                    self.printStatus('Size of SAMPLEdata: ' + str(self.SAMPLEdata.size))
+                if self.tableEnabled('EVENTS'):
+                    self.printStatus('Detected Number of Events: ' + str(numberOfEvents))
+                    self.printStatus('Size of EVENTdata: ' + str(self.EVENTdata.size))
+                if self.tableEnabled('MESSAGES'):
+                    self.printStatus('Detected Number of Messages: ' + str(numberOfMessages))
+                    self.printStatus('Size of MESSAGEdata: ' + str(self.MESSAGEdata.size))
+                if self.tableEnabled('RECORDINGS'):
+                    self.printStatus('Detected Number of Recordings: ' + str(numberOfRecordings))
+                    self.printStatus('Size of RECORDINGdata: ' + str(self.RECORDINGdata.size))
+                if self.tableEnabled('IOEVENTS'):
+                    self.printStatus('Detected Number of IOEvents: ' + str(numberOfIOEvents))
+                    self.printStatus('Size of IOEVENTdata: ' + str(self.IOEVENTdata.size))
+                self.printStatus('Detected Number of ParseEvents: ' + str(numberOfParseEvents))
             # clear variables
             tempData = None
             DataType = None
@@ -525,52 +853,274 @@ class EDF2numpy:
             raise Exception('An error has occurred with prealocateArraySize: ' + str(e))
         except:
             raise Exception('An unhandled exception has occurred with prealocateArraySize')
+    def messageType(self,strSize):
+        """
+        Build the dtype of MESSAGEdata. With compact_messages_enabled the message text is kept in messageHeap and the
+        fixed-width 'message' column is replaced by the position of the text in the heap.
+        Parameters
+            strSize = the numpy type of the fixed-width 'message' column, e.g. '<U256'
+        Return
+            Returns the numpy dtype
+        """
+        if self.options['compact_messages_enabled']==1:
+            text = [('textOffset','i8'),('textLength','i4')]
+        else:
+            text = [('message',strSize)]
+        return np.dtype([('time','i8')] + text + [('TimingCorrected','?'),('messageLength','i4'),('readFlags','i4'),('flags','f4'),('parsedby',np.str_),('status','i4'),('elementIndex','i8'),('msgIndex','i8')])
+    def growMessages(self,width):
+        """
+        Widen the fixed-width 'message' column of MESSAGEdata to hold a message longer than it was sized for. The rows
+        decoded so far are copied into the wider array.
+        Parameters
+            width = the number of characters of the new column
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            self.MESSAGETtype = self.messageType('<U'+str(width))
+            self.MESSAGEdata = self.MESSAGEdata.astype(self.MESSAGETtype)
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with growMessages: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with growMessages')
+    def allocateStaging(self, numberOfSamples, numberOfEvents):
+        """
+        Allocate the staging blocks that raw samples and events are copied into before they are decoded in bulk.
+        Parameters
+            numberOfSamples = the largest number of samples that will be decoded into SAMPLEdata at once.
+            numberOfEvents = the largest number of events that will be decoded into EVENTdata at once.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            if self.tableEnabled('SAMPLES'):
+                self.sampleStaging = np.empty(max(1,min(self.sampleBlockSize,numberOfSamples)),dtype=FSAMPLEtype)
+                self.sampleStagingElements = np.empty(self.sampleStaging.size,dtype='i8')
+            if self.tableEnabled('EVENTS'):
+                self.eventStaging = np.empty(max(1,min(self.eventBlockSize,numberOfEvents)),dtype=FEVENTtype)
+                self.eventStagingTypes = np.empty(self.eventStaging.size,dtype='i4')
+                self.eventStagingElements = np.empty(self.eventStaging.size,dtype='i8')
+            self.stagedSamples = 0
+            self.stagedEvents = 0
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with allocateStaging: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with allocateStaging')
+    def resetCounters(self):
+        """
+        Reset the record counters and the index of the first row of each data array before a file is decoded.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        self.sampleCount = self.eventCount = self.msgCount = self.IOCount = self.recCount = 0
+        self.sampleBase = self.eventBase = self.msgBase = self.IOBase = self.recBase = 0
+        self.messageHeap = bytearray()
+        return 0
     def trimArray(self):
         """
         Remove any empty rows from the data arrays to cut out the fat.
+        The decode loop fills each array from the top, so the used rows are the first rows up to the record counters and
+        each array is trimmed to a view of those rows instead of being copied.
         Return
             Returns 0 if the operation is successful..
         """
-        print('...Trimming empty cells from array...')
+        self.printStatus('...Trimming empty cells from array...')
         try:
-            #print a dot as a pseudo progress bar
-            sys.stdout.write('. ')
-            sys.stdout.flush()
+            self.progress.start('trim')
             #Trim empty rows from array
-            if self.options['recinfo_enabled']==1:
-                self.RECORDINGdata = np.array([i for i in self.RECORDINGdata if i['elementIndex']>0])
-            #print a dot as a pseudo progress bar
-            sys.stdout.write('. ')
-            sys.stdout.flush()
+            if self.tableEnabled('RECORDINGS'):
+                self.RECORDINGdata = self.RECORDINGdata[:self.recCount]
             #Trim empty rows from array
-            if self.options['messages_enabled']==1:
-                self.MESSAGEdata = np.array([i for i in self.MESSAGEdata if i['elementIndex']>0])
-            #print a dot as a pseudo progress bar
-            sys.stdout.write('. ')
-            sys.stdout.flush()
+            if self.tableEnabled('MESSAGES'):
+                self.MESSAGEdata = self.MESSAGEdata[:self.msgCount]
+                if self.options['compact_messages_enabled']==1:
+                    # attach the text heap to the message rows
+                    self.MESSAGEdata = MessageArray(self.MESSAGEdata, self.messageHeap)
             #Trim empty rows from array
-            if self.options['events_enabled'] ==1:
-                self.EVENTdata = np.array([i for i in self.EVENTdata if i['elementIndex']>0])
-            #print a dot as a pseudo progress bar
-            sys.stdout.write('. ')
-            sys.stdout.flush()
+            if self.tableEnabled('EVENTS'):
+                self.EVENTdata = self.trimTable('EVENTdata',self.eventCount)
             #Trim empty rows from array
-            if self.options['samples_enabled']==1:
-                self.SAMPLEdata = np.array([i for i in self.SAMPLEdata if i['elementIndex']>0])
-            #print a dot as a pseudo progress bar
-            sys.stdout.write('. ')
-            sys.stdout.flush()
+            if self.tableEnabled('SAMPLES'):
+                self.SAMPLEdata = self.trimTable('SAMPLEdata',self.sampleCount)
             #Trim empty rows from array
-            if self.options['ioevents_enabled']==1:
-                self.IOEVENTdata = np.array([i for i in self.IOEVENTdata if i['elementIndex']>0])
-            #end pseudo progress bar
-            sys.stdout.write('\n')
-            sys.stdout.flush()
+            if self.tableEnabled('IOEVENTS'):
+                self.IOEVENTdata = self.IOEVENTdata[:self.IOCount]
+            self.progress.end('trim')
             return 0
         except Exception as e:
             raise Exception('An error has occurred with trimArray: ' + str(e))
         except:
             raise Exception('An unhandled exception has occurred with trimArray')
+    def tableEnabled(self,table):
+        """
+        Check if a data array is read: it is enabled in self.options and, if self.decodeTables is set, listed in it.
+        Parameters
+            table = the name of the data array, e.g. 'SAMPLES' or 'MESSAGES'
+        Return
+            Returns True if the array is allocated and decoded
+        """
+        return self.options[tableOptions[table]] == 1 and (self.decodeTables == None or table in self.decodeTables)
+    def allocatedBytes(self):
+        """
+        Get the memory held by the data arrays and the staging blocks.
+        Return
+            Returns the number of bytes
+        """
+        arrays = [self.RECORDINGdata,self.MESSAGEdata,self.SAMPLEdata,self.EVENTdata,self.IOEVENTdata,self.sampleStaging,self.eventStaging]
+        return sum([i.nbytes for i in arrays if isinstance(i, np.ndarray)]) + len(self.messageHeap)
+    def recordCount(self):
+        """
+        Get the number of records decoded so far from the file being read.
+        Return
+            Returns the number of records
+        """
+        return self.sampleCount + self.eventCount + self.msgCount + self.IOCount + self.recCount
+    def allocateTable(self,table,numberOfRows,dtype):
+        """
+        Allocate a data array in memory, or as a .npy file in options['memmap_output_dir'] for the tables in memmapTables.
+        A file backed array is written by the decode loop like any other array, but its rows live in the page cache instead of
+        the process heap, so the resident memory of a conversion does not grow with the length of the recording.
+        Parameters
+            table = the name of the data array, e.g. 'SAMPLES' or 'EVENTS'
+            numberOfRows = the number of rows to allocate
+            dtype = the structured numpy dtype of the array
+        Return
+            Returns the numpy array, or a writable numpy memmap of the file <memmap_output_dir>/<table>.npy
+        """
+        try:
+            if self.options['memmap_output_dir'] != '' and table in memmapTables:
+                os.makedirs(self.options['memmap_output_dir'], exist_ok=True)
+                return np.lib.format.open_memmap(os.path.join(self.options['memmap_output_dir'], table + '.npy'), mode='w+', dtype=dtype, shape=(numberOfRows,))
+            return np.empty(numberOfRows,dtype=dtype)
+        except Exception as e:
+            raise Exception('An error has occurred with allocateTable: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with allocateTable')
+    def outputType(self,table,projected=True):
+        """
+        Get the dtype of a data array as it is allocated by this conversion. If options['categorical_columns_enabled'] is 1,
+        the columns listed in categories are stored as CODE_TYPE integer codes instead of text. The tables in projectionTables
+        only keep the columns named in options['output_columns'], in the order of the full schema.
+        Parameters
+            table = the name of the data array, e.g. 'EVENTS' or 'RECORDINGS'
+            projected = False to get every column of the table whatever options['output_columns'] holds
+        Return
+            Returns the structured numpy dtype
+        """
+        try:
+            dtype = getattr(self, tableTypes[table])
+            columns = self.projectedColumns(table) if projected else None
+            coded = categories.get(table, {}) if self.options['categorical_columns_enabled'] == 1 else {}
+            if columns == None and len(coded) == 0:
+                return dtype
+            return np.dtype([(i, CODE_TYPE if i in coded else dtype[i]) for i in dtype.names if columns == None or i in columns])
+        except Exception as e:
+            raise Exception('An error has occurred with outputType: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with outputType')
+    def projectedColumns(self,table):
+        """
+        Get the columns of a table that are kept by options['output_columns']. The option holds the column names separated
+        by spaces, or a list of names. A name is kept in every table of projectionTables that has it, so 'time' selects the
+        time of both samples and events.
+        Parameters
+            table = the name of the data array, e.g. 'SAMPLES'
+        Return
+            Returns the list of column names, or None if every column is kept
+        """
+        try:
+            columns = self.options['output_columns']
+            if table not in projectionTables or len(columns) == 0:
+                return None
+            if type(columns) == str:
+                columns = columns.split()
+            return [i for i in getattr(self, tableTypes[table]).names if i in columns]
+        except Exception as e:
+            raise Exception('An error has occurred with projectedColumns: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with projectedColumns')
+    def categoryCode(self,table,column,value):
+        """
+        Get the integer code of a value of a dictionary-encoded column, e.g. categoryCode('EVENTS','eventType','ENDFIX').
+        Useful to filter a table without decoding it: EVENTdata[EVENTdata['eventType'] == categoryCode('EVENTS','eventType','ENDFIX')]
+        Parameters
+            table = the name of the data array, e.g. 'EVENTS'
+            column = the name of the dictionary-encoded column
+            value = the text value
+        Return
+            Returns the integer code, or MISSING_CODE if the value is not in the dictionary of the column
+        """
+        try:
+            values = categories[table][column]
+            return values.index(value) if value in values else MISSING_CODE
+        except Exception as e:
+            raise Exception('An error has occurred with categoryCode: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with categoryCode')
+    def decodeCategories(self,table,data):
+        """
+        Copy a data array with dictionary-encoded columns to an array with text columns, as it is produced with
+        options['categorical_columns_enabled'] = 0. Arrays without integer coded columns are returned unchanged.
+        Parameters
+            table = the name of the data array, e.g. 'EVENTS' or 'RECORDINGS'
+            data = the data array, e.g. EVENTdata
+        Return
+            Returns the decoded structured numpy array
+        """
+        try:
+            coded = [i for i in categories.get(table, {}) if i in data.dtype.names and data.dtype[i] == CODE_TYPE]
+            if len(coded) == 0:
+                return data
+            dtype = getattr(self, tableTypes[table])
+            decoded = np.empty(data.shape, dtype=[(i, dtype[i] if i in coded else data.dtype[i]) for i in data.dtype.names])
+            for i in data.dtype.names:
+                if i in coded:
+                    # the last entry of the lookup is the text of MISSING_CODE
+                    decoded[i] = np.array(categories[table][i] + [MISSING_TEXT])[data[i]]
+                else:
+                    decoded[i] = data[i]
+            return decoded
+        except Exception as e:
+            raise Exception('An error has occurred with decodeCategories: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with decodeCategories')
+    def trimTable(self,attribute,numberOfRows):
+        """
+        Trim a data array to its first numberOfRows rows.
+        An array allocated as a .npy file by allocateTable() is flushed, the file is cut to numberOfRows rows and reopened
+        read-only, so the file on disk holds exactly the returned rows and can be loaded again with np.load(mmap_mode='r').
+        Parameters
+            attribute = the name of the data array attribute to trim, e.g. 'SAMPLEdata'
+            numberOfRows = the number of rows to keep
+        Return
+            Returns a view of the array, or a read-only numpy memmap of the trimmed file
+        """
+        try:
+            data = getattr(self, attribute)
+            if not isinstance(data, np.memmap):
+                return data[:numberOfRows]
+            filename = data.filename
+            data.flush()
+            # release the writable mapping before the file is cut, some platforms cannot truncate a mapped file
+            setattr(self, attribute, None)
+            del data
+            with open(filename, 'r+b') as f:
+                version = np.lib.format.read_magic(f)
+                shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(f) if version == (1, 0) else np.lib.format.read_array_header_2_0(f)
+                offset = f.tell()
+                if shape[0] != numberOfRows:
+                    # rewrite the header in place with the new shape, padded to the original length so the data does not move
+                    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (numberOfRows,)})
+                    f.seek(6 + 2 + (2 if version == (1, 0) else 4))
+                    f.write(header.encode('latin1').ljust(offset - f.tell() - 1) + b'\n')
+                    f.truncate(offset + numberOfRows * dtype.itemsize)
+            return np.load(filename, mmap_mode='r')
+        except Exception as e:
+            raise Exception('An error has occurred with trimTable: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with trimTable')
     def openDebugFile(self,Outputfilename):
         """
         Opens debug file
@@ -579,10 +1129,13 @@ class EDF2numpy:
         Return
             Returns handle of debug file.
         """
-        print('...Attempting to Open Debug file...')
+        self.printStatus('...Attempting to Open Debug file...')
         try:
-            # Open file with write flag
-            f = open(Outputfilename, "w")
+            if self.options['binary_debug_enabled'] == 1:
+                # rows are stored as raw bytes in <name>.debugbin, see EDF2numpyDebug.debugToText()
+                return BinaryDebugFile(Outputfilename + 'bin')
+            # Open file with write flag and a large buffer, the records are written a line or a block at a time
+            f = open(Outputfilename, "w", buffering=DEBUG_BUFFER_SIZE)
             return f
         except Exception as e:
             raise Exception('An error has occurred with openDebugFile: ' + str(e))
@@ -598,18 +1151,67 @@ class EDF2numpy:
             Returns 0 if the operation is successful.
         """
         try:
-            output = ""
-            #Reformat data into tab delimited output
-            for i in data:
-                output = output + str(i) + "\t"
-            output = output + '\n' 
-            #Append tab delimited line to debug file
-            fileHandle.write(output)
+            #Reformat data into tab delimited output and append it to debug file
+            line = '\t'.join([str(i) for i in data]) + '\t\n'
+            if isinstance(fileHandle, BinaryDebugFile):
+                fileHandle.writeLine(line)
+            else:
+                fileHandle.write(line)
             return 0
         except Exception as e:
-            raise Exception('An error has occurred with trimArray: ' + str(e))
+            raise Exception('An error has occurred with appendDebugFile: ' + str(e))
         except:
-            raise Exception('An unhandled exception has occurred with trimArray')
+            raise Exception('An unhandled exception has occurred with appendDebugFile')
+    def appendDebugBlock(self,fileHandle,rows,elementIndex=None):
+        """
+        Appends a block of rows to debug file, one tab delimited line per row as appendDebugFile() writes them.
+        Each column is converted to text in one step and the whole block is written at once, a binary debug file
+        stores the rows as they are (see EDF2numpyDebug). While samples and events are flushed together the block is
+        kept in debugGroup instead and written by appendDebugGroup().
+        Parameters
+            fileHandle = The handle of the debug file created by openDebugFile()
+            rows = A structured numpy array, e.g. a block of SAMPLEdata
+            elementIndex = Optional array with the index in the EDF buffer of each row
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            if self.debugGroup != None and elementIndex is not None:
+                self.debugGroup.append((rows, elementIndex))
+            elif isinstance(fileHandle, BinaryDebugFile):
+                fileHandle.writeRows(rows)
+            elif rows.size > 0:
+                fileHandle.write(formatRows(rows))
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with appendDebugBlock: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with appendDebugBlock')
+    def appendDebugGroup(self,fileHandle,group):
+        """
+        Appends blocks of rows to debug file merged into the order of the EDF, as if each row had been written when it was read.
+        Parameters
+            fileHandle = The handle of the debug file created by openDebugFile()
+            group = list of (rows, elementIndex) pairs collected by appendDebugBlock()
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            blocks = [i[0] for i in group if i[0].size > 0]
+            if len(blocks) < 2:
+                for i in blocks:
+                    self.appendDebugBlock(fileHandle,i)
+                return 0
+            order = groupOrder([i[1] for i in group if i[0].size > 0])
+            if isinstance(fileHandle, BinaryDebugFile):
+                fileHandle.writeGroup(blocks, order)
+            else:
+                fileHandle.write(formatGroup(blocks, order))
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with appendDebugGroup: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with appendDebugGroup')
     def closeDebugFile(self,fileHandle):
         """
         Closed debug file.
@@ -618,7 +1220,7 @@ class EDF2numpy:
         Return
             Returns 0 if the operation is successful.
         """
-        print('...Attempting to close the debug file...')
+        self.printStatus('...Attempting to close the debug file...')
         try:
             # close file
             fileHandle.close()
@@ -642,129 +1244,137 @@ class EDF2numpy:
         Return
             Returns 0 if the operation is successful.
         """
-        msg = ''
         try:
-            #update fevent data structure to numpy structured array
-            self.EVENTdata[index]['eventIndex'] = index
-            self.EVENTdata[index]['eyeTracked']=EyesTracked[Data.eye]
-            self.EVENTdata[index]['gazeType'] = ['RAW','HREF','GAZE'][self.options['gaze_data_type']]
-            if Data.message:
-                #unpack message data
-                msg = repr(str(Data.message.contents.text,self.options['text_data_type']))
-                self.EVENTdata[index]['message'] = np.string_(msg)
-                # for i in struct.unpack('<'+str(Data.message.contents.length-1)+'c',Data.message.contents.text):
-                    # msg = msg + i.decode(self.options['text_data_type'])
-                # self.EVENTdata[index]['message']=msg
-            else:
-                self.EVENTdata[index]['message'] = MISSING_TEXT
-            #Check that we should be updating event structure
-            if ((Data.eye == LEFT_EYE or Data.eye == BINOCULAR) and self.options['output_left_eye'] == 1) or ((Data.eye == RIGHT_EYE or Data.eye == BINOCULAR) and self.options['output_right_eye'] == 1):
-                #If start events enabled
-                self.EVENTdata[index]['time']=Data.sttime
-                if self.options['output_eventtype_start'] ==1:
-                    self.EVENTdata[index]['startTime']=Data.sttime
-                    if self.options['gaze_data_type'] == 1:
-                        self.EVENTdata[index]['startPosX']=Data.hstx
-                        self.EVENTdata[index]['startPosY']=Data.hsty
-                    elif self.options['gaze_data_type'] == 2:
-                        self.EVENTdata[index]['startPosX']=Data.gstx
-                        self.EVENTdata[index]['startPosY']=Data.gsty
-                    else:
-                        self.EVENTdata[index]['startPosX']=MISSING_VALUE
-                        self.EVENTdata[index]['startPosY']=MISSING_VALUE
-                    if self.options['output_data_pupilsize'] == 1:
-                        self.EVENTdata[index]['StartPupilSize']=Data.sta
-                    else:
-                        self.EVENTdata[index]['StartPupilSize']=MISSING_VALUE
-                    if self.options['output_data_velocity'] == 1:
-                        self.EVENTdata[index]['startVEL']=Data.svel
-                    else:
-                        self.EVENTdata[index]['startVEL']=MISSING_VALUE
-                    if self.options['output_data_ppd'] == 1:
-                        self.EVENTdata[index]['startPPDX']=Data.supd_x
-                        self.EVENTdata[index]['startPPDY']=Data.supd_y
-                    else:
-                        self.EVENTdata[index]['startPPDX']=MISSING_VALUE
-                        self.EVENTdata[index]['startPPDY']=MISSING_VALUE
-                #If an end event update additional variables
-                if (eventtype == ENDBLINK or eventtype == ENDFIX or eventtype == ENDSACC or eventtype == FIXUPDATE) and self.options['output_eventtype_end'] ==1:
-                    self.EVENTdata[index]['time']=Data.entime
-                    self.EVENTdata[index]['endTime']=Data.entime
-                    self.EVENTdata[index]['duration']=Data.entime - Data.sttime
-                    if self.options['gaze_data_type'] == 1:
-                        self.EVENTdata[index]['endPosX']=Data.henx
-                        self.EVENTdata[index]['endPosY']=Data.heny
-                    elif self.options['gaze_data_type'] == 2:
-                        self.EVENTdata[index]['endPosX']=Data.genx
-                        self.EVENTdata[index]['endPosY']=Data.geny
-                    else:
-                        self.EVENTdata[index]['endPosX']=MISSING_VALUE
-                        self.EVENTdata[index]['endPosY']=MISSING_VALUE
-                    if self.options['output_data_pupilsize'] == 1:
-                        self.EVENTdata[index]['endPupilSize']=Data.ena
-                    else:
-                        self.EVENTdata[index]['endPupilSize']=MISSING_VALUE
-                    if self.options['output_data_velocity'] == 1:
-                        self.EVENTdata[index]['endVEL']=Data.evel
-                    else:
-                        self.EVENTdata[index]['endVEL']=MISSING_VALUE
-                    if self.options['output_data_ppd'] == 1:
-                        self.EVENTdata[index]['endPPDX']=Data.eupd_x
-                        self.EVENTdata[index]['endPPDY']=Data.eupd_y
-                    else:
-                        self.EVENTdata[index]['endPPDX']=MISSING_VALUE
-                        self.EVENTdata[index]['endPPDY']=MISSING_VALUE
-                    if self.options['gaze_data_type'] == 1:
-                        self.EVENTdata[index]['avgPosX']=Data.havx
-                        self.EVENTdata[index]['avgPosY']=Data.havy
-                    elif self.options['gaze_data_type'] == 2:
-                        self.EVENTdata[index]['avgPosX']=Data.gavx
-                        self.EVENTdata[index]['avgPosY']=Data.gavy
-                    else:
-                        self.EVENTdata[index]['avgPosX']=MISSING_VALUE
-                        self.EVENTdata[index]['avgPosY']=MISSING_VALUE
-                    if self.options['output_data_pupilsize'] == 1:
-                        self.EVENTdata[index]['avgPupilSize']=Data.ava
-                    else:
-                        self.EVENTdata[index]['avgPupilSize']=MISSING_VALUE
-                    if self.options['output_data_velocity'] == 1:
-                        self.EVENTdata[index]['avgVEL']=Data.avel
-                        self.EVENTdata[index]['peakVEL']=Data.pvel
-                    else:
-                        self.EVENTdata[index]['avgVEL']=MISSING_VALUE
-                        self.EVENTdata[index]['peakVEL']=MISSING_VALUE
-                else:
-                    self.EVENTdata[index]['time']=MISSING_VALUE
-                    self.EVENTdata[index]['endTime']=MISSING_VALUE 
-                    self.EVENTdata[index]['duration']=MISSING_VALUE
-                    self.EVENTdata[index]['endPosX']=MISSING_VALUE
-                    self.EVENTdata[index]['endPosY']=MISSING_VALUE
-                    self.EVENTdata[index]['endPupilSize']=MISSING_VALUE
-                    self.EVENTdata[index]['endVEL']=MISSING_VALUE
-                    self.EVENTdata[index]['endPPDX']=MISSING_VALUE 
-                    self.EVENTdata[index]['endPPDY']=MISSING_VALUE
-                    self.EVENTdata[index]['avgPosX']=MISSING_VALUE 
-                    self.EVENTdata[index]['avgPosY']=MISSING_VALUE 
-                    self.EVENTdata[index]['avgPupilSize']=MISSING_VALUE 
-                    self.EVENTdata[index]['avgVEL']=MISSING_VALUE 
-                    self.EVENTdata[index]['peakVEL']=MISSING_VALUE
-                #If debug flags enabled add some additional values
-                if self.options['output_data_debugflags'] ==1:
-                    self.EVENTdata[index]['readFlags']=Data.read
-                    self.EVENTdata[index]['flags']=Data.flags
-                    self.EVENTdata[index]['parsedby']=Data.parsedby
-                    self.EVENTdata[index]['status']=Data.status
-                    self.appendDebugFile(self.debugfile,self.EVENTdata[index])
-                else:
-                    self.EVENTdata[index]['readFlags']= MISSING_VALUE
-                    self.EVENTdata[index]['flags']= MISSING_VALUE
-                    self.EVENTdata[index]['parsedby']= MISSING_TEXT
-                    self.EVENTdata[index]['status']= MISSING_VALUE
-            return 0
+            #copy the FEVENT structure into a one row block and decode it like any other block
+            block = np.empty(1,dtype=FEVENTtype)
+            memmove(block.ctypes.data, addressof(Data), FEVENTtype.itemsize)
+            return self.updateEventBlock(block,np.array([eventtype]),index)
         except Exception as e:
             raise Exception('An error has occurred with updateEvent: ' + str(e))
         except:
             raise Exception('An unhandled exception has occurred with updateEvent')
+    def updateEventBlock(self,block,eventtypes,index,elementIndex=None):
+        """
+        Updates a block of consecutive events in the EVENTdata structure using vectorized field views.
+        Parameters
+            block = A numpy array with the FEVENTtype dtype holding the raw FEVENT structures.
+            eventtypes = Array with the event type code (SFIX,EFIX,FIXUPDATE,SSACC,ESACC,SBLINK,EBLINK) of each event
+            index = The index of the EVENTdata structure where the first event of the block is written
+            elementIndex = Optional array with the index in the EDF buffer of each event in the block
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            plan = self.decodePlan
+            output = self.EVENTdata[index-self.eventBase:index-self.eventBase+block.size]
+            columns = plan.settings['eventColumns']
+            if 'eventIndex' in columns:
+                output['eventIndex'] = np.arange(index,index+block.size)
+            if elementIndex is not None and 'elementIndex' in columns:
+                output['elementIndex'] = elementIndex
+            if 'eventType' in columns:
+                output['eventType'] = eventCodes[eventtypes] if plan.settings['categorical'] else [eventNames[i] for i in eventtypes]
+            if 'eyeTracked' in columns:
+                output['eyeTracked'] = block['eye'] if plan.settings['categorical'] else np.array(EyesTracked)[block['eye']]
+            #unpack message data, only a few events carry a message
+            if 'message' in columns:
+                output['message'] = MISSING_TEXT
+                for i in np.flatnonzero(block['message']):
+                    msg = repr(str(cast(int(block['message'][i]),POINTER(LSTRING)).contents.text,plan.settings['textEncoding']))
+                    output['message'][i] = np.string_(msg)
+            #Events from an eye that is not being output keep only their type, eye and index
+            selected = (((block['eye'] == LEFT_EYE) | (block['eye'] == BINOCULAR)) & plan.settings['leftEye']) | (((block['eye'] == RIGHT_EYE) | (block['eye'] == BINOCULAR)) & plan.settings['rightEye'])
+            #End events update additional variables
+            isEnd = np.isin(eventtypes,endEventTypes) & selected
+            #copy the columns selected by the decode plan
+            self.applyDecodeSteps(output, block, plan.EVENT, {'selected': selected, 'end': isEnd})
+            if plan.settings['debug']:
+                self.appendDebugBlock(self.debugfile,output[selected],None if elementIndex is None else np.asarray(elementIndex)[selected])
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with updateEventBlock: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with updateEventBlock')
+    def stageEvent(self,address,eventtype,elementIndex):
+        """
+        Copies a raw FEVENT structure into the event staging block. The block is decoded into the EVENTdata structure
+        by flushEvents() once it is full.
+        Parameters
+            address = The address of the event data from edf_get_float_data_address()
+            eventtype = The event type code (SFIX,EFIX,FIXUPDATE,SSACC,ESACC,SBLINK,EBLINK)
+            elementIndex = The index of the event in the EDF buffer
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            memmove(self.eventStaging.ctypes.data + self.stagedEvents*FEVENTtype.itemsize, address, FEVENTtype.itemsize)
+            self.eventStagingTypes[self.stagedEvents] = eventtype
+            self.eventStagingElements[self.stagedEvents] = elementIndex
+            self.stagedEvents += 1
+            self.eventCount += 1
+            if self.stagedEvents == self.eventStaging.size:
+                self.flushStaging() if self.debugfile != None else self.flushEvents()
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with stageEvent: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with stageEvent')
+    def flushEvents(self):
+        """
+        Decodes the events waiting in the staging block into the EVENTdata structure.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            if self.stagedEvents > 0:
+                count = self.stagedEvents
+                self.stagedEvents = 0
+                started = self.profiler.clock() if self.profiler != None else 0
+                self.updateEventBlock(self.eventStaging[:count], self.eventStagingTypes[:count], self.eventCount-count, self.eventStagingElements[:count])
+                if self.profiler != None:
+                    # count the block for the events in it, not for the element that flushed it
+                    self.profiler.moveTime(self.profiler.clock() - started, self.stagedTypes(count))
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with flushEvents: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with flushEvents')
+    def flushStaging(self):
+        """
+        Decodes all staged samples and events into their data structures. When a debug file is written the staged samples
+        and events are decoded in full blocks of each kind and their debug rows are merged back into the order of the EDF,
+        so samples and events do not have to be flushed each time the EDF switches between them.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if self.debugfile == None or self.stagedSamples == 0 or self.stagedEvents == 0:
+            self.flushSamples()
+            self.flushEvents()
+            return 0
+        if self.profiler != None:
+            counts = self.stagedTypes(self.stagedEvents)
+            counts[SAMPLE_TYPE] = self.stagedSamples
+        self.debugGroup = []
+        try:
+            self.flushSamples()
+            self.flushEvents()
+        finally:
+            group, self.debugGroup = self.debugGroup, None
+        started = self.profiler.clock() if self.profiler != None else 0
+        self.appendDebugGroup(self.debugfile, group)
+        if self.profiler != None:
+            self.profiler.moveTime(self.profiler.clock() - started, counts)
+        return 0
+    def stagedTypes(self,count):
+        """
+        Count the staged events of each EDF data type, for ElementProfiler.moveTime().
+        Parameters
+            count = the number of staged events to count, from the start of the staging block
+        Return
+            Returns a dictionary with the number of events of each EDF data type
+        """
+        types, counts = np.unique(self.eventStagingTypes[:count], return_counts=True)
+        return dict(zip(types.tolist(), counts.tolist()))
     def updateSample(self,Data,index):
         """
         Updates sample data in the SAMPLEdata structure.
@@ -775,115 +1385,84 @@ class EDF2numpy:
             Returns 0 if the operation is successful.
         """
         try:
-            #Update FSample data to numpy structured array
-            self.SAMPLEdata[index]['sampleIndex'] = index
-            self.SAMPLEdata[index]['time']=Data.time
-            #Determine appropriate gaze position data for selected data type
-            if self.options['gaze_data_type'] == 0:
-                self.SAMPLEdata[index]['posXLeft']= Data.px.left
-                self.SAMPLEdata[index]['posYLeft']= Data.py.left
-                self.SAMPLEdata[index]['posXRight']= Data.px.right
-                self.SAMPLEdata[index]['posYRight']= Data.py.right
-            elif self.options['gaze_data_type'] == 1:
-                self.SAMPLEdata[index]['posXLeft']= Data.hx.left
-                self.SAMPLEdata[index]['posYLeft']= Data.hy.left
-                self.SAMPLEdata[index]['posXRight']= Data.hx.right
-                self.SAMPLEdata[index]['posYRight']= Data.hy.right
-            elif self.options['gaze_data_type'] == 2:
-                self.SAMPLEdata[index]['posXLeft']= Data.gx.left
-                self.SAMPLEdata[index]['posYLeft']= Data.gy.left
-                self.SAMPLEdata[index]['posXRight']= Data.gx.right
-                self.SAMPLEdata[index]['posYRight']= Data.gy.right
-            else:
-                self.SAMPLEdata[index]['posXLeft']= MISSING_VALUE
-                self.SAMPLEdata[index]['posYLeft']= MISSING_VALUE
-                self.SAMPLEdata[index]['posXRight']= MISSING_VALUE
-                self.SAMPLEdata[index]['posYRight']= MISSING_VALUE
-            #Determine pupil if data size should be reported
-            if self.options['output_data_pupilsize'] == 1:
-                self.SAMPLEdata[index]['pupilSizeLeft']= Data.pa.left
-                self.SAMPLEdata[index]['pupilSizeRight']= Data.pa.right
-            else:
-                self.SAMPLEdata[index]['pupilSizeLeft']= MISSING_VALUE
-                self.SAMPLEdata[index]['pupilSizeRight']= MISSING_VALUE
-            #if pupil size enabled
-            if self.options['output_data_ppd'] == 1:
-                self.SAMPLEdata[index]['PpdX']= Data.rx
-                self.SAMPLEdata[index]['PpdY']= Data.ry
-            else:
-                self.SAMPLEdata[index]['PpdX']= (MISSING_VALUE)
-                self.SAMPLEdata[index]['PpdY']= (MISSING_VALUE)
-            #If velocity enabled set velocity output to appropriate gaze type and velocity model
-            if self.options['gaze_data_type'] == 0 and self.options['output_data_velocity'] == 1 and self.options['output_samplevel_model_type'] == 0:
-                self.SAMPLEdata[index]['velXLeft']= Data.rxvel.left
-                self.SAMPLEdata[index]['velYLeft']= Data.ryvel.left
-                self.SAMPLEdata[index]['velXRight']= Data.rxvel.right
-                self.SAMPLEdata[index]['velYRight']= Data.ryvel.right
-            elif self.options['gaze_data_type'] == 1 and self.options['output_data_velocity'] == 1 and self.options['output_samplevel_model_type'] == 0:
-                self.SAMPLEdata[index]['velXLeft']= Data.hxvel.left
-                self.SAMPLEdata[index]['velYLeft']= Data.hyvel.left
-                self.SAMPLEdata[index]['velXRight']= Data.hxvel.right
-                self.SAMPLEdata[index]['velYRight']= Data.hyvel.right
-            elif self.options['gaze_data_type'] == 2 and self.options['output_data_velocity'] == 1 and self.options['output_samplevel_model_type'] == 0:
-                self.SAMPLEdata[index]['velXLeft']= Data.gxvel.left
-                self.SAMPLEdata[index]['velYLeft']= Data.gyvel.left
-                self.SAMPLEdata[index]['velXRight']= Data.gxvel.right
-                self.SAMPLEdata[index]['velYRight']= Data.gyvel.right
-            elif self.options['gaze_data_type'] == 0 and self.options['output_data_velocity'] == 1 and self.options['output_samplevel_model_type'] == 1:
-                self.SAMPLEdata[index]['velXLeft']= Data.frxvel.left
-                self.SAMPLEdata[index]['velYLeft']= Data.fryvel.left
-                self.SAMPLEdata[index]['velXRight']= Data.frxvel.right
-                self.SAMPLEdata[index]['velYRight']= Data.fryvel.right
-            elif self.options['gaze_data_type'] == 1 and self.options['output_data_velocity'] == 1 and self.options['output_samplevel_model_type'] == 1:
-                self.SAMPLEdata[index]['velXLeft']= Data.fhxvel.left
-                self.SAMPLEdata[index]['velYLeft']= Data.fhyvel.left
-                self.SAMPLEdata[index]['velXRight']= Data.fhxvel.right
-                self.SAMPLEdata[index]['velYRight']= Data.fhyvel.right
-            elif self.options['gaze_data_type'] == 2 and self.options['output_data_velocity'] == 1 and self.options['output_samplevel_model_type'] == 1:
-                self.SAMPLEdata[index]['velXLeft']= Data.fgxvel.left
-                self.SAMPLEdata[index]['velYLeft']= Data.fgyvel.left
-                self.SAMPLEdata[index]['velXRight']= Data.fgxvel.right
-                self.SAMPLEdata[index]['velYRight']= Data.fgyvel.right
-            else:
-                self.SAMPLEdata[index]['fastVelXLeft']= MISSING_VALUE
-                self.SAMPLEdata[index]['fastVelYLeft']= MISSING_VALUE
-                self.SAMPLEdata[index]['fastVelXRight']= MISSING_VALUE
-                self.SAMPLEdata[index]['fastVelYRight']= MISSING_VALUE
-            #If Head target data enabled
-            if self.options['output_headtargetdata_enabled'] == 1:
-                if Data.htype != MISSING:
-                    self.SAMPLEdata[index]['headTrackerType']= Data.htype
-                    self.SAMPLEdata[index]['headTargetDataX']= Data.hdata.targetX
-                    self.SAMPLEdata[index]['headTargetDataY']= Data.hdata.targetY
-                    self.SAMPLEdata[index]['headTargetDataZ']= Data.hdata.targetDist
-                    self.SAMPLEdata[index]['headTargetDataFlags']= Data.hdata.targetFlags
-                else:
-                    self.SAMPLEdata[index]['headTrackerType'] = MISSING_VALUE
-                    self.SAMPLEdata[index]['headTrackerType']= MISSING_VALUE
-                    self.SAMPLEdata[index]['headTargetDataX']= MISSING_VALUE
-                    self.SAMPLEdata[index]['headTargetDataY']= MISSING_VALUE
-                    self.SAMPLEdata[index]['headTargetDataZ']= MISSING_VALUE
-                    self.SAMPLEdata[index]['headTargetDataFlags']= MISSING_VALUE
-            #If IO Data enabled
-            if self.options['ioevents_enabled'] == 1:
-                self.SAMPLEdata[index]['inputPortData']= Data.inputs
-                self.SAMPLEdata[index]['buttonData']= Data.buttons
-            else:
-                self.SAMPLEdata[index]['inputPortData']= MISSING_VALUE
-                self.SAMPLEdata[index]['buttonData']= MISSING_VALUE
-            #If debug flags enabled add some additional values
-            if self.options['output_data_debugflags'] == 1:
-                self.SAMPLEdata[index]['flags']= Data.flags
-                self.SAMPLEdata[index]['errors']=Data.errors
-                self.appendDebugFile(self.debugfile,self.SAMPLEdata[index])
-            else:
-                self.SAMPLEdata[index]['flags']= MISSING_VALUE
-                self.SAMPLEdata[index]['errors']= MISSING_VALUE
-            return 0
+            #copy the FSAMPLE structure into a one row block and decode it like any other block
+            block = np.empty(1,dtype=FSAMPLEtype)
+            memmove(block.ctypes.data, addressof(Data), FSAMPLEtype.itemsize)
+            return self.updateSampleBlock(block,index)
         except Exception as e:
             raise Exception('An error has occurred with updateSample: ' + str(e))
         except:
             raise Exception('An unhandled exception has occurred with updateSample')
+    def updateSampleBlock(self,block,index,elementIndex=None):
+        """
+        Updates a block of consecutive samples in the SAMPLEdata structure using vectorized field views.
+        Parameters
+            block = A numpy array with the FSAMPLEtype dtype holding the raw FSAMPLE structures.
+            index = The index of the SAMPLEdata structure where the first sample of the block is written
+            elementIndex = Optional array with the index in the EDF buffer of each sample in the block
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            plan = self.decodePlan
+            output = self.SAMPLEdata[index-self.sampleBase:index-self.sampleBase+block.size]
+            columns = plan.settings['sampleColumns']
+            if 'sampleIndex' in columns:
+                output['sampleIndex'] = np.arange(index,index+block.size)
+            if elementIndex is not None and 'elementIndex' in columns:
+                output['elementIndex'] = elementIndex
+            #copy the columns selected by the decode plan, head target data is missing when there is no head tracker
+            self.applyDecodeSteps(output, block, plan.SAMPLE, {'headTarget': block['htype'] != MISSING})
+            if plan.settings['debug']:
+                self.appendDebugBlock(self.debugfile,output,elementIndex)
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with updateSampleBlock: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with updateSampleBlock')
+    def stageSample(self,address,elementIndex):
+        """
+        Copies a raw FSAMPLE structure into the sample staging block. The block is decoded into the SAMPLEdata structure
+        by flushSamples() once it is full.
+        Parameters
+            address = The address of the sample data from edf_get_float_data_address()
+            elementIndex = The index of the sample in the EDF buffer
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            memmove(self.sampleStaging.ctypes.data + self.stagedSamples*FSAMPLEtype.itemsize, address, FSAMPLEtype.itemsize)
+            self.sampleStagingElements[self.stagedSamples] = elementIndex
+            self.stagedSamples += 1
+            self.sampleCount += 1
+            if self.stagedSamples == self.sampleStaging.size:
+                self.flushStaging() if self.debugfile != None else self.flushSamples()
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with stageSample: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with stageSample')
+    def flushSamples(self):
+        """
+        Decodes the samples waiting in the staging block into the SAMPLEdata structure.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            if self.stagedSamples > 0:
+                count = self.stagedSamples
+                self.stagedSamples = 0
+                started = self.profiler.clock() if self.profiler != None else 0
+                self.updateSampleBlock(self.sampleStaging[:count], self.sampleCount-count, self.sampleStagingElements[:count])
+                self.progress.update(self.recordCount())
+                if self.profiler != None:
+                    # count the block for the samples in it, not for the element that flushed it
+                    self.profiler.moveTime(self.profiler.clock() - started, {SAMPLE_TYPE: count})
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with flushSamples: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with flushSamples')
     def appendMessage(self,Data,index):
         """
         Updates event event data in the MESSAGEdata structure.
@@ -893,51 +1472,53 @@ class EDF2numpy:
         Return
             Returns 0 if the operation is successful.
         """
-        decoded = ''
-        offset = 0
         try:
-            self.MESSAGEdata[index]['msgIndex'] = index
-            self.MESSAGEdata[index]['time']=Data.sttime
-            msg = repr(str(Data.message.contents.text,self.options['text_data_type']))
-            self.MESSAGEdata[index]['message'] = np.string_(msg)
-            #for i in msg:
-                #decoded = decoded + i.decode(self.options['text_data_type'])
-            # try:
-                # for i in struct.unpack('<'+str(Data.message.contents.length-1)+'c',repr(str(Data.message.contents.text))):
-                    # print('b')
-                    # msg = msg + i.decode(self.options['text_data_type'])
-                    # print('c')
-            # except:
-                # print('d')
-                # msg = msg + repr(str(Data.message.contents.text,'utf-8'))
+            plan = self.decodePlan
+            row = self.MESSAGEdata[index-self.msgBase]
+            row['msgIndex'] = index
+            #copy the columns selected by the decode plan
+            self.applyDecodeSteps(row, Data, plan.MESSAGE)
+            decoded = str(Data.message.contents.text,plan.settings['textEncoding'])
+            if not plan.settings['compactMessages']:
+                text = repr(decoded)
+                if len(text) > self.MESSAGEdata.dtype['message'].itemsize // 4:
+                    # widen the column instead of truncating the text, the row is in the new array
+                    self.growMessages(len(text))
+                    row = self.MESSAGEdata[index-self.msgBase]
+                row['message'] = np.string_(text)
+            row['TimingCorrected'] = False
             # If integer offset present, adjust timestamp to corrected time value
-            if self.options['msg_offset_enabled'] == 1:
+            if plan.settings['msgOffset']:
                 try:
                     #Check if there is an offset present
                     offset = int(decoded.split(" ")[0])
-                except:
-                    pass
-                #If offset present handle timing correction based on input arguments
-                if offset!=0 and self.options['msg_offset_enabled'] == 1:
-                    self.MESSAGEdata[index]['time']= Data.sttime - int(decoded.split(" ")[0])
-                    self.MESSAGEdata[index]['TimingCorrected'] = True
-                else:
-                    self.MESSAGEdata[index]['time']= Data.sttime
-                    self.MESSAGEdata[index]['TimingCorrected'] = False
-            else:
-                self.MESSAGEdata[index]['time']= Data.sttime
-                self.MESSAGEdata[index]['TimingCorrected'] = False
+                except ValueError:
+                    offset = 0
+                #If offset present handle timing correction
+                if offset!=0:
+                    row['time'] = Data.sttime - offset
+                    row['TimingCorrected'] = True
             #skip data viewer commands based on input arguments
-            if self.options['output_dataviewer_commands'] == 0 and decoded.find('!V')>= 0:
-                self.MESSAGEdata[index]['time'] = MISSING_VALUE
-                self.MESSAGEdata[index]['message'] = MISSING_TEXT
-                self.MESSAGEdata[index]['messageLength'] = MISSING_VALUE
-            #If debugflags enabled add some additional values
-            if self.options['output_data_debugflags'] == 1:
-                self.MESSAGEdata[index]['messageLength'] = Data.message.contents.length
-                self.appendDebugFile(self.debugfile,self.MESSAGEdata[index])
-            else:
-                self.MESSAGEdata[index]['messageLength'] = MISSING_VALUE
+            if plan.settings['maskDataViewer'] and decoded.find('!V')>= 0:
+                row['time'] = MISSING_VALUE
+                decoded = MISSING_TEXT
+                if not plan.settings['compactMessages']:
+                    row['message'] = MISSING_TEXT
+            if plan.settings['compactMessages']:
+                # append the text to the heap and keep its position in the row
+                text = decoded.encode('utf-8')
+                row['textOffset'] = len(self.messageHeap)
+                row['textLength'] = len(text)
+                self.messageHeap += text
+            #If debugflags enabled write the record to the debug file
+            if plan.settings['debug']:
+                # write any staged samples and events first so the debug file stays in chronological order
+                self.flushStaging()
+                if plan.settings['compactMessages']:
+                    # write the text in place of its position, as in the fixed-width layout
+                    self.appendDebugFile(self.debugfile,[row['time'],repr(decoded)] + [row[i] for i in row.dtype.names[3:]])
+                else:
+                    self.appendDebugFile(self.debugfile,row)
             return 0
         except Exception as e:
             raise Exception('An error has occurred with appendMessage: ' + str(e))
@@ -953,15 +1534,16 @@ class EDF2numpy:
             Returns 0 if the operation is successful.
         """
         try:
-            self.IOEVENTdata[index]['ioEventIndex'] = index
-            self.IOEVENTdata[index]['time']= Data.FEVENT.sttime
-            self.IOEVENTdata[index]['IOData']= Data.IOEVENT.data
-            #If debugflags enabled add some additional values
-            if self.options['output_data_debugflags'] ==1:
-                self.IOEVENTdata[index]['iotype']= Data.IOEVENT.itype
-                self.appendDebugFile(self.debugfile,self.IOEVENTdata[index])
-            else:
-                self.IOEVENTdata[index]['iotype']= MISSING_VALUE
+            plan = self.decodePlan
+            row = self.IOEVENTdata[index-self.IOBase]
+            row['ioEventIndex'] = index
+            #copy the columns selected by the decode plan
+            self.applyDecodeSteps(row, Data, plan.IOEVENT)
+            #If debugflags enabled write the record to the debug file
+            if plan.settings['debug']:
+                # write any staged samples and events first so the debug file stays in chronological order
+                self.flushStaging()
+                self.appendDebugFile(self.debugfile,row)
             return 0
         except Exception as e:
             raise Exception('An error has occurred with appendIOEvent: ' + str(e))
@@ -977,41 +1559,288 @@ class EDF2numpy:
             Returns 0 if the operation is successful.
         """
         try:
-            self.RECORDINGdata[index]['recordingIndex'] = index
-            self.RECORDINGdata[index]['samplingRate'] = Data.sample_rate
-            self.RECORDINGdata[index]['eyeTracked'] = EyesTracked[int(Data.eye-1)]
+            plan = self.decodePlan
+            row = self.RECORDINGdata[index-self.recBase]
+            row['recordingIndex'] = index
+            #copy the columns selected by the decode plan
+            self.applyDecodeSteps(row, Data, plan.RECORDING)
+            if plan.settings['categorical']:
+                row['eyeTracked'] = int(Data.eye-1)
+            else:
+                row['eyeTracked'] = EyesTracked[int(Data.eye-1)]
             #parse which eye was tracked
             if int(Data.eye) ==3:
                 self.CurrentEyeTracked = slice(int(Data.eye-1))
             else:
                 self.CurrentEyeTracked = int(Data.eye-1)
-            self.RECORDINGdata[index]['pupilDataType'] = pupilData[int(Data.pupil_type)]
-            self.RECORDINGdata[index]['trackerState'] = recState[int(Data.state)]
-            self.RECORDINGdata[index]['recordType'] = dataTypes[int(Data.record_type)-1]
-            #decode parsedby flags
-            if abs(Data.posType) == PARSEDBY_GAZE:
-                self.RECORDINGdata[index]['parsedbyType'] = 'GAZE'
-            elif abs(Data.posType) == PARSEDBY_HREF:
-                self.RECORDINGdata[index]['parsedbyType'] = 'HREF'
-            elif abs(Data.posType) == PARSEDBY_RAW:
-                self.RECORDINGdata[index]['parsedbyType'] = 'RAW'
-            else:
-                self.RECORDINGdata[index]['parsedbyType'] = 'Unknown.  Please Contact Support@sr-research.com'
-            self.RECORDINGdata[index]['filterType'] = filterType[Data.filter_type]
-            self.RECORDINGdata[index]['recordingMode'] = trackMode[int(Data.recording_mode)]
-            #If debugflags enabled add some additional values
-            if self.options['output_data_debugflags'] == 1:
-                self.RECORDINGdata[index]['endflags'] = Data.eflags
-                self.RECORDINGdata[index]['startflags'] = Data.sflags
-                self.appendDebugFile(self.debugfile,self.RECORDINGdata[index])
+            if plan.settings['categorical']:
+                # write the positions of the values in categories['RECORDINGS']
+                row['pupilDataType'] = int(Data.pupil_type)
+                row['trackerState'] = int(Data.state)
+                row['recordType'] = int(Data.record_type)-1
+                row['parsedbyType'] = parsedbyCodes.get(abs(Data.posType), MISSING_CODE)
+                row['filterType'] = int(Data.filter_type)
+                row['recordingMode'] = int(Data.recording_mode)
             else:
-                self.RECORDINGdata[index]['endflags'] = MISSING_VALUE
-                self.RECORDINGdata[index]['startflags'] = MISSING_VALUE
+                row['pupilDataType'] = pupilData[int(Data.pupil_type)]
+                row['trackerState'] = recState[int(Data.state)]
+                row['recordType'] = dataTypes[int(Data.record_type)-1]
+                #decode parsedby flags
+                if abs(Data.posType) == PARSEDBY_GAZE:
+                    row['parsedbyType'] = 'GAZE'
+                elif abs(Data.posType) == PARSEDBY_HREF:
+                    row['parsedbyType'] = 'HREF'
+                elif abs(Data.posType) == PARSEDBY_RAW:
+                    row['parsedbyType'] = 'RAW'
+                else:
+                    row['parsedbyType'] = 'Unknown.  Please Contact Support@sr-research.com'
+                row['filterType'] = filterType[Data.filter_type]
+                row['recordingMode'] = trackMode[int(Data.recording_mode)]
+            #If debugflags enabled write the record to the debug file
+            if plan.settings['debug']:
+                # write any staged samples and events first so the debug file stays in chronological order
+                self.flushStaging()
+                self.appendDebugFile(self.debugfile,row)
             return 0
         except Exception as e:
             raise Exception('An error has occurred with appendRecording: ' + str(e))
         except:
             raise Exception('An unhandled exception has occurred with appendRecording')
+    def readPreamble(self,edfHandle):
+        """
+        Read the preamble text of the EDF file into the HEADERdata structure
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            # Read in file preamble text
+            preambleTextLength = self.Edfwrapper.edf_get_preamble_text_length(edfHandle) # read EDF preamble text
+            if(preambleTextLength > 0):
+                # Append preamble to header array
+                self.HEADERdata['Header'] = self.Edfwrapper.edf_get_preamble_text(edfHandle,preambleTextLength+1)
+                self.printStatus('Preamble Text:\n####################\n' + str(self.HEADERdata['Header'][0]) + '\n####################')
+                if self.options['output_data_debugflags'] ==1:
+                    # Append to debug file
+                    self.appendDebugFile(self.debugfile,self.HEADERdata['Header'])
+            else:
+                self.printStatus("No preamble text found")
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with readPreamble: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with readPreamble')
+    def decodeElements(self,edfHandle,batchSize=None,elements=None):
+        """
+        Generator that decodes every element of the EDF file into the data arrays, following self.decodePlan.
+        Each record is written to the row of its index minus the index of the first row of its array (sampleBase, eventBase,
+        msgBase, IOBase or recBase), so the arrays may hold the whole file or a single batch.
+        Note: samples and events may still be staged when the generator finishes, call flushStaging() afterwards.
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF
+            batchSize = optional number of rows after which an array is full. None if the arrays hold the whole file.
+            elements = optional iterable of (data type, address) pairs to decode instead of every element of the file, see iterTrialElements()
+        Yields
+            The name of a full array ('RECORDINGS','MESSAGES','SAMPLES','EVENTS' or 'IOEVENTS'). Before the next element is decoded
+            the caller must give the array a new buffer and move its first row index on to the record count, see takeBatch().
+        """
+        try:
+            currentElement = 1
+            elementTypes = self.decodePlan.elementTypes
+            ioEventTypes = self.decodePlan.settings['ioEventTypes']
+            if elements == None:
+                elements = self.iterElements(edfHandle)
+            # Step through the data type and address of each element in the EDF File buffer
+            for DataType, address in elements:
+                if DataType == SAMPLE_TYPE:
+                    # Copy Sample data to the staging block, it is decoded into the SAMPLE Array a block at a time
+                    if DataType in elementTypes:
+                        self.stageSample(address, currentElement)
+                        if self.sampleCount - self.sampleBase == batchSize:
+                            self.flushStaging() if self.debugfile != None else self.flushSamples()
+                            yield 'SAMPLES'
+                elif DataType == STARTPARSE:
+                    continue
+                    # print('this feature is not yet enabled')
+                    # if self.options['output_eventdata_parse']== 1 and self.options['events_enabled']== 1:
+                        # #sparseData = self.Edfwrapper.edf_get_float_data(self.EDFData)
+                elif DataType == ENDPARSE:
+                    continue
+                    # print('this feature is not yet enabled')
+                    # if self.options['output_eventdata_parse']== 1 and self.options['events_enabled']== 1:
+                        # #eparseData = self.Edfwrapper.edf_get_float_data(self.EDFData)
+                elif DataType == BREAKPARSE:
+                    continue
+                    # print('this feature is not yet enabled')
+                    # if self.options['output_eventdata_parse']== 1 and self.options['events_enabled']== 1:
+                        # #bparseData = self.Edfwrapper.edf_get_float_data(self.EDFData)
+                elif DataType in eventNames:
+                    # Copy Blink, Saccade and Fixation data to Event Array
+                    if DataType in elementTypes:
+                        self.stageEvent(address,DataType,currentElement)
+                        if self.eventCount - self.eventBase == batchSize:
+                            self.flushStaging() if self.debugfile != None else self.flushEvents()
+                            yield 'EVENTS'
+                elif DataType == STARTSAMPLES:
+                    # Copy Start Samples to Sample Array
+                    continue
+                    # print('this feature is not yet enabled')
+                    #if self.options['output_sample_start_enabled']== 1 and self.options['samples_enabled']== 1:
+                        # self.SAMPLEdata[self.sampleCount]['elementIndex'] = currentElement
+                        # sSampleData = self.Edfwrapper.edf_get_float_data(self.EDFData).FSAMPLE
+                        # self.updateSample(sSampleData, self.sampleCount)
+                        # self.sampleCount +=1
+                elif DataType == ENDSAMPLES:
+                    # Copy end Samples to Sample Array
+                    continue
+                    # print('this feature is not yet enabled')
+                    #if self.options['output_sample_end_enabled']== 1 and self.options['samples_enabled']== 1:
+                        # self.SAMPLEdata[self.sampleCount]['elementIndex'] = currentElement
+                        # sSampleData = self.Edfwrapper.edf_get_float_data(self.EDFData).FSAMPLE
+                        # self.updateSample(sSampleData, self.sampleCount)
+                        # self.sampleCount +=1
+                elif DataType == STARTEVENTS:
+                    # Copy Start Samples to Event Array
+                    continue
+                    # print('this feature is not yet enabled')
+                    #if self.options['output_eventtype_start']== 1 and self.options['events_enabled']== 1:
+                        # self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
+                        # self.EVENTdata[self.eventCount]['eventType'] = "STARTEVENT"
+                        # startEventData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
+                        # self.updateEvent(startEventData,DataType,self.eventCount)
+                        # self.eventCount +=1
+                elif DataType == ENDEVENTS:
+                    # Copy End Samples to Event Array
+                    continue
+                    # print('this feature is not yet enabled')
+                    #if self.options['output_eventtype_end']== 1 and self.options['events_enabled']== 1:
+                        # self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
+                        # self.EVENTdata[self.eventCount]['eventType'] = "ENDEVENTS"
+                        # endEventData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
+                        # self.updateEvent(endEventData,DataType,self.eventCount)
+                        # self.eventCount +=1
+                elif DataType == MESSAGEEVENT:
+                    # Copy Message data to Message Array
+                    if DataType in elementTypes:
+                        self.MESSAGEdata[self.msgCount-self.msgBase]['elementIndex'] = currentElement
+                        msgData = ALLF_DATA.from_address(address).FEVENT
+                        self.appendMessage(msgData,self.msgCount)
+                        self.msgCount +=1
+                        if self.msgCount - self.msgBase == batchSize:
+                            yield 'MESSAGES'
+                elif DataType == BUTTONEVENT:
+                    # Copy Button data to IOEVENT Array
+                    if DataType in elementTypes:
+                        self.IOEVENTdata[self.IOCount-self.IOBase]['elementIndex'] = currentElement
+                        self.IOEVENTdata[self.IOCount-self.IOBase]['ioEventType'] = ioEventTypes[BUTTONEVENT]
+                        buttData = ALLF_DATA.from_address(address)
+                        self.appendIOEvent(buttData,self.IOCount)
+                        self.IOCount +=1
+                        if self.IOCount - self.IOBase == batchSize:
+                            yield 'IOEVENTS'
+                elif DataType == INPUTEVENT:
+                    # Copy Input data to IOEVENT Array
+                    if DataType in elementTypes:
+                        self.IOEVENTdata[self.IOCount-self.IOBase]['elementIndex'] = currentElement
+                        self.IOEVENTdata[self.IOCount-self.IOBase]['ioEventType'] = ioEventTypes[INPUTEVENT]
+                        inpData = ALLF_DATA.from_address(address)
+                        self.appendIOEvent(inpData,self.IOCount)
+                        self.IOCount +=1
+                        if self.IOCount - self.IOBase == batchSize:
+                            yield 'IOEVENTS'
+                elif DataType == RECORDING_INFO:
+                    # Copy recording data to Recording Array
+                    self.progress.update(self.recordCount())
+                    if DataType in elementTypes:
+                        self.RECORDINGdata[self.recCount-self.recBase]['elementIndex'] = currentElement
+                        recData = ALLF_DATA.from_address(address).RECORDINGS
+                        self.appendRecording(recData,self.recCount)
+                        self.recCount += 1
+                        if self.recCount - self.recBase == batchSize:
+                            yield 'RECORDINGS'
+                else:
+                    raise Exception("Unknown data type #: " + str(DataType) + '@element#' + str(currentElement))
+                    break
+                currentElement +=1
+        except Exception as e:
+            raise Exception('An error has occurred with decodeElements: ' + str(e))
+    def printStatus(self,text):
+        """
+        Print a status line of a read if options['verbose_enabled'] is 1. Errors and warnings are printed regardless.
+        Parameters
+            text = the status line
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if self.options['verbose_enabled'] == 1:
+            print(text)
+        return 0
+    def beginProgress(self,edfFilename):
+        """
+        Clear the phase timings of .progress before a file is read. Progress is printed with printProgress() if
+        options['progress_enabled'] is 1 and no progress.callback is set.
+        Parameters
+            edfFilename = the path/filename of the EDF
+        Return
+            Returns 0 if the operation is successful.
+        """
+        return self.progress.begin(edfFilename, printProgress if self.options['progress_enabled'] == 1 else None)
+    def beginProfile(self):
+        """
+        Create a new ElementProfiler in .profiler before a file is read if options['profile_enabled'] is 1.
+        Return
+            Returns the ElementProfiler, or None if profiling is disabled
+        """
+        self.profiler = ElementProfiler() if self.options['profile_enabled'] == 1 else None
+        return self.profiler
+    def endProfile(self,edfFilename):
+        """
+        Print the summary of .profiler through printStatus() and write its Chrome trace next to the EDF as
+        <EDF name>.trace.json. The summary is also in .profiler.formatSummary() when verbose_enabled is off.
+        Parameters
+            edfFilename = the path/filename of the EDF that was read
+        Return
+            Returns the name of the trace file, or None if profiling is disabled
+        """
+        try:
+            if self.profiler == None:
+                return None
+            self.printStatus(self.profiler.formatSummary())
+            return self.profiler.writeTrace(os.path.join(os.path.dirname(edfFilename),os.path.basename(edfFilename).split('.')[0] +'.trace.json'))
+        except Exception as e:
+            raise Exception('An error has occurred with endProfile: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with endProfile')
+    def iterElements(self,edfHandle,elementTypes=None):
+        """
+        Get the generator of (data type, address) pairs the decode loop reads, EDFACCESSwrapper.iterElements() or the timed
+        ElementProfiler.iterElements() when .profiler is set. The choice is made once per pass, not for every element.
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF
+            elementTypes = optional set of element types to yield, see EDFACCESSwrapper.iterElements()
+        Return
+            Returns the generator
+        """
+        if self.profiler != None:
+            return self.profiler.iterElements(self.Edfwrapper, edfHandle, elementTypes)
+        return self.Edfwrapper.iterElements(edfHandle, elementTypes)
+    def loadIndex(self,edfFilename):
+        """
+        Load the sidecar index of an EDF into .index if options['index_enabled'] is 1, building it first if it is missing or
+        out of date (see EDF2numpyIndex). The index is used to size the data arrays and to find the trial holding a time.
+        Parameters
+            edfFilename = the path/filename of the EDF
+        Return
+            Returns the EDF2numpyIndex, or None if the index is disabled
+        """
+        try:
+            self.index = openIndex(self, edfFilename) if self.options['index_enabled'] == 1 else None
+            return self.index
+        except Exception as e:
+            raise Exception('An error has occurred with loadIndex: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with loadIndex')
     def readEDF(self,edfFilename):
         """
         Read in and parse EDF file into data structures
@@ -1021,194 +1850,47 @@ class EDF2numpy:
         Return
             Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
         """
-        print('...Attempting to read in data...')
-        # Resize empty arrays to appropriate size
-        self.prealocateArraySize(edfFilename)
-        # Import the contents of the EDF file
-        self.EDFData = self.openEDF(edfFilename)
+        if self.options['capture_enabled'] == 1:
+            # convert from the capture of the EDF, capturing it first on its first read
+            return self.readCapture(openCapture(self, edfFilename))
+        self.printStatus('...Attempting to read in data...')
+        # Compile the options once for this file
+        self.beginProgress(edfFilename)
+        self.beginProfile()
+        self.compileDecodePlan()
+        self.loadIndex(edfFilename)
+        # no handle yet, so a failed open only closes the debug file
+        self.EDFData = None
         try:
+            if self.options['single_pass_enabled'] == 1:
+                # Import the contents of the EDF file once, then size the arrays from the same handle
+                self.EDFData = self.openEDF(edfFilename)
+                self.prealocateArraySize(edfFilename, self.EDFData)
+            else:
+                # Resize empty arrays to appropriate size
+                self.prealocateArraySize(edfFilename)
+                # Import the contents of the EDF file
+                self.EDFData = self.openEDF(edfFilename)
             if (self.EDFData != None):
                 # Read in file preamble text
-                preambleTextLength = self.Edfwrapper.edf_get_preamble_text_length(self.EDFData) # read EDF preamble text
-                if(preambleTextLength > 0):
-                    # Append preamble to header array
-                    self.HEADERdata['Header'] = self.Edfwrapper.edf_get_preamble_text(self.EDFData,preambleTextLength+1)
-                    if self.options['output_data_debugflags'] ==1: 
-                        # Append to debug file
-                        self.appendDebugFile(self.debugfile,self.HEADERdata['Header'])
-                else:
-                    print("No preamble text found")
-                print('...Attempting to read contents of EDF...')
-                sys.stdout.write('.')
+                self.readPreamble(self.EDFData)
+                self.printStatus('...Attempting to read contents of EDF...')
                 if self.trialCount > 0:
-                    currentElement = 1
-                    while(True):
-                        # Get the data type of the current element in the EDF File buffer
-                        DataType = self.Edfwrapper.edf_get_next_data(self.EDFData)
-                        if DataType == STARTPARSE:
-                            continue
-                            # print('this feature is not yet enabled')
-                            # if self.options['output_eventdata_parse']== 1 and self.options['events_enabled']== 1:
-                                # #sparseData = self.Edfwrapper.edf_get_float_data(self.EDFData)
-                        elif DataType == ENDPARSE:
-                            continue
-                            # print('this feature is not yet enabled')
-                            # if self.options['output_eventdata_parse']== 1 and self.options['events_enabled']== 1:
-                                # #eparseData = self.Edfwrapper.edf_get_float_data(self.EDFData)
-                        elif DataType == BREAKPARSE:
-                            continue
-                            # print('this feature is not yet enabled')
-                            # if self.options['output_eventdata_parse']== 1 and self.options['events_enabled']== 1:
-                                # #bparseData = self.Edfwrapper.edf_get_float_data(self.EDFData)
-                        elif DataType == STARTBLINK:
-                            # Copy Start Blink data to Event Array
-                            if self.options['output_eventtype_blink']==1 and self.options['output_eventtype_start']==1 and self.options['events_enabled']==1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "STARTBLINK"
-                                sblinkData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(sblinkData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == ENDBLINK:
-                            # Copy End Blink data to Event Array
-                            if self.options['output_eventtype_blink']== 1 and self.options['output_eventtype_end']==1 and self.options['events_enabled']== 1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "ENDBLINK"
-                                eblinkData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(eblinkData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == STARTSACC:
-                            # Copy Start Saccade data to Event Array
-                            if self.options['output_eventtype_saccade']== 1 and self.options['output_eventtype_start']==1 and self.options['events_enabled']== 1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "STARTSACC"
-                                ssaccData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(ssaccData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == ENDSACC:
-                            # Copy End Saccade data to Event Array
-                            if self.options['output_eventtype_saccade']== 1 and self.options['output_eventtype_end']==1 and self.options['events_enabled']== 1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "ENDSACC"
-                                esaccData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(esaccData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == STARTFIX:
-                            # Copy Start Fixation data to Event Array
-                            if self.options['output_eventtype_fixation']==1 and self.options['output_eventtype_start']==1 and self.options['events_enabled']==1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "STARTFIX"
-                                sfixData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(sfixData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == ENDFIX:
-                            # Copy End Fixation data to Event Array
-                            if self.options['output_eventtype_fixation']== 1 and self.options['output_eventtype_end']==1 and self.options['events_enabled']== 1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "ENDFIX"
-                                efixData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(efixData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == FIXUPDATE:
-                            # Copy Fixation Update data to Event Array
-                            if self.options['output_eventtype_fixupdate']== 1 and self.options['events_enabled']== 1:
-                                self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                self.EVENTdata[self.eventCount]['eventType'] = "FIXUPDATE"
-                                fixupdateData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.updateEvent(fixupdateData,DataType,self.eventCount)
-                                self.eventCount +=1
-                        elif DataType == STARTSAMPLES:
-                            # Copy Start Samples to Sample Array
-                            continue
-                            # print('this feature is not yet enabled')
-                            #if self.options['output_sample_start_enabled']== 1 and self.options['samples_enabled']== 1:
-                                # self.SAMPLEdata[self.sampleCount]['elementIndex'] = currentElement
-                                # sSampleData = self.Edfwrapper.edf_get_float_data(self.EDFData).FSAMPLE
-                                # self.updateSample(sSampleData, self.sampleCount)
-                                # self.sampleCount +=1
-                        elif DataType == ENDSAMPLES:
-                            # Copy end Samples to Sample Array
-                            continue
-                            # print('this feature is not yet enabled')
-                            #if self.options['output_sample_end_enabled']== 1 and self.options['samples_enabled']== 1:
-                                # self.SAMPLEdata[self.sampleCount]['elementIndex'] = currentElement
-                                # sSampleData = self.Edfwrapper.edf_get_float_data(self.EDFData).FSAMPLE
-                                # self.updateSample(sSampleData, self.sampleCount)
-                                # self.sampleCount +=1
-                        elif DataType == STARTEVENTS:
-                            # Copy Start Samples to Event Array
-                            continue
-                            # print('this feature is not yet enabled')
-                            #if self.options['output_eventtype_start']== 1 and self.options['events_enabled']== 1:
-                                # self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                # self.EVENTdata[self.eventCount]['eventType'] = "STARTEVENT"
-                                # startEventData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                # self.updateEvent(startEventData,DataType,self.eventCount)
-                                # self.eventCount +=1
-                        elif DataType == ENDEVENTS:
-                            # Copy End Samples to Event Array
-                            continue
-                            # print('this feature is not yet enabled')
-                            #if self.options['output_eventtype_end']== 1 and self.options['events_enabled']== 1:
-                                # self.EVENTdata[self.eventCount]['elementIndex'] = currentElement
-                                # self.EVENTdata[self.eventCount]['eventType'] = "ENDEVENTS"
-                                # endEventData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                # self.updateEvent(endEventData,DataType,self.eventCount)
-                                # self.eventCount +=1
-                        elif DataType == MESSAGEEVENT:
-                            # Copy Message data to Message Array
-                            if self.options['messages_enabled']== 1 and self.options['events_enabled']== 1:
-                                self.MESSAGEdata[self.msgCount]['elementIndex'] = currentElement
-                                msgData = self.Edfwrapper.edf_get_float_data(self.EDFData).FEVENT
-                                self.appendMessage(msgData,self.msgCount)
-                                self.msgCount +=1
-                        elif DataType == BUTTONEVENT:
-                            # Copy Button data to IOEVENT Array
-                            if self.options['ioevents_enabled']== 1 and self.options['events_enabled']== 1:
-                                self.IOEVENTdata[self.IOCount]['elementIndex'] = currentElement
-                                self.IOEVENTdata[self.IOCount]['ioEventType'] = "BUTTONEVENT"
-                                buttData = self.Edfwrapper.edf_get_float_data(self.EDFData)
-                                self.appendIOEvent(buttData,self.IOCount)
-                                self.IOCount +=1
-                        elif DataType == INPUTEVENT:
-                            # Copy Input data to IOEVENT Array
-                            if self.options['ioevents_enabled']== 1 and self.options['events_enabled']== 1:
-                                self.IOEVENTdata[self.IOCount]['elementIndex'] = currentElement
-                                self.IOEVENTdata[self.IOCount]['ioEventType'] = "INPUTEVENT"
-                                inpData = self.Edfwrapper.edf_get_float_data(self.EDFData)
-                                self.appendIOEvent(inpData,self.IOCount)
-                                self.IOCount +=1
-                        elif DataType == RECORDING_INFO:
-                            # Copy recording data to Recording Array
-                            sys.stdout.write('. ')
-                            sys.stdout.flush()
-                            if self.options['recinfo_enabled'] == 1:
-                                self.RECORDINGdata[self.recCount]['elementIndex'] = currentElement
-                                recData = self.Edfwrapper.edf_get_float_data(self.EDFData).RECORDINGS
-                                self.appendRecording(recData,self.recCount)
-                                self.recCount += 1
-                        elif DataType == SAMPLE_TYPE:
-                            # Copy Sample data to SAMPLE Array
-                            if self.options['samples_enabled']== 1:
-                                self.SAMPLEdata[self.sampleCount]['elementIndex'] = currentElement
-                                self.SAMPLEdata[self.sampleCount]['sampleIndex'] = self.sampleCount
-                                sampleData = self.Edfwrapper.edf_get_float_data(self.EDFData).FSAMPLE
-                                self.updateSample(sampleData, self.sampleCount)
-                                self.sampleCount +=1
-                        elif DataType == NO_PENDING_ITEMS:
-                            # Terminate because there is no data left in the buffer
-                            sys.stdout.write('\n')
-                            sys.stdout.flush()
-                            print('Converted successfully: ' + str(int(self.trialCount/2)) + ' Trials; ' + str(self.sampleCount) + ' Samples; ' + str(self.eventCount) + ' Events; ' + str(self.msgCount) + ' Messages; ' + str(self.IOCount) + ' Input Events ')
-                            #remove empty records arrays if items were skipped
-                            self.trimArray()
-                            #copy individual arrays to master array
-                            self.MASTERdata = np.array([self.HEADERdata,self.RECORDINGdata,self.MESSAGEdata, self.SAMPLEdata,self.EVENTdata,self.IOEVENTdata],dtype=object)
-                            self.closeEDF(self.EDFData)
-                            return self.MASTERdata
-                        else:
-                            raise Exception("Unknown data type #: " + str(DataType) + '@element#' + str(currentElement))
-                            break
-                        currentElement +=1
+                    self.progress.start('decode')
+                    # The arrays are sized for the whole file, so no array is ever reported as full
+                    for table in self.decodeElements(self.EDFData):
+                        pass
+                    # Terminate because there is no data left in the buffer
+                    self.flushStaging()
+                    self.progress.end('decode', self.recordCount(), self.allocatedBytes())
+                    self.endProfile(edfFilename)
+                    self.printStatus('Converted successfully: ' + str(int(self.trialCount/2)) + ' Trials; ' + str(self.sampleCount) + ' Samples; ' + str(self.eventCount) + ' Events; ' + str(self.msgCount) + ' Messages; ' + str(self.IOCount) + ' Input Events ')
+                    #remove empty records arrays if items were skipped
+                    self.trimArray()
+                    #copy individual arrays to master array
+                    self.MASTERdata = np.array([self.HEADERdata,self.RECORDINGdata,self.MESSAGEdata, self.SAMPLEdata,self.EVENTdata,self.IOEVENTdata],dtype=object)
+                    self.closeEDF(self.EDFData)
+                    return self.MASTERdata
                 else:
                     raise Exception('No trials detected! Please make sure that you preallocate the data arrays prior to running the readEDF function.')
             else:
@@ -1219,4 +1901,561 @@ class EDF2numpy:
         except:
             self.closeEDF(self.EDFData)
             raise Exception('An unhandled exception has occurred with readEDF')
-
+    def readHeader(self,edfFilename):
+        """
+        Read only the preamble text of an EDF file into HEADERdata. The EDF is opened without events and samples, or the
+        preamble is taken from the capture of the EDF if capture_enabled is set.
+        Parameters
+            edfFilename = the path/filename of the EDF
+        Return
+            Returns HEADERdata
+        """
+        try:
+            if self.options['capture_enabled'] == 1:
+                self.HEADERdata['Header'] = openCapture(self, edfFilename).preamble
+                return self.HEADERdata
+            if not os.path.isfile(edfFilename):
+                raise Exception(str(edfFilename)+' is not a valid EDF filename')
+            edfHandle = self.Edfwrapper.openFile(edfFilename, self.consistencyArgs, 0, 0)
+            try:
+                length = self.Edfwrapper.edf_get_preamble_text_length(edfHandle)
+                if length > 0:
+                    self.HEADERdata['Header'] = self.Edfwrapper.edf_get_preamble_text(edfHandle,length+1)
+            finally:
+                self.Edfwrapper.edf_close_file(edfHandle)
+            return self.HEADERdata
+        except Exception as e:
+            raise Exception('An error has occurred with readHeader: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with readHeader')
+    def readResult(self,edfFilename):
+        """
+        Open an EDF file as an EDF2numpyResult, whose data arrays are only read when they are first used. Tables that are
+        never used are never decoded, and tables disabled in self.options are never read at all.
+        Note: the result reads the EDF with a copy of self.options, later changes to the options do not change it.
+        Parameters
+            edfFilename = the path/filename of the EDF you want to extract the contents of
+        Return
+            Returns the EDF2numpyResult
+        """
+        if not os.path.isfile(edfFilename):
+            raise Exception('An error has occurred with readResult: ' + str(edfFilename)+' is not a valid EDF filename')
+        return EDF2numpyResult(self, edfFilename)
+    def readCapture(self,capture):
+        """
+        Read in and parse the capture of an EDF file (see EDF2numpyCapture) into data structures, without the EDF Access API.
+        The result is the same as readEDF() of the captured EDF with the same options, so a study can be converted again with
+        other options from its captures alone.
+        Parameters
+            capture = an EDF2numpyCapture, or the path/filename of a capture file (<EDF name>.edfcap)
+        Return
+            Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
+        """
+        self.printStatus('...Attempting to read in capture...')
+        if not isinstance(capture, EDF2numpyCapture):
+            capture = loadCapture(capture)
+        self.beginProgress(capture.captureFilename)
+        self.profiler = None
+        self.compileDecodePlan()
+        try:
+            self.progress.start('open')
+            if self.options['output_data_debugflags'] ==1:
+                self.debugfile = self.openDebugFile(os.path.join(os.path.dirname(capture.captureFilename),os.path.basename(capture.captureFilename).split('.')[0] +'.debug'))
+            self.progress.end('open')
+            # the capture holds the number of elements of each data type, so it sizes the arrays in place of the index
+            index = self.index
+            self.index = capture
+            try:
+                self.prealocateArraySize(capture.captureFilename)
+            finally:
+                self.index = index
+            self.HEADERdata['Header'] = capture.preamble
+            if self.options['output_data_debugflags'] ==1:
+                self.appendDebugFile(self.debugfile,self.HEADERdata['Header'])
+            self.printStatus('...Attempting to read contents of capture...')
+            if self.trialCount > 0:
+                self.progress.start('decode')
+                self.decodeCapture(capture)
+                self.progress.end('decode', self.recordCount(), self.allocatedBytes())
+                self.printStatus('Converted successfully: ' + str(int(self.trialCount/2)) + ' Trials; ' + str(self.sampleCount) + ' Samples; ' + str(self.eventCount) + ' Events; ' + str(self.msgCount) + ' Messages; ' + str(self.IOCount) + ' Input Events ')
+                #remove empty records arrays if items were skipped
+                self.trimArray()
+                #copy individual arrays to master array
+                self.MASTERdata = np.array([self.HEADERdata,self.RECORDINGdata,self.MESSAGEdata, self.SAMPLEdata,self.EVENTdata,self.IOEVENTdata],dtype=object)
+                self.closeEDF(None)
+                return self.MASTERdata
+            else:
+                raise Exception('No trials detected! The capture ' + str(capture.captureFilename) + ' holds no trials.')
+        except Exception as e:
+            self.closeEDF(None)
+            raise Exception('An error has occurred with readCapture: ' + str(e))
+        except:
+            self.closeEDF(None)
+            raise Exception('An unhandled exception has occurred with readCapture')
+    def decodeCapture(self,capture):
+        """
+        Decode the elements of a capture into the data arrays, following self.decodePlan. Samples and events are decoded
+        straight from the memory maps of the capture with updateSampleBlock() and updateEventBlock(), sampleBlockSize and
+        eventBlockSize rows at a time. Each array is filled in one go, unless a debug file is written: then the elements are
+        decoded in runs that are split at every message, IO event and recording, so the debug file stays in the order of the
+        EDF. The samples and events of a run are decoded in blocks of each kind and merged in the debug file, see
+        appendDebugGroup().
+        Parameters
+            capture = the loaded EDF2numpyCapture
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            plan = self.decodePlan
+            ioEventTypes = plan.settings['ioEventTypes']
+            types = np.asarray(capture.elements['type'])
+            rows = np.asarray(capture.elements['row'])
+            # the elementIndex column of each element, as counted by decodeElements(). The capture holds samples and events
+            # even if they are not loaded, these are left out of the count as the EDF API would not return them.
+            uncounted = list(uncountedTypes)
+            if self.options['samples_enabled'] == 0:
+                uncounted += tableElementTypes['SAMPLES']
+            if self.options['events_enabled'] == 0:
+                uncounted += tableElementTypes['EVENTS']
+            elementIndex = np.cumsum(~np.isin(types, uncounted))
+            # the data array each element is decoded into, -1 for elements that are skipped
+            tables = list(tableElementTypes)
+            lookup = np.full(SAMPLE_TYPE + 1, -1, dtype='i1')
+            for code, table in enumerate(tables):
+                lookup[[i for i in tableElementTypes[table] if i in plan.elementTypes]] = code
+            elementTables = lookup[types]
+            positions = np.flatnonzero(elementTables >= 0)
+            sampleCode = tables.index('SAMPLES')
+            eventCode = tables.index('EVENTS')
+            if plan.settings['debug']:
+                # samples and events share a run, every other element starts a new one
+                kinds = np.where(np.isin(elementTables[positions], [sampleCode, eventCode]), -1, elementTables[positions])
+                runs = np.split(positions, np.flatnonzero(np.diff(kinds) | (kinds[1:] >= 0)) + 1)
+                # long runs are merged into the debug file a block of samples at a time
+                runs = [run[start:start+self.sampleBlockSize] for run in runs for start in range(0, run.size, self.sampleBlockSize)]
+            else:
+                runs = [positions[elementTables[positions] == code] for code in range(len(tables))]
+            for run in runs:
+                if run.size == 0:
+                    continue
+                table = tables[elementTables[run[0]]]
+                if table == 'SAMPLES' or table == 'EVENTS':
+                    if plan.settings['debug']:
+                        self.debugGroup = []
+                    try:
+                        # the samples of a run are consecutive rows of the sample table
+                        samples = run[elementTables[run] == sampleCode]
+                        for start in range(0, samples.size, self.sampleBlockSize):
+                            part = samples[start:start+self.sampleBlockSize]
+                            self.updateSampleBlock(capture.samples[rows[part[0]]:rows[part[-1]]+1], self.sampleCount, elementIndex[part])
+                            self.sampleCount += part.size
+                            self.progress.update(self.recordCount())
+                        events = run[elementTables[run] == eventCode]
+                        for start in range(0, events.size, self.eventBlockSize):
+                            part = events[start:start+self.eventBlockSize]
+                            self.updateEventBlock(capture.records[rows[part]], types[part], self.eventCount, elementIndex[part])
+                            self.eventCount += part.size
+                    finally:
+                        group, self.debugGroup = self.debugGroup, None
+                    if group != None:
+                        self.appendDebugGroup(self.debugfile, group)
+                else:
+                    # messages, IO events and recordings are decoded one at a time like decodeElements() does
+                    buffer, addresses = capture.elementData(run)
+                    for position, address in zip(run.tolist(), addresses.tolist()):
+                        if table == 'MESSAGES':
+                            self.MESSAGEdata[self.msgCount-self.msgBase]['elementIndex'] = elementIndex[position]
+                            self.appendMessage(ALLF_DATA.from_address(address).FEVENT,self.msgCount)
+                            self.msgCount +=1
+                        elif table == 'IOEVENTS':
+                            self.IOEVENTdata[self.IOCount-self.IOBase]['elementIndex'] = elementIndex[position]
+                            self.IOEVENTdata[self.IOCount-self.IOBase]['ioEventType'] = ioEventTypes[int(types[position])]
+                            self.appendIOEvent(ALLF_DATA.from_address(address),self.IOCount)
+                            self.IOCount +=1
+                        else:
+                            self.RECORDINGdata[self.recCount-self.recBase]['elementIndex'] = elementIndex[position]
+                            self.appendRecording(ALLF_DATA.from_address(address).RECORDINGS,self.recCount)
+                            self.recCount += 1
+                            self.progress.update(self.recordCount())
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with decodeCapture: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with decodeCapture')
+    def allocateBatchArrays(self,batchSize):
+        """
+        Allocate data arrays of batchSize rows for iterBatches(), instead of sizing them for the whole file.
+        Note: without compact_messages_enabled the message column is sized for the longest message of the index when one is
+        loaded, otherwise for 256 characters, and widened by growMessages() when a longer message is decoded.
+        Parameters
+            batchSize = the number of rows of each data array
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            self.RECORDINGdata = np.empty(batchSize,dtype=self.outputType('RECORDINGS')) if self.tableEnabled('RECORDINGS') else None
+            if self.tableEnabled('MESSAGES'):
+                self.MESSAGETtype = self.messageType('<U'+str(self.index.maxMessageLength if self.index != None else 256))
+                self.MESSAGEdata = np.empty(batchSize,dtype=self.MESSAGETtype)
+            else:
+                self.MESSAGEdata = None
+            self.EVENTdata = np.empty(batchSize,dtype=self.outputType('EVENTS')) if self.tableEnabled('EVENTS') else None
+            self.SAMPLEdata = np.empty(batchSize,dtype=self.outputType('SAMPLES')) if self.tableEnabled('SAMPLES') else None
+            self.IOEVENTdata = np.empty(batchSize,dtype=self.outputType('IOEVENTS')) if self.tableEnabled('IOEVENTS') else None
+            self.allocateStaging(batchSize, batchSize)
+            self.resetCounters()
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with allocateBatchArrays: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with allocateBatchArrays')
+    def takeBatch(self,table,batchSize):
+        """
+        Hand over the rows decoded into a data array since the last batch and give the array a new buffer.
+        Parameters
+            table = the name of the data array: 'RECORDINGS','MESSAGES','SAMPLES','EVENTS' or 'IOEVENTS'
+            batchSize = the number of rows of the new buffer
+        Return
+            Returns the structured numpy array of decoded rows, or None if the data array is disabled.
+        """
+        try:
+            data, count, base = batchTables[table]
+            rows = getattr(self, data)
+            if rows is None:
+                return None
+            batch = rows[:getattr(self, count) - getattr(self, base)]
+            if table == 'MESSAGES' and self.options['compact_messages_enabled']==1:
+                # the batch takes the text heap with it and the next batch starts a new one
+                batch = MessageArray(batch, self.messageHeap)
+                self.messageHeap = bytearray()
+            # the batch keeps the old buffer and decoding continues in a new one
+            setattr(self, data, np.empty(batchSize,dtype=rows.dtype))
+            setattr(self, base, getattr(self, count))
+            return batch
+        except Exception as e:
+            raise Exception('An error has occurred with takeBatch: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with takeBatch')
+    def iterBatches(self,edfFilename,batchSize=65536):
+        """
+        Read in and parse EDF file as a stream of record batches, so that memory use is bounded by the batch size instead of
+        the length of the recording. The file is read once, without the counting pass of prealocateArraySize().
+        Note: Make sure to consume any input arguments before running this function to make sure self.options is updated
+        Parameters
+            edfFilename = the path/filename of the EDF you want to extract the contents of
+            batchSize = the largest number of rows in a batch
+        Note: the start and end times of the trials are in self.trials once the 'HEADER' batch has been yielded
+        Yields
+            (table, batch) pairs, where table is 'HEADER','RECORDINGS','MESSAGES','SAMPLES','EVENTS' or 'IOEVENTS' and batch is a
+            structured numpy array with the schema of the matching readEDF() array. Full batches are yielded as soon as they are
+            decoded, followed by the partial batches left at the end of the file. The caller may keep every batch it receives.
+        """
+        self.printStatus('...Attempting to stream data...')
+        # Compile the options once for this file
+        self.beginProgress(edfFilename)
+        self.beginProfile()
+        self.compileDecodePlan()
+        self.EDFData = self.openEDF(edfFilename)
+        try:
+            self.trialCount = self.Edfwrapper.edf_get_trial_count(self.EDFData)
+            if self.trialCount <= 0:
+                raise Exception('No trials detected!')
+            self.trials = self.readTrialTimes(self.EDFData)
+            self.allocateBatchArrays(batchSize)
+            self.readPreamble(self.EDFData)
+            yield 'HEADER', self.HEADERdata
+            self.progress.start('decode')
+            for table in self.decodeElements(self.EDFData, batchSize):
+                yield table, self.takeBatch(table, batchSize)
+            # hand over the partial batches left at the end of the file
+            self.flushStaging()
+            self.progress.end('decode', self.recordCount(), self.allocatedBytes())
+            self.endProfile(edfFilename)
+            for table in ['RECORDINGS','MESSAGES','SAMPLES','EVENTS','IOEVENTS']:
+                batch = self.takeBatch(table, 0)
+                if batch is not None and batch.size > 0:
+                    yield table, batch
+            self.printStatus('Streamed successfully: ' + str(int(self.trialCount/2)) + ' Trials; ' + str(self.sampleCount) + ' Samples; ' + str(self.eventCount) + ' Events; ' + str(self.msgCount) + ' Messages; ' + str(self.IOCount) + ' Input Events ')
+        except Exception as e:
+            raise Exception('An error has occurred with iterBatches: ' + str(e))
+        finally:
+            # also runs when the caller stops iterating early
+            self.closeEDF(self.EDFData)
+    def iterTrialElements(self,edfHandle,trial):
+        """
+        Generator that jumps to the start of a trial and steps through the data type and address of its elements only.
+        The trial ends at the end time reported by edf_get_trial_header(), every ALLF_DATA structure starts with the time of the element.
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF
+            trial = the trial number, between 0 and edf_get_trial_count()-1
+        Yields
+            (data type, address of the ALLF_DATA structure) for each element of the trial
+        """
+        try:
+            if self.Edfwrapper.edf_jump_to_trial(edfHandle, trial) != 0:
+                raise Exception('Could not jump to trial ' + str(trial))
+            header = TRIAL()
+            if self.Edfwrapper.edf_get_trial_header(edfHandle, byref(header)) != 0:
+                raise Exception('Could not read the header of trial ' + str(trial))
+            endTime = header.endtime
+            for DataType, address in self.iterElements(edfHandle):
+                if address != None and c_uint32.from_address(address).value > endTime:
+                    return
+                yield DataType, address
+        except Exception as e:
+            raise Exception('An error has occurred with iterTrialElements: ' + str(e))
+    def compileFilters(self,startTime=None,endTime=None,eventTypes=None,eye=None,messagePattern=None):
+        """
+        Compile the predicates of readFiltered() into an ElementFilter.
+        Parameters
+            startTime = optional time in milliseconds, elements before it are skipped
+            endTime = optional time in milliseconds, the elements after it are never read
+            eventTypes = optional list of parser event types to keep, by name (e.g. 'ENDFIX') or EDF data type code
+            eye = optional eye of the events to keep: LEFT_EYE, RIGHT_EYE, 'Left' or 'Right'
+            messagePattern = optional regular expression, only the messages it matches (re.search) are kept
+        Return
+            Returns the ElementFilter
+        """
+        try:
+            if eventTypes != None:
+                codes = dict([(eventNames[i], i) for i in eventNames])
+                eventTypes = frozenset([codes.get(i, i) for i in eventTypes])
+            if type(eye) == str:
+                eye = EyesTracked.index(eye)
+            if type(messagePattern) == str:
+                # the message text is searched as the raw bytes of the EDF, before it is decoded
+                messagePattern = messagePattern.encode(self.options['text_data_type'])
+            if messagePattern != None:
+                messagePattern = re.compile(messagePattern)
+            return ElementFilter(startTime, endTime, eventTypes, eye, messagePattern)
+        except Exception as e:
+            raise Exception('An error has occurred with compileFilters: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with compileFilters')
+    def filterElements(self,elements,filters):
+        """
+        Generator that passes on the elements that match an ElementFilter. Only the time, the event type, the eye and the
+        message text of an element are read, so the elements that are dropped are never decoded.
+        Recording info before the time window is kept so the recording of the first samples of the window is known.
+        Parameters
+            elements = iterable of (data type, address) pairs, see iterElements() and iterTrialElements()
+            filters = the ElementFilter from compileFilters()
+        Yields
+            (data type, address of the ALLF_DATA structure) for each element that matches the filter. The generator stops at
+            the first element after the end of the time window.
+        """
+        try:
+            startTime, endTime, eventTypes, eye, messagePattern = filters
+            eyeOffset = FEVENT.eye.offset
+            for DataType, address in elements:
+                if address != None and (startTime != None or endTime != None):
+                    # every ALLF_DATA structure starts with the time of the element
+                    time = c_uint32.from_address(address).value
+                    if endTime != None and time > endTime:
+                        return
+                    if startTime != None and time < startTime and DataType != RECORDING_INFO:
+                        continue
+                if DataType in eventNames:
+                    if eventTypes != None and DataType not in eventTypes:
+                        continue
+                    if eye != None and c_int16.from_address(address + eyeOffset).value != eye:
+                        continue
+                elif DataType == MESSAGEEVENT and messagePattern != None:
+                    if messagePattern.search(ALLF_DATA.from_address(address).FEVENT.message.contents.text) == None:
+                        continue
+                yield DataType, address
+        except Exception as e:
+            raise Exception('An error has occurred with filterElements: ' + str(e))
+    def trialTimes(self,edfHandle,trial):
+        """
+        Read the start and end time of a trial from its header. The file is left at the start of the trial.
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF
+            trial = the trial number, between 0 and edf_get_trial_count()-1
+        Return
+            Returns (start time, end time) in milliseconds, or None if the trial cannot be reached
+        """
+        try:
+            if self.Edfwrapper.edf_jump_to_trial(edfHandle, trial) != 0:
+                return None
+            header = TRIAL()
+            if self.Edfwrapper.edf_get_trial_header(edfHandle, byref(header)) != 0:
+                return None
+            return header.starttime, header.endtime
+        except Exception as e:
+            raise Exception('An error has occurred with trialTimes: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with trialTimes')
+    def readTrialTimes(self,edfHandle):
+        """
+        Read the start and end time of every trial from the trial headers, then rewind the file to where it was with a bookmark.
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF
+        Return
+            Returns a list of (start time, end time) in milliseconds, one per trial
+        """
+        try:
+            bookmark = BOOKMARK()
+            if self.Edfwrapper.edf_set_bookmark(edfHandle, byref(bookmark)) != 0:
+                raise Exception('Could not bookmark the EDF file')
+            times = []
+            for trial in range(self.Edfwrapper.edf_get_trial_count(edfHandle)):
+                trialTimes = self.trialTimes(edfHandle, trial)
+                if trialTimes == None:
+                    break
+                times.append(trialTimes)
+            if self.Edfwrapper.edf_goto_bookmark(edfHandle, byref(bookmark)) != 0:
+                raise Exception('Could not rewind the EDF file')
+            self.Edfwrapper.edf_free_bookmark(edfHandle, byref(bookmark))
+            return times
+        except Exception as e:
+            raise Exception('An error has occurred with readTrialTimes: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with readTrialTimes')
+    def seekTime(self,edfHandle,startTime):
+        """
+        Move an open EDF file to the start of the last trial that starts at or before startTime, so that reading on from
+        there reaches startTime without stepping through the earlier trials. The trial is found with a binary search over
+        the trial headers and reached with edf_goto_trial_with_start_time(). The file stays at its current position if
+        startTime is before the first trial. With an index from loadIndex() the trial is looked up in the index and reached
+        with edf_jump_to_trial() instead.
+        Parameters
+            edfHandle = the pointer to the EDF file created by openEDF, at the start of the file
+            startTime = the time in milliseconds
+        Return
+            Returns the trial number the file was moved to, or None if it was not moved
+        """
+        try:
+            if self.index != None:
+                trial = self.index.trialAt(startTime)
+                if trial != None and self.Edfwrapper.edf_jump_to_trial(edfHandle, trial) != 0:
+                    raise Exception('Could not jump to trial ' + str(trial))
+                return trial
+            # bookmark the current position in case no trial starts before startTime
+            bookmark = BOOKMARK()
+            if self.Edfwrapper.edf_set_bookmark(edfHandle, byref(bookmark)) != 0:
+                raise Exception('Could not bookmark the EDF file')
+            low, high, found = 0, self.trialCount - 1, None
+            while low <= high:
+                middle = (low + high) // 2
+                times = self.trialTimes(edfHandle, middle)
+                if times != None and times[0] <= startTime:
+                    found = (middle, times[0])
+                    low = middle + 1
+                else:
+                    high = middle - 1
+            if found == None:
+                if self.Edfwrapper.edf_goto_bookmark(edfHandle, byref(bookmark)) != 0:
+                    raise Exception('Could not return to the bookmark')
+            elif self.Edfwrapper.edf_goto_trial_with_start_time(edfHandle, found[1]) != 0:
+                raise Exception('Could not go to the trial starting at ' + str(found[1]))
+            self.Edfwrapper.edf_free_bookmark(edfHandle, byref(bookmark))
+            return found[0] if found != None else None
+        except Exception as e:
+            raise Exception('An error has occurred with seekTime: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with seekTime')
+    def readFiltered(self,edfFilename,startTime=None,endTime=None,trials=None,eventTypes=None,eye=None,messagePattern=None,batchSize=65536):
+        """
+        Read in and parse only the records of an EDF file that match the given filters. The filters are tested on the raw
+        elements before they are decoded (see filterElements()), a time window is reached with seekTime() and reading stops
+        at its end, and each requested trial is reached with edf_jump_to_trial(), so the rest of the file is never decoded.
+        Filters that are None keep every record.
+        Note: elementIndex and the record indices count the records that were read, not the records of the whole file.
+        Parameters
+            edfFilename = the path/filename of the EDF you want to extract the records of
+            startTime = optional start of the time window in milliseconds
+            endTime = optional end of the time window in milliseconds
+            trials = optional list of trial numbers, between 0 and edf_get_trial_count()-1. The trials are decoded in this order.
+            eventTypes = optional list of parser event types to keep, by name (e.g. 'ENDFIX') or EDF data type code
+            eye = optional eye of the events to keep: LEFT_EYE, RIGHT_EYE, 'Left' or 'Right'
+            messagePattern = optional regular expression, only the messages it matches (re.search) are kept
+            batchSize = the number of rows the data arrays grow by while the records are decoded
+        Return
+            Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
+            with the same schemas as readEDF()
+        """
+        self.printStatus('...Attempting to read filtered data...')
+        # Compile the options and the filters once for this file
+        self.beginProgress(edfFilename)
+        self.beginProfile()
+        self.compileDecodePlan()
+        filters = self.compileFilters(startTime, endTime, eventTypes, eye, messagePattern)
+        self.loadIndex(edfFilename)
+        self.EDFData = self.openEDF(edfFilename)
+        try:
+            self.trialCount = self.Edfwrapper.edf_get_trial_count(self.EDFData)
+            if trials != None:
+                for i in trials:
+                    if i < 0 or i >= self.trialCount:
+                        raise Exception('Trial ' + str(i) + ' does not exist, the file holds ' + str(self.trialCount) + ' trials')
+            self.allocateBatchArrays(batchSize)
+            self.readPreamble(self.EDFData)
+            if trials != None:
+                # skip the trials that end before or start after the time window without reading their elements
+                sources = []
+                for i in trials:
+                    if startTime == None and endTime == None:
+                        times = None
+                    else:
+                        times = self.index.trialTimes(i) if self.index != None else self.trialTimes(self.EDFData, i)
+                    if times == None or ((startTime == None or times[1] >= startTime) and (endTime == None or times[0] <= endTime)):
+                        sources.append(self.iterTrialElements(self.EDFData, i))
+            else:
+                if startTime != None:
+                    self.seekTime(self.EDFData, startTime)
+                # elements of the types that are not decoded are skipped without reading their data
+                elementTypes = self.decodePlan.elementTypes
+                if filters.eventTypes != None:
+                    elementTypes = frozenset([i for i in elementTypes if i not in eventNames or i in filters.eventTypes])
+                sources = [self.iterElements(self.EDFData, elementTypes | frozenset([RECORDING_INFO]))]
+            batches = dict([(i, []) for i in batchTables])
+            self.progress.start('decode')
+            for elements in sources:
+                for table in self.decodeElements(self.EDFData, batchSize, self.filterElements(elements, filters)):
+                    batches[table].append(self.takeBatch(table, batchSize))
+            self.flushStaging()
+            for table in batchTables:
+                batch = self.takeBatch(table, 0)
+                # join the batches of each table into one array
+                if batch is not None and isinstance(batch, MessageArray):
+                    setattr(self, batchTables[table][0], concatenateMessages(batches[table] + [batch]))
+                elif batch is not None:
+                    setattr(self, batchTables[table][0], np.concatenate(batches[table] + [batch]))
+            self.progress.end('decode', self.recordCount(), self.allocatedBytes())
+            self.endProfile(edfFilename)
+            self.printStatus('Converted successfully: ' + (str(len(trials)) + ' Trials; ' if trials != None else '') + str(self.sampleCount) + ' Samples; ' + str(self.eventCount) + ' Events; ' + str(self.msgCount) + ' Messages; ' + str(self.IOCount) + ' Input Events ')
+            self.MASTERdata = np.array([self.HEADERdata,self.RECORDINGdata,self.MESSAGEdata, self.SAMPLEdata,self.EVENTdata,self.IOEVENTdata],dtype=object)
+            self.closeEDF(self.EDFData)
+            return self.MASTERdata
+        except Exception as e:
+            self.closeEDF(self.EDFData)
+            raise Exception('An error has occurred with readFiltered: ' + str(e))
+        except:
+            self.closeEDF(self.EDFData)
+            raise Exception('An unhandled exception has occurred with readFiltered')
+    def readTrials(self,edfFilename,trials,batchSize=65536):
+        """
+        Read in and parse only the requested trials of an EDF file. Each trial is reached with edf_jump_to_trial() so the elements
+        of the other trials are never decoded.
+        Note: elementIndex and the record indices count the records of the requested trials, not the records of the whole file.
+        Parameters
+            edfFilename = the path/filename of the EDF you want to extract the trials of
+            trials = list of trial numbers, between 0 and edf_get_trial_count()-1. The trials are decoded in this order.
+            batchSize = the number of rows the data arrays grow by while the trials are decoded
+        Return
+            Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
+            with the same schemas as readEDF()
+        """
+        self.printStatus('...Attempting to read trials ' + str(list(trials)) + '...')
+        return self.readFiltered(edfFilename, trials=list(trials), batchSize=batchSize)
+    def readTrial(self,edfFilename,trial):
+        """
+        Read in and parse a single trial of an EDF file, see readTrials()
+        Parameters
+            edfFilename = the path/filename of the EDF you want to extract the trial of
+            trial = the trial number, between 0 and edf_get_trial_count()-1
+        Return
+            Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
+        """
+        return self.readTrials(edfFilename, [trial])
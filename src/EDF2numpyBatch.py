@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code converts many EyeLink Data Files (EDF) in parallel with the EDF2numpy class.
+The files are shared out to a pool of worker processes. Each worker loads the EDF Access API once and reuses it for every file
+it converts, and the result of each file is reported as soon as it is finished. A file that fails to convert is reported with
+its error and does not stop the rest of the batch.
+Usage: python EDF2numpyBatch.py <EDF files, directories or glob patterns> <optional workers:N or threads:N> <optional output_dir:DIR> <optional EDF2numpy options>
+'''
+import os, sys, glob, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+try:
+    import numpy as np
+except ModuleNotFoundError as e:
+    raise ModuleNotFoundError('\n\nIt looks like you have ' + str(e) + ' installed. Please install the following modules for this code to run: numpy') from e
+from EDF2numpy import EDF2numpy
+from EDFACCESSwrapper import EDFACCESSwrapper
+from EDF2numpyCache import EDF2numpyCache, cacheTables, saveHeader, HEADER_FILE
+from EDF2numpyMessages import MessageArray
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Worker functions
+##--------------------------------------------------------------------------------------------------------------------------------
+workerConverter = None      # the EDF2numpy instance of this worker process, created once by initWorker()
+
+def initWorker(inputArgs):
+    '''
+    Create the EDF2numpy instance of a worker process, which loads the EDF Access API once for every file the worker converts.
+    Parameters
+        inputArgs = the input argument string passed to EDF2numpy.consumeInputArgs(). The worker only prints the status
+            lines of each file if it includes verbose_enabled:1.
+    '''
+    global workerConverter
+    workerConverter = EDF2numpy()
+    if inputArgs:
+        workerConverter.consumeInputArgs(inputArgs)
+
+def convertFile(edfFilename, outputDir=None, returnData=True, converter=None, name=None):
+    '''
+    Convert one EDF file with the EDF2numpy instance of this worker.
+    Parameters
+        edfFilename = the path/filename of the EDF you want to convert.
+        outputDir = optional directory. The tables of the file are saved to <outputDir>/<name>/<TABLE>.npy, the header
+            to HEADER.json (see EDF2numpyCache.loadHeader()) and the text heap of compact messages to MESSAGETEXT.npy
+        returnData = True to send the converted tables back to the calling process.
+        converter = optional EDF2numpy instance to convert the file with instead of the one of this worker.
+        name = the name of the output directory of the file, also used for its directory in memmap_output_dir. It may
+            contain sub-directories, see outputNames(). The EDF name without its extension if None.
+    Return
+        A dictionary with the filename, the elapsed seconds, the record counts, the process id of the worker, the output
+        directory, the tables (if returnData is True), the seconds spent in each phase of the conversion (see
+        EDF2numpyProgress) and the error message (None if the conversion succeeded).
+    '''
+    result = {'file': edfFilename, 'seconds': 0.0, 'pid': os.getpid(), 'samples': 0, 'events': 0, 'messages': 0, 'output': None, 'data': None, 'phases': {}, 'error': None}
+    start = time.perf_counter()
+    try:
+        if converter == None:
+            if workerConverter == None:
+                initWorker('')
+            converter = workerConverter
+        if name == None:
+            name = os.path.splitext(os.path.basename(edfFilename))[0]
+        memmapDir = converter.options['memmap_output_dir']
+        try:
+            # give each file its own memory-mapped output directory so workers do not overwrite each other
+            if memmapDir != '':
+                converter.options['memmap_output_dir'] = os.path.join(memmapDir, name)
+            # clear the phase timings of the last file, a cache hit does not read the EDF
+            converter.beginProgress(edfFilename)
+            if converter.options['cache_enabled'] == 1:
+                data = EDF2numpyCache().readEDF(converter, edfFilename)
+            else:
+                data = converter.readEDF(edfFilename)
+        finally:
+            converter.options['memmap_output_dir'] = memmapDir
+        if outputDir != None:
+            result['output'] = os.path.join(outputDir, name)
+            os.makedirs(result['output'], exist_ok=True)
+            for (table, attribute), values in zip(cacheTables, data):
+                if table == 'HEADER':
+                    saveHeader(os.path.join(result['output'], HEADER_FILE), values)
+                elif values is not None:
+                    np.save(os.path.join(result['output'], table + '.npy'), values, allow_pickle=False)
+                if isinstance(values, MessageArray):
+                    np.save(os.path.join(result['output'], 'MESSAGETEXT.npy'), values.heap, allow_pickle=False)
+        result['samples'] = converter.sampleCount
+        result['events'] = converter.eventCount
+        result['messages'] = converter.msgCount
+        result['phases'] = dict(converter.progress.phaseTimes)
+        if returnData:
+            result['data'] = data
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Batch functions
+##--------------------------------------------------------------------------------------------------------------------------------
+def findEDFs(inputs, missing=None):
+    '''
+    Expand a list of EDF files, directories and glob patterns into a sorted list of EDF files without duplicates.
+    Directories are searched for .edf files without descending into sub-directories.
+    Parameters
+        inputs = a path/filename, directory or glob pattern, or a list of them.
+        missing = optional list that the inputs matching no EDF file are appended to.
+    Return
+        The list of EDF path/filenames.
+    '''
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    found = []
+    for i in inputs:
+        if os.path.isdir(i):
+            matches = [os.path.join(i, j) for j in os.listdir(i)]
+        elif os.path.isfile(i):
+            matches = [i]
+        else:
+            matches = glob.glob(i, recursive=True)
+        matches = [j for j in matches if os.path.isfile(j) and j.lower().endswith('.edf')]
+        if len(matches) == 0 and missing != None:
+            missing.append(i)
+        found += matches
+    return sorted(set([os.path.abspath(i) for i in found]))
+
+def outputNames(edfFilenames):
+    '''
+    Name the output directory of each EDF file after its path relative to the directory all the files are in, without the
+    extension, e.g. subj01/session and subj02/session. Files of the same name in different directories so never share an
+    output directory. A single file, or files in one directory, are named after the EDF name as before.
+    Parameters
+        edfFilenames = the list of EDF path/filenames.
+    Return
+        The list of names, one for each file.
+    '''
+    paths = [os.path.splitext(os.path.abspath(i))[0] for i in edfFilenames]
+    if len(paths) == 0:
+        return []
+    try:
+        root = os.path.commonpath([os.path.dirname(i) for i in paths])
+    except ValueError:
+        # files on different drives have no common directory, the drive becomes the first directory of the name
+        return [os.path.join(os.path.splitdrive(i)[0].strip(':\\/'), os.path.splitdrive(i)[1].lstrip('\\/')) for i in paths]
+    return [os.path.relpath(i, root) for i in paths]
+
+def writesFiles(inputArgs, outputDir):
+    '''
+    Check whether converting a file writes to a directory named after it.
+    Parameters
+        inputArgs = the input argument string or list passed to EDF2numpy.consumeInputArgs().
+        outputDir = the output directory of the batch, or None.
+    Return
+        True if outputDir is given or inputArgs sets memmap_output_dir.
+    '''
+    if outputDir != None:
+        return True
+    args = inputArgs.split(',') if isinstance(inputArgs, str) else list(inputArgs or [])
+    for i in args:
+        if ':' in i and i.split(':')[0].strip() == 'memmap_output_dir' and i.split(':', 1)[1].strip() != '':
+            return True
+    return False
+
+def assignNames(edfFilenames, inputArgs, outputDir):
+    '''
+    Name the output directory of each file with outputNames() and reject the files whose directory is already taken, which
+    only happens when a file is listed twice or two names differ in case or extension only. Files are only rejected when they write to these directories.
+    Parameters
+        edfFilenames = the list of EDF path/filenames.
+        inputArgs = the input argument string passed to EDF2numpy.consumeInputArgs().
+        outputDir = the output directory of the batch, or None.
+    Return
+        A list of (EDF path/filename, name) pairs to convert and a list of result dictionaries of the rejected files.
+    '''
+    jobs = []
+    rejected = []
+    taken = set()
+    check = writesFiles(inputArgs, outputDir)
+    for edfFilename, name in zip(edfFilenames, outputNames(edfFilenames)):
+        if check and os.path.normcase(name) in taken:
+            rejected.append(failedResult(edfFilename, 'duplicate output name: ' + name))
+        else:
+            taken.add(os.path.normcase(name))
+            jobs.append((edfFilename, name))
+    return jobs, rejected
+
+def failedResult(edfFilename, error):
+    '''
+    Returns the result dictionary of convertFile() for a file that could not be converted at all.
+    '''
+    return {'file': edfFilename, 'seconds': 0.0, 'pid': None, 'samples': 0, 'events': 0, 'messages': 0, 'output': None, 'data': None, 'phases': {}, 'error': error}
+
+def convertBatch(inputs, inputArgs='', workers=None, outputDir=None, returnData=True, expand=True):
+    '''
+    Convert many EDF files on a pool of worker processes.
+    Parameters
+        inputs = a list of EDF files, directories or glob patterns, see findEDFs().
+        inputArgs = the input argument string passed to EDF2numpy.consumeInputArgs() in each worker.
+        workers = the number of worker processes. None uses one worker per CPU.
+        outputDir = optional directory the tables of each file are saved to, see convertFile().
+        returnData = True to send the converted tables of each file back through the pool. Set to False together with
+            outputDir for large batches so the tables are not copied between processes.
+        expand = True to expand inputs with findEDFs(), an input that matches no EDF file gets a result with the error
+            'not found'. False to convert inputs as the list of EDF files it is, a file listed twice is converted twice
+            unless the conversion writes files (outputDir or memmap_output_dir).
+    Yields
+        The result dictionary of each file from convertFile(), in the order the files finish. A file whose output directory
+        is already taken by another file of the batch gets a result with the error 'duplicate output name', see
+        assignNames().
+    '''
+    missing = []
+    edfFilenames = findEDFs(inputs, missing) if expand else list(inputs)
+    for i in missing:
+        yield failedResult(i, 'not found')
+    jobs, rejected = assignNames(edfFilenames, inputArgs, outputDir)
+    for i in rejected:
+        yield i
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(inputArgs,)) as pool:
+        futures = dict([(pool.submit(convertFile, i, outputDir, returnData, None, name), i) for i, name in jobs])
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # the worker itself failed (e.g. it crashed inside the API), report the file and carry on
+                yield failedResult(futures[future], str(e) or type(e).__name__)
+
+def convertThreaded(inputs, inputArgs='', workers=4, outputDir=None):
+    '''
+    Convert many EDF files on a pool of threads in this process. The threads share one EDFACCESSwrapper, so the API is loaded
+    once, and each file is converted by its own EDF2numpy instance and EDFfile handle. The C functions of the API release the
+    GIL, so opening and reading files overlaps between threads without the memory cost of separate processes.
+    Parameters
+        inputs = a list of EDF files, directories or glob patterns, see findEDFs().
+        inputArgs = the input argument string passed to EDF2numpy.consumeInputArgs() for each file.
+        workers = the number of threads.
+        outputDir = optional directory the tables of each file are saved to, see convertFile().
+    Yields
+        The result dictionary of each file from convertFile(), in the order the files finish. An input that matches no EDF
+        file gets a result with the error 'not found'.
+    '''
+    missing = []
+    edfFilenames = findEDFs(inputs, missing)
+    for i in missing:
+        yield failedResult(i, 'not found')
+    jobs, rejected = assignNames(edfFilenames, inputArgs, outputDir)
+    for i in rejected:
+        yield i
+    wrapper = EDFACCESSwrapper()
+    def convert(edfFilename, name):
+        converter = EDF2numpy(wrapper)
+        if inputArgs:
+            converter.consumeInputArgs(inputArgs)
+        return convertFile(edfFilename, outputDir, True, converter, name)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(convert, i, name) for i, name in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+def main(inputs):
+    '''
+    Convert the EDF files given on the command line and print the result of each file as it finishes.
+    Parameters
+        inputs = the command line arguments: EDF files, directories or glob patterns, followed by optional workers:N,
+            threads:N (convert on N threads instead of worker processes), output_dir:DIR and EDF2numpy options in the format
+            option:value.
+    Return
+        The list of result dictionaries.
+    '''
+    files = []
+    options = []
+    workers = None
+    threads = None
+    outputDir = None
+    for i in inputs:
+        name = i.split(':')[0].split('=')[0]
+        # an argument is an option if it starts with a name and a separator and is not an existing path (e.g. C:\data)
+        if len(name) > 1 and name.replace('_', '').isalpha() and not os.path.exists(i) and len(i) > len(name):
+            value = i[len(name) + 1:].strip()
+            if name == 'workers':
+                workers = int(value)
+            elif name == 'threads':
+                threads = int(value)
+            elif name == 'output_dir':
+                outputDir = value
+            else:
+                options.append(name + ':' + value)
+        else:
+            files.append(i)
+    missing = []
+    edfFilenames = findEDFs(files, missing)
+    total = len(edfFilenames) + len(missing)
+    if len(edfFilenames) == 0:
+        raise FileNotFoundError('No EDF files found in: ' + str(files))
+    if threads != None:
+        print('...Converting ' + str(len(edfFilenames)) + ' EDF files with ' + str(threads) + ' threads...')
+        batch = convertThreaded(files, ','.join(options), threads, outputDir)
+    else:
+        print('...Converting ' + str(len(edfFilenames)) + ' EDF files with ' + str(workers if workers != None else os.cpu_count()) + ' workers...')
+        batch = convertBatch(files, ','.join(options), workers, outputDir, returnData=False)
+    results = []
+    start = time.perf_counter()
+    for result in batch:
+        result['data'] = None
+        results.append(result)
+        if result['error'] == None:
+            print('[%d/%d] %s: %.2f s; %d Samples; %d Events; %d Messages' % (len(results), total, result['file'], result['seconds'], result['samples'], result['events'], result['messages']))
+        else:
+            print('[%d/%d] %s: FAILED: %s' % (len(results), total, result['file'], result['error']))
+    failed = [i for i in results if i['error'] != None]
+    print('Converted ' + str(len(results) - len(failed)) + ' of ' + str(len(results)) + ' EDF files in %.2f s' % (time.perf_counter() - start))
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(sys.argv[1:])
+    else:
+        print('EDF2numpyBatch.py <EDF files, directories or glob patterns> <optional workers:N or threads:N> <optional output_dir:DIR> <optional EDF2numpy options>')
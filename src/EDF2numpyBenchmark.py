@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code measures the time and memory cost of converting an EyeLink Data File (EDF) with the EDF2numpy class.
+Each measurement runs in a fresh process so that the peak resident memory reported belongs to that conversion alone.
+Usage: python EDF2numpyBenchmark.py <EDF_FileName> <optional number of repeats>
+The batch scaling benchmark converts 8 copies of the file, or every EDF when a directory or glob pattern is given instead.
+The benchmark suite converts simulated recordings of several sizes with several option profiles, see benchmarkSuite():
+Usage: python EDF2numpyBenchmark.py --suite <optional --quick> <optional --trace> <results JSON> <optional baseline JSON>
+'''
+import os, sys, time, json, shutil, platform, tempfile, tracemalloc, multiprocessing
+try:
+    import resource
+except ImportError:
+    resource = None     # peak RSS is not available on Windows without additional modules
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+SUITE_VERSION = 1                               # version of the JSON written by benchmarkSuite()
+SUITE_MINUTES = (1, 10, 30, 120)                # recording sizes of the suite in minutes
+SUITE_QUICK_MINUTES = (1,)                      # recording sizes of a quick run of the suite
+SUITE_RATES = (500, 1000, 2000)                 # sampling rates of the suite
+SUITE_EYES = ('LEFT', 'BINOCULAR')              # eye modes of the suite
+SUITE_TRIAL_MINUTES = 1                         # length of each trial of the simulated recordings
+DEFAULT_TOLERANCE = 0.15                        # fraction a run can lose against the baseline before it is flagged
+# option profiles of the suite, passed to EDF2numpy.consumeInputArgs()
+suiteProfiles = {
+    'samples': 'events_enabled:0,output_data_debugflags:0',
+    'events': 'samples_enabled:0,output_data_debugflags:0',
+    'everything': 'messages_enabled:1,ioevents_enabled:1,recinfo_enabled:1,output_data_debugflags:1',
+    }
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Benchmark functions
+##--------------------------------------------------------------------------------------------------------------------------------
+def peakRSS():
+    '''
+    Returns the peak resident memory of the current process in bytes or None if it cannot be determined
+    '''
+    if resource == None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes while macOS reports bytes
+    if sys.platform.startswith('darwin'):
+        return peak
+    return peak * 1024
+
+def runConversion(edfFilename, inputArgs, resultQueue, traceMemory=False):
+    '''
+    Convert one EDF file and report the elapsed time and peak memory through resultQueue.
+    Parameters
+        edfFilename = the path/filename of the EDF you want to convert.
+        inputArgs = the input argument string passed to EDF2numpy.consumeInputArgs().
+        resultQueue = a multiprocessing queue that receives a dictionary of measurements.
+        traceMemory = True to also report the peak memory allocated during the conversion as seen by tracemalloc. Tracing
+            slows the conversion down, so the time of a traced conversion should not be compared with an untraced one.
+    '''
+    try:
+        from EDF2numpy import EDF2numpy
+        converter = EDF2numpy()
+        converter.consumeInputArgs(inputArgs)
+        baselineRSS = peakRSS()
+        if traceMemory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        converter.readEDF(edfFilename)
+        elapsed = time.perf_counter() - start
+        tracedPeak = tracemalloc.get_traced_memory()[1] if traceMemory else None
+        if traceMemory:
+            tracemalloc.stop()
+        progress = converter.progress
+        resultQueue.put({'seconds': elapsed, 'peakRSS': peakRSS(), 'startRSS': baselineRSS, 'tracedPeak': tracedPeak,
+            'samples': converter.sampleCount, 'events': converter.eventCount, 'records': converter.recordCount(),
+            'elements': progress.phaseElements.get('count'), 'phases': dict(progress.phaseTimes), 'error': None})
+    except Exception as e:
+        resultQueue.put({'error': str(e)})
+
+def measure(edfFilename, inputArgs, traceMemory=False):
+    '''
+    Run runConversion() in a fresh process and return its measurements.
+    '''
+    resultQueue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=runConversion, args=(edfFilename, inputArgs, resultQueue, traceMemory))
+    worker.start()
+    result = resultQueue.get()
+    worker.join()
+    if result['error'] != None:
+        raise Exception(result['error'])
+    return result
+
+def formatBytes(value):
+    '''
+    Format a byte count as megabytes for printing
+    '''
+    if value == None:
+        return 'n/a'
+    return '%.1f MB' % (value / (1024.0 * 1024.0))
+
+def benchmarkSinglePass(edfFilename, repeats=3, inputArgs='output_data_debugflags:0'):
+    '''
+    Compare the single-open conversion against the original two-pass conversion.
+    Parameters
+        edfFilename = the path/filename of the EDF you want to convert.
+        repeats = the number of conversions to run for each mode. The fastest run is reported.
+        inputArgs = additional input arguments shared by both modes.
+    Return
+        A dictionary with the best measurement of each mode.
+    '''
+    modes = {'two-pass': 'single_pass_enabled:0', 'single-pass': 'single_pass_enabled:1'}
+    results = {}
+    for mode in modes:
+        runs = [measure(edfFilename, ','.join([i for i in [inputArgs, modes[mode]] if i])) for i in range(repeats)]
+        results[mode] = min(runs, key=lambda run: run['seconds'])
+    print('Benchmark of ' + str(edfFilename) + ' (' + str(results['single-pass']['samples']) + ' samples, best of ' + str(repeats) + ')')
+    for mode in modes:
+        print('\t%-12s %8.3f s\tpeak RSS %s' % (mode, results[mode]['seconds'], formatBytes(results[mode]['peakRSS'])))
+    speedup = results['two-pass']['seconds'] / max(results['single-pass']['seconds'], 1e-9)
+    print('\tsingle-pass speedup: %.2fx' % speedup)
+    if results['two-pass']['peakRSS'] != None:
+        print('\tpeak RSS saved: ' + formatBytes(results['two-pass']['peakRSS'] - results['single-pass']['peakRSS']))
+    return results
+
+def benchmarkDebugOverhead(edfFilename, repeats=3, inputArgs=''):
+    '''
+    Measure the cost of writing the debug file (output_data_debugflags) against a conversion without it, for the text debug
+    file and the binary one (binary_debug_enabled). The debug file is written next to the EDF.
+    Parameters
+        edfFilename = the path/filename of the EDF you want to convert.
+        repeats = the number of conversions to run for each mode. The fastest run is reported.
+        inputArgs = additional input arguments shared by all modes, e.g. capture_enabled:1.
+    Return
+        A dictionary with the seconds of the fastest conversion of each mode.
+    '''
+    modes = {'no debug': 'output_data_debugflags:0', 'text': 'output_data_debugflags:1', 'binary': 'output_data_debugflags:1,binary_debug_enabled:1'}
+    results = {}
+    for mode in modes:
+        results[mode] = min([measure(edfFilename, ','.join([i for i in [inputArgs, modes[mode]] if i]))['seconds'] for i in range(repeats)])
+    print('Debug file overhead of ' + str(edfFilename) + ' (best of ' + str(repeats) + ')')
+    for mode in modes:
+        overhead = '' if mode == 'no debug' else '\t%+.0f%%' % (100 * (results[mode] / max(results['no debug'], 1e-9) - 1))
+        print('\t%-12s %8.3f s%s' % (mode, results[mode], overhead))
+    return results
+
+def iterateElements(wrapper, edfFilename, mode):
+    '''
+    Step through every element of an EDF file once and return the number of elements and the elapsed time.
+    Parameters
+        wrapper = an EDFACCESSwrapper instance.
+        edfFilename = the path/filename of the EDF you want to iterate.
+        mode = 'methods' calls edf_get_next_data() and edf_get_float_data() for each element, 'iterElements' uses the
+            iterElements() generator and 'filtered' uses iterElements() restricted to samples.
+    '''
+    from EDFACCESSwrapper import NO_PENDING_ITEMS, SAMPLE_TYPE
+    edfData = wrapper.edf_open_file(edfFilename, 2, 1, 1)
+    try:
+        count = 0
+        start = time.perf_counter()
+        if mode == 'methods':
+            while wrapper.edf_get_next_data(edfData) != NO_PENDING_ITEMS:
+                wrapper.edf_get_float_data(edfData)
+                count += 1
+        elif mode == 'iterElements':
+            for elementType, address in wrapper.iterElements(edfData):
+                count += 1
+        else:
+            for elementType, address in wrapper.iterElements(edfData, [SAMPLE_TYPE]):
+                count += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        wrapper.edf_close_file(edfData)
+    return count, elapsed
+
+def benchmarkElementIteration(edfFilename, repeats=3):
+    '''
+    Measure the raw element iteration rate of the EDFACCESSwrapper, without any decoding.
+    Parameters
+        edfFilename = the path/filename of the EDF you want to iterate.
+        repeats = the number of iterations to run for each mode. The fastest run is reported.
+    Return
+        A dictionary with the elements per second of each mode.
+    '''
+    from EDFACCESSwrapper import EDFACCESSwrapper
+    wrapper = EDFACCESSwrapper()
+    results = {}
+    print('Element iteration of ' + str(edfFilename) + ' (best of ' + str(repeats) + ')')
+    for mode in ['methods', 'iterElements', 'filtered']:
+        runs = [iterateElements(wrapper, edfFilename, mode) for i in range(repeats)]
+        count, elapsed = min(runs, key=lambda run: run[1])
+        results[mode] = count / max(elapsed, 1e-9)
+        print('\t%-12s %10d elements %12.0f elements/s' % (mode, count, results[mode]))
+    return results
+
+def benchmarkBatchScaling(edfFilenames, workerCounts=(1, 2, 4, 8), inputArgs='output_data_debugflags:0'):
+    '''
+    Measure how the batch conversion of EDF2numpyBatch scales with the number of worker processes.
+    Parameters
+        edfFilenames = a list of EDF files, directories or glob patterns to convert. Use at least as many files as the
+            largest worker count, otherwise the extra workers have nothing to do. A file may be listed more than once.
+        workerCounts = the numbers of worker processes to measure.
+        inputArgs = the input argument string passed to EDF2numpy.consumeInputArgs() in each worker.
+    Return
+        A dictionary with the wall time in seconds of each worker count.
+    '''
+    from EDF2numpyBatch import convertBatch, findEDFs
+    # expand each entry on its own so a file listed several times is converted several times
+    files = sum([findEDFs(i) for i in edfFilenames], [])
+    results = {}
+    print('Batch conversion of ' + str(len(files)) + ' EDF files')
+    for workers in workerCounts:
+        start = time.perf_counter()
+        failed = len([i for i in convertBatch(files, inputArgs, workers, returnData=False, expand=False) if i['error'] != None])
+        results[workers] = time.perf_counter() - start
+        print('\t%2d workers %8.3f s\t%6.2f files/s\tspeedup %.2fx%s' % (workers, results[workers], len(files) / max(results[workers], 1e-9),
+            results[workerCounts[0]] / max(results[workers], 1e-9), '' if failed == 0 else '\t(' + str(failed) + ' failed)'))
+    return results
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Benchmark suite
+##--------------------------------------------------------------------------------------------------------------------------------
+def suiteRunName(minutes, sampleRate, eye, profile):
+    '''
+    Returns the name of a run of the suite, e.g. '10min-1000Hz-BINOCULAR-samples'
+    '''
+    return str(minutes) + 'min-' + str(sampleRate) + 'Hz-' + eye + '-' + profile
+
+def benchmarkSuite(outputFilename=None, minutes=SUITE_MINUTES, rates=SUITE_RATES, eyes=SUITE_EYES, profiles=None, repeats=1, traceMemory=False):
+    '''
+    Convert simulated recordings of every size, sampling rate and eye mode with every option profile and measure each
+    conversion in a fresh process. The recordings come from the synthetic EDF Access API of EDFACCESSsynthetic, so the suite
+    runs without the EyeLink Developers Kit and gives the same data on every machine.
+    Parameters
+        outputFilename = optional path/filename of the JSON file the results are written to.
+        minutes = the recording sizes in minutes.
+        rates = the sampling rates in Hz.
+        eyes = the eye modes, 'LEFT', 'RIGHT' or 'BINOCULAR'.
+        profiles = a dictionary of option profiles, each an input argument string for EDF2numpy.consumeInputArgs(). All
+            profiles of suiteProfiles by default.
+        repeats = the number of conversions of each run. The fastest is reported.
+        traceMemory = True to convert each recording once more with tracemalloc running and report its peak.
+    Return
+        A dictionary with the details of the machine and the measurements of each run in 'runs'. Each run holds its
+        parameters, the seconds of the fastest conversion, the elements per second, the seconds of each phase of the
+        conversion, the peak RSS in bytes and the tracemalloc peak in bytes (None unless traceMemory is set).
+    '''
+    from EDFACCESSwrapper import BACKEND_VARIABLE, SYNTHETIC_BACKEND
+    from EDFACCESSsynthetic import writeSyntheticEDF
+    import numpy
+    profiles = suiteProfiles if profiles == None else profiles
+    results = {'version': SUITE_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+        'numpy': numpy.__version__, 'platform': platform.platform(), 'processor': platform.processor(), 'backend': SYNTHETIC_BACKEND,
+        'repeats': repeats, 'runs': {}}
+    directory = tempfile.mkdtemp(prefix='edf2numpy_benchmark_')
+    # the conversions run in fresh processes, which take the backend from the environment
+    previousBackend = os.environ.get(BACKEND_VARIABLE)
+    os.environ[BACKEND_VARIABLE] = SYNTHETIC_BACKEND
+    try:
+        print('Benchmark suite: ' + str(len(minutes) * len(rates) * len(eyes) * len(profiles)) + ' runs')
+        print('\t%-36s %10s %10s %14s %12s %12s' % ('run', 'elements', 'seconds', 'elements/s', 'peak RSS', 'traced peak'))
+        for size in minutes:
+            for sampleRate in rates:
+                for eye in eyes:
+                    edfFilename = writeSyntheticEDF(os.path.join(directory, suiteRunName(size, sampleRate, eye, 'recording') + '.edf'),
+                        trials=max(1, int(size / SUITE_TRIAL_MINUTES)), trialDuration=int(min(size, SUITE_TRIAL_MINUTES) * 60000),
+                        sampleRate=sampleRate, eye=eye)
+                    for profile in profiles:
+                        runs = [measure(edfFilename, profiles[profile]) for i in range(repeats)]
+                        best = min(runs, key=lambda run: run['seconds'])
+                        run = {'minutes': size, 'sampleRate': sampleRate, 'eye': eye, 'profile': profile, 'inputArgs': profiles[profile],
+                            'seconds': best['seconds'], 'elements': best['elements'], 'records': best['records'],
+                            'samples': best['samples'], 'events': best['events'],
+                            'elementsPerSecond': (best['elements'] or 0) / max(best['seconds'], 1e-9), 'phases': best['phases'],
+                            'peakRSS': max([i['peakRSS'] for i in runs]) if best['peakRSS'] != None else None,
+                            'tracedPeak': measure(edfFilename, profiles[profile], True)['tracedPeak'] if traceMemory else None}
+                        name = suiteRunName(size, sampleRate, eye, profile)
+                        results['runs'][name] = run
+                        print('\t%-36s %10d %10.3f %14.0f %12s %12s' % (name, run['elements'] or 0, run['seconds'], run['elementsPerSecond'],
+                            formatBytes(run['peakRSS']), formatBytes(run['tracedPeak'])))
+                    os.remove(edfFilename)
+    finally:
+        if previousBackend == None:
+            del os.environ[BACKEND_VARIABLE]
+        else:
+            os.environ[BACKEND_VARIABLE] = previousBackend
+        shutil.rmtree(directory, ignore_errors=True)
+    if outputFilename != None:
+        with open(outputFilename, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print('Results written to ' + str(outputFilename))
+    return results
+
+def compareToBaseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    '''
+    Compare the runs of a benchmark suite against a baseline and flag the runs that got slower or use more memory.
+    Parameters
+        results = the results of benchmarkSuite(), or the path/filename of their JSON file.
+        baseline = the results of an earlier benchmarkSuite() to compare against, or the path/filename of their JSON file.
+        tolerance = the fraction of elements per second a run can lose, or of peak RSS it can gain, before it is flagged.
+    Return
+        A list of dictionaries, one for each flagged run, with the name of the run, the measure ('elementsPerSecond' or
+        'peakRSS'), its baseline and current value and their ratio.
+    '''
+    if isinstance(results, str):
+        with open(results) as f:
+            results = json.load(f)
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    regressions = []
+    common = [i for i in results['runs'] if i in baseline['runs']]
+    print('Comparison against the baseline of ' + str(baseline.get('created')) + ' (' + str(len(common)) + ' common runs, tolerance '
+        + str(int(tolerance * 100)) + '%)')
+    for name in common:
+        current, previous = results['runs'][name], baseline['runs'][name]
+        speed = current['elementsPerSecond'] / max(previous['elementsPerSecond'], 1e-9)
+        flags = []
+        if speed < 1.0 - tolerance:
+            regressions.append({'run': name, 'measure': 'elementsPerSecond', 'baseline': previous['elementsPerSecond'],
+                'current': current['elementsPerSecond'], 'ratio': speed})
+            flags.append('SLOWER')
+        if current.get('peakRSS') != None and previous.get('peakRSS') != None:
+            memory = current['peakRSS'] / max(previous['peakRSS'], 1)
+            if memory > 1.0 + tolerance:
+                regressions.append({'run': name, 'measure': 'peakRSS', 'baseline': previous['peakRSS'], 'current': current['peakRSS'],
+                    'ratio': memory})
+                flags.append('MORE MEMORY')
+        print('\t%-36s %6.2fx speed%s' % (name, speed, '\t' + ', '.join(flags) if flags else ''))
+    print(str(len(regressions)) + ' regressions found')
+    return regressions
+
+if __name__ == '__main__':
+    from EDF2numpyBatch import findEDFs
+    if len(sys.argv) > 1 and sys.argv[1] == '--suite':
+        flags = [i for i in sys.argv[2:] if i.startswith('--')]
+        filenames = [i for i in sys.argv[2:] if not i.startswith('--')]
+        results = benchmarkSuite(filenames[0] if len(filenames) > 0 else None, SUITE_QUICK_MINUTES if '--quick' in flags else SUITE_MINUTES,
+            traceMemory='--trace' in flags)
+        if len(filenames) > 1:
+            # a non-zero exit status lets a CI job fail on a regression
+            sys.exit(1 if len(compareToBaseline(results, filenames[1])) > 0 else 0)
+    elif len(sys.argv) > 1 and os.path.isfile(sys.argv[1]) and sys.argv[1].lower().endswith('.edf'):
+        benchmarkSinglePass(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+        benchmarkDebugOverhead(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+        benchmarkElementIteration(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+        benchmarkBatchScaling([sys.argv[1]] * 8)
+    elif len(sys.argv) > 1 and len(findEDFs(sys.argv[1])) > 0:
+        benchmarkBatchScaling([sys.argv[1]])
+    else:
+        print('EDF2numpyBenchmark.py <EDF_FileName, directory or glob pattern> <optional number of repeats>')
+        print('EDF2numpyBenchmark.py --suite <optional --quick> <optional --trace> <results JSON> <optional baseline JSON>')
+        # an argument that matches no EDF file is an error, not an empty batch
+        sys.exit(1 if len(sys.argv) > 1 else 0)
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code keeps the output of EDF2numpy.readEDF() in an on-disk cache so that an EyeLink Data File (EDF) that has already been
+converted with the same options is loaded back from .npy files instead of being decoded again.
+The data tables are memory-mapped read-only when they are loaded, so a cache hit costs no decoding and no copy of the data.
+'''
+import os, json, time, shutil, hashlib, tempfile
+try:
+    import numpy as np
+except ModuleNotFoundError as e:
+    raise ModuleNotFoundError('\n\nIt looks like you have ' + str(e) + ' installed. Please install the following modules for this code to run: numpy') from e
+from EDF2numpyMessages import MessageArray
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+# names and EDF2numpy attributes of the tables in the order readEDF() returns them
+cacheTables = [('HEADER','HEADERdata'),('RECORDINGS','RECORDINGdata'),('MESSAGES','MESSAGEdata'),('SAMPLES','SAMPLEdata'),('EVENTS','EVENTdata'),('IOEVENTS','IOEVENTdata')]
+# options that change how a file is converted but not what the conversion returns
+cacheNeutralOptions = ['cache_enabled', 'single_pass_enabled', 'index_enabled', 'binary_debug_enabled', 'progress_enabled', 'verbose_enabled', 'profile_enabled', 'capture_enabled']
+# layout of the cache entries, part of the cache key so entries of an older layout are never loaded
+CACHE_FORMAT = 2
+# the header is kept as JSON text, the data tables as .npy files without pickled objects
+HEADER_FILE = 'HEADER.json'
+HEADERtype = np.dtype([('Header','O')])
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.edf2numpy_cache')
+DEFAULT_CACHE_SIZE = 4 * 1024**3    # 4 GB
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## EDF2numpyCache functions
+##--------------------------------------------------------------------------------------------------------------------------------
+class EDF2numpyCache:
+    """
+    A size bounded cache of converted EDF files. Each entry is a directory holding one .npy file per data table and the header as
+    JSON text, so nothing is unpickled when it is loaded. It is keyed by a fingerprint of the EDF (size, modification time and
+    content hash) combined with the conversion options.
+    The least recently used entries are removed when the cache grows beyond maxBytes.
+    """
+    def __init__(self, cacheDir=None, maxBytes=DEFAULT_CACHE_SIZE):
+        self.cacheDir = DEFAULT_CACHE_DIR if cacheDir == None else cacheDir     # directory holding the cache entries
+        self.maxBytes = maxBytes                                                # size limit of the cache in bytes
+        self.hits = 0                                                           # number of conversions loaded from the cache
+        self.misses = 0                                                         # number of conversions that had to be decoded
+        self.fingerprintFile = os.path.join(self.cacheDir, 'fingerprints.json') # content hash of each EDF by path, size and mtime
+        os.makedirs(self.cacheDir, exist_ok=True)
+##--------------------------------------------------------------------------------------------------------------------------------
+## Keys
+##--------------------------------------------------------------------------------------------------------------------------------
+    def fingerprint(self, edfFilename):
+        """
+        Fingerprint an EDF file by its size, modification time and a hash of its contents.
+        The content hash is remembered for the path, size and modification time so that an unchanged file is only hashed once.
+        Parameters
+            edfFilename = the path/filename of the EDF
+        Return
+            Returns the fingerprint as a string
+        """
+        try:
+            path = os.path.abspath(edfFilename)
+            stat = os.stat(path)
+            known = self.readJSON(self.fingerprintFile, {})
+            if path in known and known[path][0] == stat.st_size and known[path][1] == stat.st_mtime_ns:
+                digest = known[path][2]
+            else:
+                # hash the contents in blocks so large files are not read into memory at once
+                sha = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        sha.update(block)
+                digest = sha.hexdigest()
+                known[path] = [stat.st_size, stat.st_mtime_ns, digest]
+                self.writeJSON(self.fingerprintFile, known)
+            return str(stat.st_size) + ':' + str(stat.st_mtime_ns) + ':' + digest
+        except Exception as e:
+            raise Exception('An error has occurred with fingerprint: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with fingerprint')
+    def cacheKey(self, edfFilename, converter):
+        """
+        Combine the fingerprint of an EDF with the normalized options of an EDF2numpy instance into a cache key.
+        Parameters
+            edfFilename = the path/filename of the EDF
+            converter = the EDF2numpy instance whose options and consistencyArgs are used for the conversion
+        Return
+            Returns the cache key as a hexadecimal string
+        """
+        try:
+            options = dict([(i, converter.options[i]) for i in converter.options if i not in cacheNeutralOptions])
+            description = json.dumps({'format': CACHE_FORMAT, 'edf': self.fingerprint(edfFilename), 'options': options, 'consistency': converter.consistencyArgs}, sort_keys=True)
+            return hashlib.sha256(description.encode('utf-8')).hexdigest()
+        except Exception as e:
+            raise Exception('An error has occurred with cacheKey: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with cacheKey')
+##--------------------------------------------------------------------------------------------------------------------------------
+## Entries
+##--------------------------------------------------------------------------------------------------------------------------------
+    def readEDF(self, converter, edfFilename):
+        """
+        Return the tables of an EDF converted with the options of converter, loading them from the cache when possible.
+        On a miss the file is converted with converter.readEDF() and the result is stored in the cache.
+        Parameters
+            converter = the EDF2numpy instance used for the conversion
+            edfFilename = the path/filename of the EDF you want to extract the contents of
+        Return
+            Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
+            The arrays of a cache hit are read-only memory maps.
+        """
+        try:
+            key = self.cacheKey(edfFilename, converter)
+            cached = self.load(key, converter)
+            if cached is not None:
+                self.hits += 1
+                converter.printStatus('...Loaded ' + str(edfFilename) + ' from the conversion cache...')
+                return cached
+            self.misses += 1
+            result = converter.readEDF(edfFilename)
+            self.store(key, edfFilename, converter)
+            return result
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyCache.readEDF: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyCache.readEDF')
+    def load(self, key, converter=None):
+        """
+        Load a cache entry and mark it as recently used.
+        Parameters
+            key = the cache key from cacheKey()
+            converter = optional EDF2numpy instance whose data tables and counters are set to the loaded entry
+        Return
+            Returns the Numpy array of structured numpy arrays, or None if the key is not in the cache
+        """
+        try:
+            entry = os.path.join(self.cacheDir, key)
+            meta = self.readJSON(os.path.join(entry, 'meta.json'), None)
+            if meta == None:
+                return None
+            tables = []
+            for name, attribute in cacheTables:
+                if name not in meta['tables']:
+                    tables.append(None)
+                elif name == 'HEADER':
+                    tables.append(loadHeader(os.path.join(entry, HEADER_FILE)))
+                else:
+                    # the cache directory may be shared, so nothing is unpickled
+                    tables.append(np.load(os.path.join(entry, name + '.npy'), mmap_mode='r', allow_pickle=False))
+            if 'MESSAGETEXT' in meta['tables']:
+                # reattach the text heap of compact messages
+                tables[2] = MessageArray(tables[2], np.load(os.path.join(entry, 'MESSAGETEXT.npy'), mmap_mode='r', allow_pickle=False))
+            # the modification time of meta.json records the last use of the entry
+            os.utime(os.path.join(entry, 'meta.json'))
+            if converter != None:
+                for (name, attribute), table in zip(cacheTables, tables):
+                    setattr(converter, attribute, table)
+                converter.trialCount = meta['trialCount']
+                converter.recCount, converter.msgCount, converter.sampleCount, converter.eventCount, converter.IOCount = [0 if i is None else i.size for i in tables[1:]]
+                converter.MASTERdata = np.array(tables, dtype=object)
+            return np.array(tables, dtype=object)
+        except Exception as e:
+            raise Exception('An error has occurred with load: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with load')
+    def store(self, key, edfFilename, converter):
+        """
+        Store the data tables of a finished conversion under key, then evict old entries if the cache is too large.
+        The entry is written to a temporary directory and renamed into place so a partly written entry is never loaded.
+        Parameters
+            key = the cache key from cacheKey()
+            edfFilename = the path/filename of the converted EDF
+            converter = the EDF2numpy instance holding the converted data tables
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            entry = os.path.join(self.cacheDir, key)
+            staging = tempfile.mkdtemp(prefix='.' + key + '.', dir=self.cacheDir)
+            meta = {'source': os.path.abspath(edfFilename), 'trialCount': converter.trialCount, 'tables': [], 'bytes': 0, 'created': time.time()}
+            for name, attribute in cacheTables:
+                table = getattr(converter, attribute)
+                if table is not None:
+                    filename = os.path.join(staging, HEADER_FILE if name == 'HEADER' else name + '.npy')
+                    if name == 'HEADER':
+                        saveHeader(filename, table)
+                    else:
+                        np.save(filename, table, allow_pickle=False)
+                    meta['tables'].append(name)
+                    meta['bytes'] += os.path.getsize(filename)
+                if isinstance(table, MessageArray):
+                    # the text of compact messages is kept in a heap next to the rows
+                    np.save(os.path.join(staging, 'MESSAGETEXT.npy'), table.heap, allow_pickle=False)
+                    meta['tables'].append('MESSAGETEXT')
+                    meta['bytes'] += os.path.getsize(os.path.join(staging, 'MESSAGETEXT.npy'))
+            self.writeJSON(os.path.join(staging, 'meta.json'), meta)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.replace(staging, entry)
+            except OSError:
+                # another process stored the same entry first
+                shutil.rmtree(staging, ignore_errors=True)
+            self.evict()
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with store: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with store')
+    def entries(self):
+        """
+        List the entries of the cache.
+        Return
+            Returns a list of (key, metadata, last use time) tuples, least recently used first
+        """
+        try:
+            found = []
+            for key in os.listdir(self.cacheDir):
+                metaFile = os.path.join(self.cacheDir, key, 'meta.json')
+                if not key.startswith('.') and os.path.isfile(metaFile):
+                    meta = self.readJSON(metaFile, None)
+                    if meta != None:
+                        found.append((key, meta, os.path.getmtime(metaFile)))
+            return sorted(found, key=lambda i: i[2])
+        except Exception as e:
+            raise Exception('An error has occurred with entries: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with entries')
+    def size(self):
+        """
+        Return the number of bytes of data held in the cache.
+        """
+        return sum([i[1]['bytes'] for i in self.entries()])
+    def evict(self, maxBytes=None):
+        """
+        Remove the least recently used entries until the cache holds no more than maxBytes.
+        Parameters
+            maxBytes = optional size limit in bytes, self.maxBytes by default
+        Return
+            Returns the number of entries removed
+        """
+        try:
+            limit = self.maxBytes if maxBytes == None else maxBytes
+            entries = self.entries()
+            total = sum([i[1]['bytes'] for i in entries])
+            removed = 0
+            for key, meta, used in entries:
+                if total <= limit:
+                    break
+                shutil.rmtree(os.path.join(self.cacheDir, key), ignore_errors=True)
+                total -= meta['bytes']
+                removed += 1
+            return removed
+        except Exception as e:
+            raise Exception('An error has occurred with evict: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with evict')
+    def invalidate(self, edfFilename=None):
+        """
+        Remove the entries of one EDF file, whatever options it was converted with, or clear the whole cache.
+        Parameters
+            edfFilename = optional path/filename of the EDF. If None every entry is removed.
+        Return
+            Returns the number of entries removed
+        """
+        try:
+            source = None if edfFilename == None else os.path.abspath(edfFilename)
+            removed = 0
+            for key, meta, used in self.entries():
+                if source == None or meta['source'] == source:
+                    shutil.rmtree(os.path.join(self.cacheDir, key), ignore_errors=True)
+                    removed += 1
+            # forget the content hash so the file is hashed again on its next use
+            known = self.readJSON(self.fingerprintFile, {})
+            for path in list(known):
+                if source == None or path == source:
+                    del known[path]
+            self.writeJSON(self.fingerprintFile, known)
+            return removed
+        except Exception as e:
+            raise Exception('An error has occurred with invalidate: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with invalidate')
+##--------------------------------------------------------------------------------------------------------------------------------
+## Helpers
+##--------------------------------------------------------------------------------------------------------------------------------
+    def readJSON(self, filename, default):
+        """
+        Read a JSON file, returning default if it does not exist or cannot be read.
+        """
+        try:
+            with open(filename, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+    def writeJSON(self, filename, data):
+        """
+        Write a JSON file through a temporary file so readers never see a partly written file.
+        """
+        temp = filename + '.' + str(os.getpid()) + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp, filename)
+        return 0
+
+def saveHeader(filename, header):
+    '''
+    Write the preamble text of a HEADERdata array to a JSON file, so it can be read back without unpickling.
+    Parameters
+        filename = the path/filename of the JSON file
+        header = the HEADERdata array
+    Returns
+        0 if the operation is successful.
+    '''
+    text = header['Header'][0] if header is not None and header.size > 0 else None
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(None if text is None else str(text), f)
+    return 0
+
+def loadHeader(filename):
+    '''
+    Read a header written by saveHeader().
+    Parameters
+        filename = the path/filename of the JSON file
+    Returns
+        The HEADERdata array
+    '''
+    with open(filename, 'r', encoding='utf-8') as f:
+        text = json.load(f)
+    header = np.empty(1, dtype=HEADERtype)
+    header['Header'] = text
+    return header
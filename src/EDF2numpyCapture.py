@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code captures the element stream of an EyeLink Data File (EDF) once into a compact binary file next to the EDF
+(<EDF name>.edfcap), so that the EDF can be converted again with other options without the EDF Access API.
+The capture holds every element of the EDF as read with events and samples loaded:
+    the samples, as FSAMPLE structures in their native layout
+    every other element as the first bytes of its ALLF_DATA union, which hold the FEVENT, IOEVENT or RECORDINGS structure
+    a heap of the LSTRING text of the messages, the message pointer of a message is replaced by its position in the heap
+    a table of the data type of each element and its row in the sample or record table
+    a JSON header with the preamble, the trial count and the number of elements of each data type
+EDF2numpy.readCapture() decodes a capture with the same vectorized block decoders as readEDF(), reading the tables straight
+from memory maps of the file. With capture_enabled set readEDF() builds the capture of an EDF on its first read and converts
+from the capture on every read, rebuilding it when the EDF changes or is opened with other trial markers or consistency options.
+'''
+import os, json, struct
+from EDFACCESSwrapper import *
+from EDF2numpyIndex import EDF2numpyIndex, tableElementTypes
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+CAPTURE_MAGIC = b'EDF2NPCAPTURE1\0\0'    # first 16 bytes of a capture file
+CAPTURE_VERSION = 1                     # format of the capture file, older files are rebuilt
+CAPTURE_SUFFIX = '.edfcap'              # appended to the EDF name to get the name of the capture file
+CAPTURE_ALIGNMENT = 64                  # every table starts at a multiple of this many bytes
+CAPTURE_BLOCK = 65536                   # samples collected before they are written to the capture
+PREFACE = struct.Struct('<16sQQ')       # magic, offset and length of the JSON header at the end of the file
+# row of the element table
+ELEMENTtype = np.dtype([('type', '<i2'), ('row', '<u4')])
+# the non-sample elements are kept as the FEVENT sized start of their ALLF_DATA union
+RECORDtype = FEVENTtype
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## EDF2numpyCapture functions
+##--------------------------------------------------------------------------------------------------------------------------------
+class EDF2numpyCapture:
+    """
+    The capture of the element stream of an EDF file. Create with EDF2numpyCapture(edfFilename) and fill it with load() or
+    build(), or use openCapture() to do both. A loaded capture holds memory maps of its tables in .samples (FSAMPLEtype),
+    .records (FEVENTtype), .elements (ELEMENTtype) and .heap (bytes of the message text).
+    It has the elementCount, trialCount, maxMessageLength, counts and tableCounts() of EDF2numpyIndex, so EDF2numpy can
+    size its data arrays from it.
+    Parameters
+        edfFilename = the path/filename of the captured EDF, the capture is <edfFilename>.edfcap
+        captureFilename = optional path/filename of the capture file to use instead
+    """
+    def __init__(self, edfFilename, captureFilename=None):
+        self.edfFilename = edfFilename                                      # the captured EDF
+        self.captureFilename = captureFilename if captureFilename != None else edfFilename + CAPTURE_SUFFIX
+        self.fingerprint = None                                             # fingerprint of the EDF when it was captured
+        self.openOptions = None                                             # options the EDF was opened with when it was captured
+        self.preamble = ''                                                  # preamble text of the EDF
+        self.elementCount = 0                                               # number of elements in the capture
+        self.trialCount = 0                                                 # number of trials reported by edf_get_trial_count()
+        self.maxMessageLength = 0                                           # length of the longest message
+        self.counts = {}                                                    # number of elements of each EDF data type
+        self.samples = np.empty(0, dtype=FSAMPLEtype)
+        self.records = np.empty(0, dtype=RECORDtype)
+        self.elements = np.empty(0, dtype=ELEMENTtype)
+        self.heap = np.empty(0, dtype=np.uint8)
+    def converterOptions(self, converter):
+        """
+        Get the options of an EDF2numpy instance that change the captured elements and trials. Events and samples are always
+        captured, so these are only the consistency check and the trial markers.
+        Parameters
+            converter = the EDF2numpy instance
+        Return
+            Returns the options as a dictionary
+        """
+        opts = converter.options
+        return {'consistency': converter.consistencyArgs, 'trialStart': opts['trial_parse_start'], 'trialEnd': opts['trial_parse_end']}
+    def tableCounts(self, elementTypes):
+        """
+        Get the number of rows each data array needs when the given EDF data types are decoded, see EDF2numpyIndex.tableCounts().
+        """
+        return dict([(table, sum([self.counts.get(i, 0) for i in tableElementTypes[table] if i in elementTypes])) for table in tableElementTypes])
+##--------------------------------------------------------------------------------------------------------------------------------
+## Capture file
+##--------------------------------------------------------------------------------------------------------------------------------
+    def load(self, converter=None):
+        """
+        Load the header of the capture file and map its tables into memory.
+        Parameters
+            converter = optional EDF2numpy instance that will read the EDF. The capture is only loaded if it matches the EDF and
+                the options of converter. Without a converter the capture is loaded as it is, and the EDF does not need to exist.
+        Return
+            Returns True if the capture was loaded, False if the capture file is missing or out of date
+        """
+        try:
+            try:
+                with open(self.captureFilename, 'rb') as f:
+                    magic, headerOffset, headerLength = PREFACE.unpack(f.read(PREFACE.size))
+                    if magic != CAPTURE_MAGIC:
+                        return False
+                    f.seek(headerOffset)
+                    header = json.loads(f.read(headerLength).decode('utf-8'))
+            except (OSError, ValueError, struct.error):
+                return False
+            if header.get('version') != CAPTURE_VERSION:
+                return False
+            if converter != None:
+                if header.get('openOptions') != self.converterOptions(converter):
+                    return False
+                if header.get('fingerprint') != EDF2numpyIndex(self.edfFilename).fileFingerprint():
+                    return False
+            self.fingerprint = header['fingerprint']
+            self.openOptions = header['openOptions']
+            self.preamble = header['preamble']
+            self.elementCount = header['elementCount']
+            self.trialCount = header['trialCount']
+            self.maxMessageLength = header['maxMessageLength']
+            # JSON keys are strings
+            self.counts = dict([(int(i), header['counts'][i]) for i in header['counts']])
+            tables = header['tables']
+            self.samples = self.mapTable(tables['samples'], FSAMPLEtype)
+            self.records = self.mapTable(tables['records'], RECORDtype)
+            self.elements = self.mapTable(tables['elements'], ELEMENTtype)
+            self.heap = self.mapTable(tables['heap'], np.dtype(np.uint8))
+            return True
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyCapture.load: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyCapture.load')
+    def mapTable(self, table, dtype):
+        """
+        Map a table of the capture file into memory.
+        Parameters
+            table = [offset, rows] of the table in the capture file
+            dtype = the numpy dtype of the rows
+        Return
+            Returns a read only numpy memmap, or an empty array for a table without rows
+        """
+        offset, rows = table
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.captureFilename, dtype=dtype, mode='r', offset=offset, shape=(rows,))
+    def elementData(self, positions):
+        """
+        Copy the records of some non-sample elements into ALLF_DATA sized rows with their message pointers restored, so
+        they can be read with ALLF_DATA.from_address() like the data returned by edf_get_float_data().
+        Parameters
+            positions = the positions of the elements in the capture, counting from 0
+        Return
+            Returns (buffer, addresses): a numpy array of the rows, which must be kept while they are read, and the address of
+            each row
+        """
+        rowSize = sizeof(ALLF_DATA)
+        buffer = np.zeros((len(positions), rowSize), dtype=np.uint8)
+        records = np.array(self.records[self.elements['row'][positions]])
+        hasMessage = records['message'] != 0
+        # message holds the position of the text in the heap plus one
+        records['message'][hasMessage] = self.heap.ctypes.data + records['message'][hasMessage] - 1 if self.heap.size > 0 else 0
+        buffer[:, :RECORDtype.itemsize] = records.view(np.uint8).reshape(-1, RECORDtype.itemsize)
+        return buffer, buffer.ctypes.data + np.arange(len(positions)) * rowSize
+##--------------------------------------------------------------------------------------------------------------------------------
+## Building
+##--------------------------------------------------------------------------------------------------------------------------------
+    def build(self, converter):
+        """
+        Capture the EDF with one pass over its elements and write the capture file, through a temporary file so readers never
+        see a partly written capture. The samples are written as they are read, the other tables are kept in memory until
+        the end of the pass.
+        Parameters
+            converter = the EDF2numpy instance whose EDFACCESSwrapper and options are used to open the EDF
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            self.fingerprint = EDF2numpyIndex(self.edfFilename).fileFingerprint()
+            self.openOptions = self.converterOptions(converter)
+            wrapper = converter.Edfwrapper
+            temp = self.captureFilename + '.' + str(os.getpid()) + '.tmp'
+            with wrapper.openFile(self.edfFilename, self.openOptions['consistency'], 1, 1) as edf, open(temp, 'wb') as f:
+                wrapper.edf_set_trial_identifier(edf, self.openOptions['trialStart'], self.openOptions['trialEnd'])
+                self.trialCount = wrapper.edf_get_trial_count(edf)
+                length = wrapper.edf_get_preamble_text_length(edf)
+                self.preamble = wrapper.edf_get_preamble_text(edf, length + 1) if length > 0 else ''
+                elements = np.empty(max(wrapper.edf_get_element_count(edf), 1), dtype=ELEMENTtype)
+                samples = np.empty(CAPTURE_BLOCK, dtype=FSAMPLEtype)
+                records = bytearray()
+                heap = bytearray()
+                self.counts = {}
+                self.maxMessageLength = 0
+                sampleCount = stagedSamples = recordCount = 0
+                # the samples are written first, straight after the preface
+                f.write(b'\0' * CAPTURE_ALIGNMENT)
+                position = 0
+                for position, (DataType, address) in enumerate(wrapper.iterElements(edf)):
+                    if position == elements.size:
+                        elements = np.resize(elements, elements.size * 2)
+                    if DataType == SAMPLE_TYPE:
+                        memmove(samples.ctypes.data + stagedSamples * FSAMPLEtype.itemsize, address, FSAMPLEtype.itemsize)
+                        elements[position] = (DataType, sampleCount)
+                        stagedSamples += 1
+                        sampleCount += 1
+                        if stagedSamples == CAPTURE_BLOCK:
+                            f.write(samples.tobytes())
+                            stagedSamples = 0
+                    else:
+                        record = bytearray(string_at(address, RECORDtype.itemsize))
+                        if DataType == MESSAGEEVENT:
+                            # move the text to the heap and keep its position in place of the pointer
+                            text = ALLF_DATA.from_address(address).FEVENT.message.contents
+                            self.maxMessageLength = max(self.maxMessageLength, text.length)
+                            if len(heap) % 2:
+                                heap += b'\0'
+                            struct.pack_into('<Q', record, FEVENTtype.fields['message'][1], len(heap) + 1)
+                            heap += struct.pack('<H', text.length) + string_at(addressof(text) + 2, text.length) + b'\0'
+                        elif DataType in tableElementTypes['EVENTS']:
+                            struct.pack_into('<Q', record, FEVENTtype.fields['message'][1], 0)
+                        records += record
+                        elements[position] = (DataType, recordCount)
+                        recordCount += 1
+                    self.counts[DataType] = self.counts.get(DataType, 0) + 1
+                self.elementCount = sum(self.counts.values())
+                f.write(samples[:stagedSamples].tobytes())
+                tables = {'samples': [CAPTURE_ALIGNMENT, sampleCount]}
+                for name, data, rows in [('records', records, recordCount), ('elements', elements[:self.elementCount].tobytes(), self.elementCount), ('heap', heap, len(heap))]:
+                    f.write(b'\0' * (-f.tell() % CAPTURE_ALIGNMENT))
+                    tables[name] = [f.tell(), rows]
+                    f.write(data)
+                header = json.dumps({'version': CAPTURE_VERSION, 'fingerprint': self.fingerprint, 'openOptions': self.openOptions,
+                    'preamble': self.preamble, 'elementCount': self.elementCount, 'trialCount': self.trialCount,
+                    'maxMessageLength': self.maxMessageLength, 'counts': self.counts, 'tables': tables}).encode('utf-8')
+                headerOffset = f.tell()
+                f.write(header)
+                f.seek(0)
+                f.write(PREFACE.pack(CAPTURE_MAGIC, headerOffset, len(header)))
+            os.replace(temp, self.captureFilename)
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyCapture.build: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyCapture.build')
+
+def openCapture(converter, edfFilename):
+    '''
+    Load the capture of an EDF, capturing the EDF first if the capture is missing or out of date.
+    Parameters
+        converter = the EDF2numpy instance that will read the EDF
+        edfFilename = the path/filename of the EDF
+    Returns
+        The loaded EDF2numpyCapture
+    '''
+    capture = EDF2numpyCapture(edfFilename)
+    if not capture.load(converter):
+        converter.printStatus('...Capturing the elements of ' + str(edfFilename) + '...')
+        capture.build(converter)
+        if not capture.load(converter):
+            raise Exception('Could not load the capture ' + capture.captureFilename)
+    return capture
+
+def loadCapture(captureFilename):
+    '''
+    Load a capture file on its own, e.g. after the EDF has been archived.
+    Parameters
+        captureFilename = the path/filename of the capture file
+    Returns
+        The loaded EDF2numpyCapture
+    '''
+    edfFilename = captureFilename[:-len(CAPTURE_SUFFIX)] if captureFilename.endswith(CAPTURE_SUFFIX) else captureFilename
+    capture = EDF2numpyCapture(edfFilename, captureFilename)
+    if not capture.load():
+        raise Exception(str(captureFilename) + ' is not a valid capture file')
+    return capture
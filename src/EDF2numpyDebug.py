@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code writes the debug output of EDF2numpy (output_data_debugflags) quickly.
+formatRows() turns a whole block of structured rows into the tab delimited lines of the debug file in one step per column.
+BinaryDebugFile writes the rows as raw binary blocks instead, which costs little more than a copy of the rows, and
+debugToText() turns a binary debug file into the text debug file afterwards, line for line the same as the text output.
+Samples and events are decoded in full blocks of each kind, so their rows are written as a group together with the order
+that merges them back into the order of the EDF (see formatGroup() and BinaryDebugFile.writeGroup()).
+'''
+import json, struct
+try:
+    import numpy as np
+except ModuleNotFoundError as e:
+    raise ModuleNotFoundError('\n\nIt looks like you have ' + str(e) + ' installed. Please install the following modules for this code to run: numpy') from e
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+DEBUG_MAGIC = b'EDF2NPDEBUG1'   # start of a binary debug file
+DEBUG_BUFFER_SIZE = 1 << 20     # bytes a debug file collects before they are written to disk
+# record kinds of a binary debug file, each followed by its uint32 header fields and payload
+RECORD_SCHEMA = b'S'            # schema id, length, JSON descr of a row dtype
+RECORD_ROWS = b'R'              # schema id, row count, raw rows
+RECORD_LINE = b'L'              # length, UTF-8 text of a formatted line
+RECORD_GROUP = b'G'             # block count, row count, uint32 order of the rows; followed by the row records of the blocks
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Text formatting
+##--------------------------------------------------------------------------------------------------------------------------------
+def formatLines(rows):
+    """
+    Format a block of structured rows as the lines of the text debug file, each value followed by a tab.
+    Each column is converted to text in one step, astype(str) gives the same text as str() of each numpy value.
+    Parameters
+        rows = a structured numpy array
+    Return
+        Returns a list with one line per row
+    """
+    if rows.size == 0:
+        return []
+    columns = [rows[i].astype(str).tolist() for i in rows.dtype.names]
+    return ['\t'.join(i) + '\t\n' for i in zip(*columns)]
+
+def formatRows(rows):
+    """
+    Format a block of structured rows as the lines of the text debug file, see formatLines().
+    Parameters
+        rows = a structured numpy array
+    Return
+        Returns the lines as one string
+    """
+    return ''.join(formatLines(rows))
+
+def formatGroup(blocks, order):
+    """
+    Format several blocks of structured rows as the lines of the text debug file, in the given order.
+    Parameters
+        blocks = list of structured numpy arrays
+        order = the positions of the rows of all blocks, one after the other, in the order they are written
+    Return
+        Returns the lines as one string
+    """
+    lines = sum([formatLines(i) for i in blocks], [])
+    return ''.join([lines[i] for i in order.tolist()])
+
+def groupOrder(elementIndexes):
+    """
+    Get the order that merges blocks of rows by their position in the EDF.
+    Parameters
+        elementIndexes = list with the EDF buffer index of each row of each block
+    Return
+        Returns a uint32 array with the positions of the rows of all blocks, one after the other, in the order of the EDF
+    """
+    return np.argsort(np.concatenate(elementIndexes), kind='stable').astype('u4')
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Binary debug file
+##--------------------------------------------------------------------------------------------------------------------------------
+class BinaryDebugFile:
+    """
+    A debug file that stores blocks of structured rows as raw bytes and other records as formatted lines, in the order they
+    are written. The dtype of each kind of row is stored once, the first time it is written.
+    Parameters
+        filename = the name of the binary debug file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'wb', buffering=DEBUG_BUFFER_SIZE)
+        self.schemas = {}       # id of each dtype written so far
+        self.file.write(DEBUG_MAGIC)
+    def writeRows(self, rows, empty=False):
+        """
+        Append a block of structured rows.
+        Parameters
+            rows = a structured numpy array
+            empty = True to write a block without rows as well
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if rows.size == 0 and not empty:
+            return 0
+        schema = self.schemas.get(rows.dtype)
+        if schema == None:
+            schema = len(self.schemas)
+            self.schemas[rows.dtype] = schema
+            descr = json.dumps(np.lib.format.dtype_to_descr(rows.dtype)).encode('utf-8')
+            self.file.write(RECORD_SCHEMA + struct.pack('<II', schema, len(descr)) + descr)
+        self.file.write(RECORD_ROWS + struct.pack('<II', schema, rows.size))
+        # the rows are written straight from their memory, without copying them into a bytes object first
+        self.file.write(np.ascontiguousarray(rows).view(np.uint8))
+        return 0
+    def writeGroup(self, blocks, order):
+        """
+        Append blocks of structured rows that are read back merged in the given order, see formatGroup().
+        Parameters
+            blocks = list of structured numpy arrays
+            order = the positions of the rows of all blocks, one after the other, in the order they are written
+        Return
+            Returns 0 if the operation is successful.
+        """
+        order = np.ascontiguousarray(order, dtype='<u4')
+        self.file.write(RECORD_GROUP + struct.pack('<II', len(blocks), order.size))
+        self.file.write(order.tobytes())
+        for i in blocks:
+            # empty blocks are written too so the reader always finds as many blocks as the group holds
+            self.writeRows(i, True)
+        return 0
+    def writeLine(self, line):
+        """
+        Append a formatted line of text.
+        Parameters
+            line = the line, including its line ending
+        Return
+            Returns 0 if the operation is successful.
+        """
+        text = line.encode('utf-8')
+        self.file.write(RECORD_LINE + struct.pack('<I', len(text)) + text)
+        return 0
+    def close(self):
+        self.file.close()
+        return 0
+
+def readDebugFile(filename):
+    """
+    Generator that reads the records of a binary debug file back in the order they were written.
+    Parameters
+        filename = the name of the binary debug file
+    Return
+        Yields a structured numpy array for each block of rows, a str for each formatted line and a tuple (blocks, order) for
+        each group written by BinaryDebugFile.writeGroup()
+    """
+    schemas = {}
+    group = None        # [blocks, order, number of blocks] of the group being read
+    with open(filename, 'rb') as f:
+        if f.read(len(DEBUG_MAGIC)) != DEBUG_MAGIC:
+            raise Exception(str(filename) + ' is not a binary debug file')
+        while True:
+            kind = f.read(1)
+            if kind == b'':
+                return
+            if kind == RECORD_GROUP:
+                count, rows = struct.unpack('<II', f.read(8))
+                group = [[], np.frombuffer(f.read(rows * 4), dtype='<u4'), count]
+                if count == 0:
+                    group = None
+            elif kind == RECORD_SCHEMA:
+                schema, length = struct.unpack('<II', f.read(8))
+                descr = json.loads(f.read(length).decode('utf-8'))
+                # JSON turns the (name, type) pairs of the descr into lists
+                schemas[schema] = np.lib.format.descr_to_dtype([tuple(i) for i in descr] if isinstance(descr, list) else descr)
+            elif kind == RECORD_ROWS:
+                schema, count = struct.unpack('<II', f.read(8))
+                dtype = schemas[schema]
+                rows = np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype)
+                if group == None:
+                    yield rows
+                else:
+                    group[0].append(rows)
+                    if len(group[0]) == group[2]:
+                        yield (group[0], group[1])
+                        group = None
+            elif kind == RECORD_LINE:
+                length, = struct.unpack('<I', f.read(4))
+                yield f.read(length).decode('utf-8')
+            else:
+                raise Exception('Unknown record in binary debug file ' + str(filename))
+
+def debugToText(filename, textFilename=None):
+    """
+    Convert a binary debug file into the tab delimited text debug file that output_data_debugflags writes by default.
+    Parameters
+        filename = the name of the binary debug file, e.g. <EDF name>.debugbin
+        textFilename = the name of the text file. <EDF name>.debug next to the binary file if None.
+    Return
+        Returns the name of the text file
+    """
+    if textFilename == None:
+        textFilename = filename[:-len('bin')] if filename.endswith('.debugbin') else filename + '.debug'
+    with open(textFilename, 'w', buffering=DEBUG_BUFFER_SIZE) as f:
+        for i in readDebugFile(filename):
+            if isinstance(i, str):
+                f.write(i)
+            elif isinstance(i, tuple):
+                f.write(formatGroup(*i))
+            else:
+                f.write(formatRows(i))
+    return textFilename
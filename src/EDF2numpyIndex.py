@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code builds an index of an EyeLink Data File (EDF) and keeps it in a small sidecar file next to the EDF
+(<EDF name>.index.json), so that later reads of the same file can skip the pass that counts its records.
+The index holds the number of elements of each EDF data type in the file, and for every trial and every recording block the
+position of its first and last element, its start and end time and the number of its elements of each data type.
+EDF2numpy uses it to allocate its data arrays at their exact size and to jump straight to the trial holding a given time.
+The index is rebuilt when the EDF changes or is opened with different trial markers or consistency options.
+'''
+import os, json, hashlib
+from bisect import bisect_right
+from EDFACCESSwrapper import *
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+INDEX_VERSION = 1               # format of the sidecar file, older files are rebuilt
+INDEX_SUFFIX = '.index.json'    # appended to the EDF name to get the name of the sidecar file
+FINGERPRINT_BLOCK = 1 << 20     # bytes hashed at the start and at the end of the EDF
+# EDF data types decoded into each data array, see EDF2numpy.decodeElements()
+tableElementTypes = {'RECORDINGS':[RECORDING_INFO], 'MESSAGES':[MESSAGEEVENT], 'SAMPLES':[SAMPLE_TYPE],
+    'EVENTS':[STARTBLINK,ENDBLINK,STARTSACC,ENDSACC,STARTFIX,ENDFIX,FIXUPDATE], 'IOEVENTS':[BUTTONEVENT,INPUTEVENT]}
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## EDF2numpyIndex functions
+##--------------------------------------------------------------------------------------------------------------------------------
+class EDF2numpyIndex:
+    """
+    The trial and recording block index of an EDF file. Create with EDF2numpyIndex(edfFilename) and fill it with load() or
+    build(), or use openIndex() to do both.
+    Each entry of .trials and .recordings is a dictionary with the keys 'start' and 'end' (times in milliseconds),
+    'firstElement' and 'lastElement' (positions of elements in the file, counting from 0) and 'counts' (number of elements
+    of each EDF data type).
+    Parameters
+        edfFilename = the path/filename of the EDF
+    """
+    def __init__(self, edfFilename):
+        self.edfFilename = edfFilename                      # the indexed EDF
+        self.indexFilename = edfFilename + INDEX_SUFFIX     # the sidecar file
+        self.fingerprint = None                             # fingerprint of the EDF when the index was built
+        self.openOptions = None                             # options the EDF was opened with when the index was built
+        self.elementCount = 0                               # number of elements reported by edf_get_element_count()
+        self.trialCount = 0                                 # number of trials reported by edf_get_trial_count()
+        self.maxMessageLength = 0                           # length of the longest message
+        self.counts = {}                                    # number of elements of each EDF data type in the file
+        self.trials = []                                    # entry of each trial
+        self.recordings = []                                # entry of each recording block
+##--------------------------------------------------------------------------------------------------------------------------------
+## Keys
+##--------------------------------------------------------------------------------------------------------------------------------
+    def fileFingerprint(self):
+        """
+        Fingerprint the EDF by its size, modification time and a hash of its first and last FINGERPRINT_BLOCK bytes.
+        Unlike the content hash of EDF2numpyCache this does not read the whole file, as the index is checked on every read.
+        Return
+            Returns the fingerprint as a string
+        """
+        try:
+            stat = os.stat(self.edfFilename)
+            sha = hashlib.sha256()
+            with open(self.edfFilename, 'rb') as f:
+                sha.update(f.read(FINGERPRINT_BLOCK))
+                if stat.st_size > FINGERPRINT_BLOCK:
+                    f.seek(max(FINGERPRINT_BLOCK, stat.st_size - FINGERPRINT_BLOCK))
+                    sha.update(f.read(FINGERPRINT_BLOCK))
+            return str(stat.st_size) + ':' + str(stat.st_mtime_ns) + ':' + sha.hexdigest()
+        except Exception as e:
+            raise Exception('An error has occurred with fileFingerprint: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with fileFingerprint')
+    def converterOptions(self, converter):
+        """
+        Get the options of an EDF2numpy instance that change the elements and trials of the opened EDF.
+        Parameters
+            converter = the EDF2numpy instance
+        Return
+            Returns the options as a dictionary
+        """
+        opts = converter.options
+        return {'consistency': converter.consistencyArgs, 'loadevents': opts['events_enabled'], 'loadsamples': opts['samples_enabled'],
+            'trialStart': opts['trial_parse_start'], 'trialEnd': opts['trial_parse_end']}
+##--------------------------------------------------------------------------------------------------------------------------------
+## Sidecar file
+##--------------------------------------------------------------------------------------------------------------------------------
+    def load(self, converter):
+        """
+        Load the index from the sidecar file if it matches the EDF and the options of converter.
+        Parameters
+            converter = the EDF2numpy instance that will read the EDF
+        Return
+            Returns True if the index was loaded, False if the sidecar file is missing or out of date
+        """
+        try:
+            try:
+                with open(self.indexFilename, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return False
+            if data.get('version') != INDEX_VERSION or data.get('fingerprint') != self.fileFingerprint() or data.get('openOptions') != self.converterOptions(converter):
+                return False
+            self.fingerprint = data['fingerprint']
+            self.openOptions = data['openOptions']
+            self.elementCount = data['elementCount']
+            self.trialCount = data['trialCount']
+            self.maxMessageLength = data['maxMessageLength']
+            # JSON keys are strings, the data types are numbers
+            self.counts = dict([(int(i), data['counts'][i]) for i in data['counts']])
+            for entries in [data['trials'], data['recordings']]:
+                for i in entries:
+                    i['counts'] = dict([(int(j), i['counts'][j]) for j in i['counts']])
+            self.trials = data['trials']
+            self.recordings = data['recordings']
+            return True
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyIndex.load: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyIndex.load')
+    def save(self):
+        """
+        Write the index to the sidecar file, through a temporary file so readers never see a partly written index.
+        A directory that cannot be written to, e.g. a read-only archive, is reported and the index is only kept in memory.
+        Return
+            Returns True if the sidecar file was written
+        """
+        try:
+            data = {'version': INDEX_VERSION, 'fingerprint': self.fingerprint, 'openOptions': self.openOptions,
+                'elementCount': self.elementCount, 'trialCount': self.trialCount, 'maxMessageLength': self.maxMessageLength,
+                'counts': self.counts, 'trials': self.trials, 'recordings': self.recordings}
+            temp = self.indexFilename + '.' + str(os.getpid()) + '.tmp'
+            try:
+                with open(temp, 'w') as f:
+                    json.dump(data, f)
+                os.replace(temp, self.indexFilename)
+            except OSError as e:
+                print('...Could not write the index ' + self.indexFilename + ': ' + str(e) + '...')
+                return False
+            return True
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyIndex.save: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyIndex.save')
+##--------------------------------------------------------------------------------------------------------------------------------
+## Building
+##--------------------------------------------------------------------------------------------------------------------------------
+    def build(self, converter):
+        """
+        Build the index with one pass over the elements of the EDF. The trial times are read from the trial headers first
+        and every element is counted in the trial whose time span holds it, the same rule iterTrialElements() reads trials by.
+        A recording block runs from a RECORDING_INFO element that starts recording to the one that ends it.
+        Parameters
+            converter = the EDF2numpy instance whose EDFACCESSwrapper and options are used to open the EDF
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            self.fingerprint = self.fileFingerprint()
+            self.openOptions = self.converterOptions(converter)
+            wrapper = converter.Edfwrapper
+            with wrapper.openFile(self.edfFilename, self.openOptions['consistency'], self.openOptions['loadevents'], self.openOptions['loadsamples']) as edf:
+                wrapper.edf_set_trial_identifier(edf, self.openOptions['trialStart'], self.openOptions['trialEnd'])
+                self.elementCount = wrapper.edf_get_element_count(edf)
+                self.trialCount = wrapper.edf_get_trial_count(edf)
+                # read the trial headers, then rewind to the start of the file for the element pass
+                bookmark = BOOKMARK()
+                if wrapper.edf_set_bookmark(edf, byref(bookmark)) != 0:
+                    raise Exception('Could not bookmark the start of the EDF file')
+                self.trials = []
+                for i in range(self.trialCount):
+                    header = TRIAL()
+                    if wrapper.edf_jump_to_trial(edf, i) != 0 or wrapper.edf_get_trial_header(edf, byref(header)) != 0:
+                        break
+                    self.trials.append(self.newEntry(header.starttime, header.endtime))
+                if wrapper.edf_goto_bookmark(edf, byref(bookmark)) != 0:
+                    raise Exception('Could not rewind the EDF file to its start')
+                wrapper.edf_free_bookmark(edf, byref(bookmark))
+                self.counts = {}
+                self.recordings = []
+                self.maxMessageLength = 0
+                trial = 0
+                block = None
+                for position, (DataType, address) in enumerate(wrapper.iterElements(edf)):
+                    # every ALLF_DATA structure starts with the time of the element
+                    time = c_uint32.from_address(address).value
+                    self.counts[DataType] = self.counts.get(DataType, 0) + 1
+                    if DataType == MESSAGEEVENT:
+                        self.maxMessageLength = max(self.maxMessageLength, ALLF_DATA.from_address(address).FEVENT.message.contents.length)
+                    elif DataType == RECORDING_INFO and ALLF_DATA.from_address(address).RECORDINGS.state == 1:
+                        block = self.newEntry(time, time)
+                        self.recordings.append(block)
+                    while trial < len(self.trials) and time > self.trials[trial]['end']:
+                        trial += 1
+                    if trial < len(self.trials) and time >= self.trials[trial]['start']:
+                        self.addElement(self.trials[trial], position, DataType)
+                    if block != None:
+                        self.addElement(block, position, DataType)
+                        block['end'] = time
+                        if DataType == RECORDING_INFO and ALLF_DATA.from_address(address).RECORDINGS.state == 0:
+                            block = None
+            return 0
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyIndex.build: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyIndex.build')
+    def newEntry(self, start, end):
+        """
+        Create an empty trial or recording block entry.
+        """
+        return {'start': start, 'end': end, 'firstElement': None, 'lastElement': None, 'counts': {}}
+    def addElement(self, entry, position, DataType):
+        """
+        Count an element in a trial or recording block entry.
+        """
+        if entry['firstElement'] == None:
+            entry['firstElement'] = position
+        entry['lastElement'] = position
+        entry['counts'][DataType] = entry['counts'].get(DataType, 0) + 1
+        return 0
+##--------------------------------------------------------------------------------------------------------------------------------
+## Lookups
+##--------------------------------------------------------------------------------------------------------------------------------
+    def tableCounts(self, elementTypes, entries=None):
+        """
+        Get the number of rows each data array needs when the given EDF data types are decoded.
+        Parameters
+            elementTypes = the set of decoded EDF data types, e.g. EDF2numpy.decodePlan.elementTypes
+            entries = optional list of trial or recording block entries to count, the whole file if None
+        Return
+            Returns a dictionary with the number of rows of 'RECORDINGS','MESSAGES','SAMPLES','EVENTS' and 'IOEVENTS'
+        """
+        try:
+            sources = [self.counts] if entries == None else [i['counts'] for i in entries]
+            return dict([(table, sum([counts.get(i, 0) for counts in sources for i in tableElementTypes[table] if i in elementTypes])) for table in tableElementTypes])
+        except Exception as e:
+            raise Exception('An error has occurred with tableCounts: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with tableCounts')
+    def trialAt(self, time):
+        """
+        Find the last trial that starts at or before a time.
+        Parameters
+            time = the time in milliseconds
+        Return
+            Returns the trial number, or None if the time is before the first trial
+        """
+        trial = bisect_right([i['start'] for i in self.trials], time) - 1
+        return trial if trial >= 0 else None
+    def trialTimes(self, trial):
+        """
+        Get the start and end time of a trial.
+        Parameters
+            trial = the trial number
+        Return
+            Returns (start time, end time) in milliseconds, or None if the trial is not in the index
+        """
+        if trial < 0 or trial >= len(self.trials):
+            return None
+        return self.trials[trial]['start'], self.trials[trial]['end']
+
+def openIndex(converter, edfFilename):
+    '''
+    Load the sidecar index of an EDF, building and saving it first if it is missing or out of date.
+    Parameters
+        converter = the EDF2numpy instance that will read the EDF
+        edfFilename = the path/filename of the EDF
+    Returns
+        The EDF2numpyIndex
+    '''
+    index = EDF2numpyIndex(edfFilename)
+    if not index.load(converter):
+        converter.printStatus('...Building the index of ' + str(edfFilename) + '...')
+        index.build(converter)
+        index.save()
+    return index
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code stores the text of EyeLink messages compactly. The text of every message is kept once in a single UTF-8 byte heap
+and each row of MESSAGEdata holds the offset and length of its text in the heap, instead of a fixed-width Unicode column that
+is as wide as the longest message at 4 bytes per character.
+The text is only decoded to python strings when it is accessed, and prefix and substring searches run on the heap itself.
+'''
+import re
+try:
+    import numpy as np
+except ModuleNotFoundError as e:
+    raise ModuleNotFoundError('\n\nIt looks like you have ' + str(e) + ' installed. Please install the following modules for this code to run: numpy') from e
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Message text
+##--------------------------------------------------------------------------------------------------------------------------------
+class MessageText:
+    """
+    A read-only sequence of message strings stored as a UTF-8 byte heap plus the offset and length of each string.
+    Indexing with an integer decodes one string, any other index (slice, boolean mask or index array) returns a MessageText
+    of the selected strings that shares the same heap.
+    Parameters
+        heap = numpy uint8 array holding the UTF-8 text of the messages
+        offsets = numpy array with the position of each string in the heap
+        lengths = numpy array with the length of each string in bytes
+    """
+    def __init__(self, heap, offsets, lengths):
+        self.heap = heap
+        self.offsets = np.asarray(offsets, dtype='i8')
+        self.lengths = np.asarray(lengths, dtype='i8')
+    def __len__(self):
+        return self.offsets.size
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            start = self.offsets[index]
+            return self.heap[start:start + self.lengths[index]].tobytes().decode('utf-8')
+        return MessageText(self.heap, self.offsets[index], self.lengths[index])
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    def __repr__(self):
+        return 'MessageText(' + repr(self.tolist()[:10])[:-1] + (', ...])' if len(self) > 10 else '])')
+    def tolist(self):
+        """
+        Decode every string of the sequence.
+        Return
+            Returns a list of python strings
+        """
+        return [i for i in self]
+    def toFixedWidth(self):
+        """
+        Copy the strings into a fixed-width numpy Unicode array, as wide as the longest string.
+        Return
+            Returns a numpy 'U' array
+        """
+        return np.array(self.tolist(), dtype='U' + str(max(1, int(self.lengths.max(initial=0)))))
+    def startswith(self, prefix):
+        """
+        Test every string for a prefix without decoding the strings.
+        Parameters
+            prefix = the prefix, a str or UTF-8 bytes
+        Return
+            Returns a boolean numpy array with one element per string
+        """
+        prefix = np.frombuffer(prefix.encode('utf-8') if isinstance(prefix, str) else prefix, dtype=np.uint8)
+        found = self.lengths >= prefix.size
+        if prefix.size > 0 and found.any():
+            # compare the first bytes of every long enough string with the prefix in one step
+            candidates = np.flatnonzero(found)
+            found[candidates] = (self.heap[self.offsets[candidates, None] + np.arange(prefix.size)] == prefix).all(axis=1)
+        return found
+    def contains(self, substring):
+        """
+        Test every string for a substring without decoding the strings. The heap is searched once and each match is mapped
+        back to the string it falls in.
+        Parameters
+            substring = the substring, a str or UTF-8 bytes
+        Return
+            Returns a boolean numpy array with one element per string
+        """
+        substring = substring.encode('utf-8') if isinstance(substring, str) else substring
+        if len(substring) == 0:
+            return np.ones(len(self), dtype=bool)
+        # search the part of the heap used by these strings, in the order the strings are stored
+        order = np.argsort(self.offsets, kind='stable')
+        starts = self.offsets[order]
+        ends = starts + self.lengths[order]
+        found = np.zeros(len(self), dtype=bool)
+        if len(self) == 0:
+            return found
+        base = int(starts[0])
+        text = self.heap[base:int(ends.max())].tobytes()
+        # overlapping matches are found with a look-ahead so a match at the end of one string cannot hide one in the next
+        positions = np.array([m.start() for m in re.finditer(b'(?=' + re.escape(substring) + b')', text)], dtype='i8') + base
+        if positions.size > 0:
+            row = np.searchsorted(starts, positions, side='right') - 1
+            inside = positions + len(substring) <= ends[row]
+            found[order[row[inside]]] = True
+        return found
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Message table
+##--------------------------------------------------------------------------------------------------------------------------------
+class MessageArray(np.ndarray):
+    """
+    A structured numpy array of messages whose text is kept in a UTF-8 heap. Each row holds the position of its text in the
+    columns 'textOffset' and 'textLength'. MessageArray['message'] returns the text as a MessageText, every other column and
+    row selection works as it does for a structured numpy array and keeps the heap.
+    Create with MessageArray(rows, heap).
+    """
+    def __new__(cls, rows, heap):
+        table = np.asarray(rows).view(cls)
+        table.heap = np.frombuffer(bytes(heap), dtype=np.uint8) if isinstance(heap, (bytes, bytearray)) else np.asarray(heap, dtype=np.uint8)
+        return table
+    def __array_finalize__(self, obj):
+        # slices, masks and copies share the heap of the array they come from
+        self.heap = getattr(obj, 'heap', np.zeros(0, dtype=np.uint8))
+    def __reduce__(self):
+        # numpy only pickles the rows, the heap is added to the state so the text survives pickling (e.g. in a process pool)
+        reconstruct, arguments, state = super().__reduce__()[:3]
+        return (reconstruct, arguments, state + (np.asarray(self.heap),))
+    def __setstate__(self, state):
+        self.heap = state[-1]
+        super().__setstate__(state[:-1])
+    def __getitem__(self, index):
+        if isinstance(index, str) and index == 'message':
+            return MessageText(self.heap, np.asarray(self['textOffset']), np.asarray(self['textLength']))
+        return super().__getitem__(index)
+    def toFixedWidth(self):
+        """
+        Copy the messages into a plain structured numpy array with a fixed-width Unicode 'message' column in place of the
+        'textOffset' and 'textLength' columns. The column is as wide as the longest message.
+        Return
+            Returns the structured numpy array
+        """
+        text = self['message'].toFixedWidth()
+        names = self.dtype.names
+        fields = []
+        for i in names:
+            if i == 'textOffset':
+                fields.append(('message', text.dtype))
+            elif i != 'textLength':
+                fields.append((i, self.dtype[i]))
+        table = np.empty(self.size, dtype=fields)
+        for i in table.dtype.names:
+            table[i] = text if i == 'message' else np.asarray(self[i])
+        return table
+
+def concatenateMessages(tables):
+    """
+    Join MessageArray batches into one MessageArray with a single heap. The text offsets of each batch are moved on by the
+    size of the heaps before it.
+    Parameters
+        tables = list of MessageArray
+    Return
+        Returns the joined MessageArray
+    """
+    heaps = [i.heap for i in tables]
+    shifts = np.cumsum([0] + [i.size for i in heaps[:-1]])
+    rows = np.concatenate([np.asarray(i) for i in tables])
+    rows['textOffset'] += np.repeat(shifts, [i.size for i in tables]).astype('i8')
+    return MessageArray(rows, np.concatenate(heaps) if heaps else np.zeros(0, dtype=np.uint8))
+
+if __name__ == '__main__':
+    # self-check: a MessageArray and a selection of it keep their text through a pickle round trip
+    import pickle, sys
+    text = ['TRIALID 1', '!V TRIAL_VAR condition \u00e9t\u00e9', '', 'TRIAL_RESULT 0']
+    heap = '\n'.join(text).encode('utf-8')
+    lengths = np.array([len(i.encode('utf-8')) for i in text], dtype='i8')
+    rows = np.zeros(len(text), dtype=[('time','u4'),('textOffset','i8'),('textLength','i8')])
+    rows['time'] = np.arange(len(text)) * 10
+    rows['textOffset'] = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+    rows['textLength'] = lengths
+    table = MessageArray(rows, heap)
+    failed = []
+    for name, expected in [('table', table), ('selection', table[1:])]:
+        copy = pickle.loads(pickle.dumps(expected))
+        if not isinstance(copy, MessageArray) or copy['message'].tolist() != expected['message'].tolist() or not np.array_equal(np.asarray(copy), np.asarray(expected)):
+            failed.append(name)
+    print('MessageArray pickle round trip: ' + ('failed for ' + ', '.join(failed) if failed else 'ok'))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code streams the conversion of an EyeLink Data File (EDF) into Parquet files without building the arrays of readEDF().
+The record batches of EDF2numpy.iterBatches() are converted to Arrow record batches and written to one Parquet file per
+data array (<output dir>/SAMPLES.parquet, EVENTS.parquet, MESSAGES.parquet and IOEVENTS.parquet) with one row group per
+trial, so the engines reading the files can skip whole trials and columns. Only the rows of the current trial are held in
+memory. Every row gets a 'trial' column: the first trial that ends at or after the time of the row, the rule EDF2numpyIndex
+counts elements by, or -1 after the end of the last trial. Trials are assigned in stream order, so a row never goes to an
+earlier trial than the row before it and each trial is one row group. The preamble and the trial times are kept in the
+metadata of each file.
+The Arrow schema is derived from the numpy dtype of each data array: numbers keep their type, text becomes string columns
+and the dictionary-encoded columns of categorical_columns_enabled become Arrow dictionary columns. RECORDINGdata has no
+time column and is not exported.
+pyarrow is optional, it is only needed to write the files.
+'''
+import os, json
+import numpy as np
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+from EDF2numpy import categories, batchTables
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+# data arrays written to Parquet files, in the order of readEDF()
+parquetTables = ['MESSAGES','SAMPLES','EVENTS','IOEVENTS']
+# columns holding the time of a row, the latest one that is set is used: start events only have a startTime
+timeColumns = ['time','startTime']
+DEFAULT_COMPRESSION = 'snappy'
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Arrow schema
+##--------------------------------------------------------------------------------------------------------------------------------
+def arrowSchema(dtype, table, categorical=False, metadata=None):
+    '''
+    Derive the Arrow schema of a data array from its numpy dtype, with a 'trial' column first.
+    The 'textOffset' and 'textLength' columns of compact messages become a single 'message' string column.
+    Parameters
+        dtype = the structured numpy dtype of the data array, e.g. EDF2numpy.SAMPLEtype
+        table = the name of the data array, e.g. 'SAMPLES'
+        categorical = True if the dictionary-encoded columns hold integer codes (categorical_columns_enabled)
+        metadata = optional dictionary of text stored in the schema
+    Returns
+        The pyarrow schema
+    '''
+    fields = [pa.field('trial', pa.int32())]
+    for name in dtype.names:
+        kind = dtype[name].kind
+        if name == 'textOffset':
+            fields.append(pa.field('message', pa.string()))
+        elif name == 'textLength':
+            continue
+        elif categorical and name in categories.get(table, {}) and kind == 'i':
+            fields.append(pa.field(name, pa.dictionary(pa.from_numpy_dtype(dtype[name]), pa.string())))
+        elif kind in 'UO':
+            fields.append(pa.field(name, pa.string()))
+        elif kind == 'S':
+            fields.append(pa.field(name, pa.binary()))
+        else:
+            fields.append(pa.field(name, pa.from_numpy_dtype(dtype[name])))
+    return pa.schema(fields, metadata=metadata)
+
+def arrowBatch(batch, schema, table, trials):
+    '''
+    Convert a batch of a data array to an Arrow record batch with the given schema.
+    Parameters
+        batch = the structured numpy array, or MessageArray of compact messages
+        schema = the schema from arrowSchema()
+        table = the name of the data array
+        trials = the trial number of each row
+    Returns
+        The pyarrow RecordBatch
+    '''
+    columns = []
+    for field in schema:
+        if field.name == 'trial':
+            columns.append(pa.array(trials, type=field.type))
+        elif field.name == 'message' and 'textOffset' in batch.dtype.names:
+            columns.append(pa.array(batch['message'].tolist(), type=field.type))
+        elif pa.types.is_dictionary(field.type):
+            codes = np.ascontiguousarray(batch[field.name])
+            columns.append(pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), pa.array(categories[table][field.name], type=pa.string())))
+        elif pa.types.is_string(field.type) or pa.types.is_binary(field.type):
+            columns.append(pa.array(batch[field.name].tolist(), type=field.type))
+        else:
+            columns.append(pa.array(np.ascontiguousarray(batch[field.name]), type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+def rowTimes(table, batch):
+    '''
+    Get the time of each row of a batch, the latest of its timeColumns.
+    Parameters
+        table = the name of the data array
+        batch = the structured numpy array
+    Returns
+        A numpy array of times in milliseconds
+    '''
+    columns = [np.asarray(batch[i]) for i in timeColumns if i in batch.dtype.names]
+    if len(columns) == 0:
+        raise Exception('the ' + table + ' data array has no time column, add time to output_columns to export it')
+    return np.maximum.reduce(columns) if len(columns) > 1 else columns[0]
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Parquet files
+##--------------------------------------------------------------------------------------------------------------------------------
+class TrialWriter:
+    """
+    Writes the rows of one data array to a Parquet file, one row group per trial. The rows of the current trial are
+    collected as Arrow record batches and written as a row group when the rows of the next trial arrive.
+    Parameters
+        filename = the path/filename of the Parquet file
+        schema = the schema from arrowSchema()
+        table = the name of the data array
+        trialEnds = numpy array of the end time of each trial
+        compression = the Parquet compression codec, e.g. 'snappy', 'zstd' or None
+    """
+    def __init__(self, filename, schema, table, trialEnds, compression=DEFAULT_COMPRESSION):
+        self.filename = filename
+        self.schema = schema
+        self.table = table
+        self.trialEnds = trialEnds
+        self.writer = pq.ParquetWriter(filename, schema, compression=compression)
+        self.pending = []                   # record batches of the current trial
+        self.trial = 0                      # position of the current trial in trialEnds, len(trialEnds) after the last trial
+        self.rows = 0                       # number of rows written
+        self.rowGroups = 0                  # number of row groups written
+    def append(self, batch):
+        """
+        Add a batch of rows, writing the row group of every trial that ends before the batch.
+        Parameters
+            batch = the structured numpy array
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if batch.size == 0:
+            return 0
+        trials = np.searchsorted(self.trialEnds, rowTimes(self.table, batch), side='left')
+        # a row never goes to an earlier trial than the row before it
+        trials = np.maximum.accumulate(np.maximum(trials, self.trial))
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(trials)) + 1])
+        ends = np.append(starts[1:], trials.size)
+        for start, end in zip(starts, ends):
+            if trials[start] != self.trial:
+                self.flush()
+                self.trial = int(trials[start])
+            numbers = np.full(end - start, self.trial if self.trial < self.trialEnds.size else -1, dtype=np.int32)
+            self.pending.append(arrowBatch(batch[start:end], self.schema, self.table, numbers))
+        return 0
+    def flush(self):
+        """
+        Write the rows of the current trial as one row group.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if len(self.pending) > 0:
+            rows = pa.Table.from_batches(self.pending, schema=self.schema)
+            self.writer.write_table(rows, row_group_size=max(1, rows.num_rows))
+            self.rows += rows.num_rows
+            self.rowGroups += 1
+            self.pending = []
+        return 0
+    def close(self):
+        """
+        Write the last row group and close the file.
+        Return
+            Returns 0 if the operation is successful.
+        """
+        try:
+            self.flush()
+        finally:
+            self.writer.close()
+        return 0
+
+def writeParquet(converter, edfFilename, outputDir, batchSize=65536, compression=DEFAULT_COMPRESSION):
+    '''
+    Convert an EDF to Parquet files in outputDir, streaming the record batches of converter.iterBatches() so memory use is
+    bounded by the rows of one trial. A file is written for every data array of parquetTables enabled in converter.options.
+    Parameters
+        converter = the EDF2numpy instance, with its input arguments consumed
+        edfFilename = the path/filename of the EDF
+        outputDir = the directory the Parquet files are written to, created if needed
+        batchSize = the largest number of rows decoded at once
+        compression = the Parquet compression codec, e.g. 'snappy', 'zstd' or None
+    Returns
+        A dictionary with the filename, number of rows and number of row groups of each data array
+    '''
+    if pa == None:
+        raise Exception('An error has occurred with writeParquet: Parquet export needs pyarrow, install it with pip install pyarrow')
+    writers = {}
+    try:
+        os.makedirs(outputDir, exist_ok=True)
+        for table, batch in converter.iterBatches(edfFilename, batchSize):
+            if table == 'HEADER':
+                # the data arrays hold the first batch buffers now, so their dtypes give the schemas
+                metadata = {'edf_file': os.path.basename(edfFilename), 'edf_preamble': str(batch['Header'][0]),
+                    'edf_trials': json.dumps([[int(i) for i in times] for times in converter.trials])}
+                trialEnds = np.array([i[1] for i in converter.trials], dtype=np.int64)
+                categorical = converter.decodePlan.settings['categorical']
+                for name in parquetTables:
+                    rows = getattr(converter, batchTables[name][0])
+                    if rows is not None:
+                        schema = arrowSchema(rows.dtype, name, categorical, metadata)
+                        writers[name] = TrialWriter(os.path.join(outputDir, name + '.parquet'), schema, name, trialEnds, compression)
+            elif table in writers:
+                writers[table].append(batch)
+    except Exception as e:
+        raise Exception('An error has occurred with writeParquet: ' + str(e))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return dict([(name, {'file': writers[name].filename, 'rows': writers[name].rows, 'rowGroups': writers[name].rowGroups}) for name in writers])
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code profiles the decode loop of EDF2numpy. When profile_enabled is set the reader takes its elements from
+ElementProfiler.iterElements() instead of EDFACCESSwrapper.iterElements(), and the profiler counts the elements of each EDF
+data type and splits their time into three buckets: the call to edf_get_next_data(), the call to edf_get_float_data() and
+the time the reader spends decoding and storing the element before it asks for the next one.
+Samples and events are decoded a staging block at a time. The cost of a block, and of writing its rows to the debug file, is
+moved from the element that flushed it (often a message, which flushes the staged elements when a debug file is written) to
+the elements in the block with moveTime().
+The synthetic EDF Access API of EDFACCESSsynthetic generates the elements of a trial when the first of them is read, so the
+first element of each trial, a message, also carries that cost in its edf_get_float_data bucket. The EDF Access API reads
+the file in edf_get_next_data(), where the cost is spread over the elements.
+The results are exported as a summary table and as a Chrome trace (chrome://tracing or https://ui.perfetto.dev) holding one
+span for every run of elements of the same type.
+When profile_enabled is not set the profiler is not used at all, so it costs nothing.
+'''
+import json, time
+from EDFACCESSwrapper import *
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+# names of the EDF data types
+elementNames = {STARTPARSE:'STARTPARSE', ENDPARSE:'ENDPARSE', BREAKPARSE:'BREAKPARSE', STARTBLINK:'STARTBLINK', ENDBLINK:'ENDBLINK',
+    STARTSACC:'STARTSACC', ENDSACC:'ENDSACC', STARTFIX:'STARTFIX', ENDFIX:'ENDFIX', FIXUPDATE:'FIXUPDATE', STARTSAMPLES:'STARTSAMPLES',
+    ENDSAMPLES:'ENDSAMPLES', STARTEVENTS:'STARTEVENTS', ENDEVENTS:'ENDEVENTS', MESSAGEEVENT:'MESSAGEEVENT', BUTTONEVENT:'BUTTONEVENT',
+    INPUTEVENT:'INPUTEVENT', RECORDING_INFO:'RECORDING_INFO', SAMPLE_TYPE:'SAMPLE_TYPE'}
+# time buckets of each element, in the order they are stored
+profileBuckets = ['edf_get_next_data', 'edf_get_float_data', 'decode']
+DEFAULT_TRACE_SPANS = 100000    # runs of elements kept for the trace, later runs are only counted in the summary
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Element profiler
+##--------------------------------------------------------------------------------------------------------------------------------
+class ElementProfiler:
+    """
+    Counts and times the elements of an EDF file as they are decoded.
+    .stats holds [count, next data ns, float data ns, decode ns] for each EDF data type and .spans holds
+    [data type, start ns, end ns, count, next data ns, float data ns, decode ns] for each run of elements of the same type,
+    with the start and end in nanoseconds since the profiler was created.
+    Parameters
+        maxSpans = the number of runs of elements kept for the trace
+    """
+    def __init__(self, maxSpans=DEFAULT_TRACE_SPANS):
+        self.maxSpans = maxSpans
+        self.origin = time.perf_counter_ns()
+        self.stats = {}
+        self.spans = []
+        self.truncated = False      # True if runs were left out of the trace because maxSpans was reached
+        self.moved = 0              # decode ns of the current element moved to other elements by moveTime()
+        self.clock = time.perf_counter_ns
+    def iterElements(self, wrapper, edfData, elementTypes=None):
+        """
+        Generator that steps through the data elements like EDFACCESSwrapper.iterElements() and times each of them.
+        Parameters
+            wrapper = the EDFACCESSwrapper holding the C functions
+            edfData = a valid pointer to EDFFILE structure. This handle should be created by calling edf_open_file().
+            elementTypes = optional set of element types to yield. Elements of any other type are counted and skipped
+                without reading their data.
+        Return
+            Yields (element type, address of the ALLF_DATA structure) for each element until NO_PENDING_ITEMS is reached.
+        """
+        getNextData = wrapper.EDFlib.edf_get_next_data
+        getFloatAddress = wrapper.EDFfloatAddress
+        edfData = getattr(edfData, '_as_parameter_', edfData)
+        elementTypes = frozenset(elementTypes) if elementTypes != None else None
+        clock = time.perf_counter_ns
+        stats = self.stats
+        span = None
+        self.moved = 0
+        try:
+            started = clock()
+            while True:
+                elementType = getNextData(edfData)
+                got = clock()
+                if elementType == NO_PENDING_ITEMS:
+                    return
+                entry = stats.get(elementType)
+                if entry == None:
+                    entry = stats[elementType] = [0, 0, 0, 0]
+                # start a new span when the type changes
+                if span == None or span[0] != elementType:
+                    if span != None:
+                        span[2] = started - self.origin
+                        self.addSpan(span)
+                    span = [elementType, started - self.origin, 0, 0, 0, 0, 0]
+                entry[0] += 1
+                span[3] += 1
+                entry[1] += got - started
+                span[4] += got - started
+                if elementTypes == None or elementType in elementTypes:
+                    address = getFloatAddress(edfData)
+                    read = clock()
+                    entry[2] += read - got
+                    span[5] += read - got
+                    yield elementType, address
+                    started = clock()
+                    entry[3] += started - read - self.moved
+                    span[6] += started - read - self.moved
+                    self.moved = 0
+                else:
+                    started = got
+        finally:
+            # also runs when the reader stops early
+            if span != None:
+                span[2] = clock() - self.origin
+                self.addSpan(span)
+    def moveTime(self, ns, counts):
+        """
+        Move decode time spent by the current element on other elements to the elements it was spent on, e.g. a staging
+        block decoded when a message arrives. The time is shared out by the number of elements of each type.
+        Parameters
+            ns = the nanoseconds to move
+            counts = dictionary with the number of elements of each EDF data type the time was spent on
+        """
+        total = sum(counts.values())
+        if total == 0:
+            return
+        for elementType, count in counts.items():
+            entry = self.stats.get(elementType)
+            if entry == None:
+                entry = self.stats[elementType] = [0, 0, 0, 0]
+            entry[3] += ns * count // total
+        self.moved += ns
+    def addSpan(self, span):
+        """
+        Keep a finished run of elements for the trace, unless maxSpans runs are already kept.
+        """
+        if len(self.spans) < self.maxSpans:
+            self.spans.append(span)
+        else:
+            self.truncated = True
+    def summary(self):
+        """
+        Get the counts and times of each EDF data type, the most expensive type first.
+        Return
+            Returns a list of dictionaries with the keys 'type', 'name', 'count', 'edf_get_next_data', 'edf_get_float_data',
+            'decode' and 'total' (times in seconds) and 'perElement' (microseconds)
+        """
+        rows = []
+        for elementType, (count, nextData, floatData, decode) in self.stats.items():
+            total = nextData + floatData + decode
+            rows.append({'type': elementType, 'name': elementNames.get(elementType, str(elementType)), 'count': count,
+                'edf_get_next_data': nextData / 1e9, 'edf_get_float_data': floatData / 1e9, 'decode': decode / 1e9,
+                'total': total / 1e9, 'perElement': total / 1e3 / count})
+        return sorted(rows, key=lambda i: i['total'], reverse=True)
+    def formatSummary(self):
+        """
+        Format the summary as a text table with a total row.
+        Return
+            Returns the table as a string
+        """
+        rows = self.summary()
+        lines = ['%-16s %10s %18s %18s %10s %10s %12s' % ('element', 'count', 'edf_get_next_data', 'edf_get_float_data', 'decode', 'total', 'us/element')]
+        for i in rows:
+            lines.append('%-16s %10d %18.4f %18.4f %10.4f %10.4f %12.3f' % (i['name'], i['count'], i['edf_get_next_data'], i['edf_get_float_data'], i['decode'], i['total'], i['perElement']))
+        count = sum([i['count'] for i in rows])
+        totals = [sum([i[j] for i in rows]) for j in profileBuckets + ['total']]
+        lines.append('%-16s %10d %18.4f %18.4f %10.4f %10.4f %12.3f' % tuple(['total', count] + totals + [totals[-1] * 1e6 / max(count, 1)]))
+        return '\n'.join(lines)
+    def traceEvents(self):
+        """
+        Get the runs of elements as Chrome trace events, one complete ('X') event per run with the number of elements and
+        the microseconds of each bucket of the run as arguments.
+        Return
+            Returns the list of trace events
+        """
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'EDF2numpy'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'decodeElements'}}]
+        for elementType, start, end, count, nextData, floatData, decode in self.spans:
+            events.append({'name': elementNames.get(elementType, str(elementType)), 'cat': 'element', 'ph': 'X', 'pid': 1, 'tid': 1,
+                'ts': start / 1e3, 'dur': (end - start) / 1e3, 'args': {'elements': count, 'edf_get_next_data': nextData / 1e3,
+                'edf_get_float_data': floatData / 1e3, 'decode': decode / 1e3}})
+        return events
+    def writeTrace(self, filename):
+        """
+        Write the runs of elements and the summary to a Chrome trace JSON file, which can be opened in chrome://tracing or
+        https://ui.perfetto.dev.
+        Parameters
+            filename = the name of the trace file
+        Return
+            Returns the name of the trace file
+        """
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': self.traceEvents(), 'displayTimeUnit': 'ms',
+                'otherData': {'summary': self.summary(), 'truncated': self.truncated}}, f)
+        return filename
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code reports the progress of EDF2numpy while it reads a file. The reader tells a ProgressTracker when each phase of a
+read starts and ends (open, count, decode, trim and close) and how many elements it has processed along the way, and the
+tracker hands these to a callback as ProgressEvents. The progress events sent during a phase are throttled to one per interval.
+The tracker also keeps the duration, element count and allocated bytes of every phase of the last file, so the throughput of
+a file can be read back without parsing stdout. Nothing is reported unless a callback is set.
+'''
+import time
+from collections import namedtuple
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+# phases of a read, in the order readEDF() runs them
+PHASES = ['open','count','decode','trim','close']
+DEFAULT_INTERVAL = 1.0      # seconds between the progress events of a phase
+# kind = 'start', 'progress' or 'end'; elapsed = seconds since the phase started; elements = elements processed so far in the
+# phase, or None if unknown; bytes = bytes allocated for the data arrays, or None if unknown
+ProgressEvent = namedtuple('ProgressEvent', ['kind','phase','filename','elapsed','elements','bytes'])
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Progress tracker
+##--------------------------------------------------------------------------------------------------------------------------------
+class ProgressTracker:
+    """
+    Times the phases of a read and passes ProgressEvents to a callback. Start and end events are always passed on, progress
+    events at most once per interval.
+    Parameters
+        callback = optional function called with each ProgressEvent, e.g. printProgress
+        interval = the least number of seconds between two progress events of a phase
+    """
+    def __init__(self, callback=None, interval=DEFAULT_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.active = callback      # the callback used for the current file, see begin()
+        self.filename = None
+        self.phaseTimes = {}        # seconds spent in each phase of the last file
+        self.phaseElements = {}     # elements processed in each phase of the last file
+        self.phaseBytes = {}        # bytes allocated at the end of each phase of the last file
+        self.started = {}           # start time of the phases that have not ended
+        self.phase = None           # the phase the progress events belong to
+        self.nextReport = 0.0       # earliest time of the next progress event
+    def begin(self, filename, fallback=None):
+        """
+        Clear the phase statistics before a new file is read.
+        Parameters
+            filename = the path/filename of the file
+            fallback = the callback to use if no callback is set
+        Return
+            Returns 0 if the operation is successful.
+        """
+        self.filename = filename
+        self.active = self.callback if self.callback != None else fallback
+        self.phaseTimes = {}
+        self.phaseElements = {}
+        self.phaseBytes = {}
+        self.started = {}
+        self.phase = None
+        return 0
+    def report(self, kind, phase, elements=None, bytes=None):
+        """
+        Pass a ProgressEvent for a phase to the callback, if there is one.
+        """
+        if self.active != None:
+            self.active(ProgressEvent(kind, phase, self.filename, time.perf_counter() - self.started.get(phase, time.perf_counter()), elements, bytes))
+    def start(self, phase):
+        """
+        Mark the start of a phase.
+        Parameters
+            phase = the name of the phase, one of PHASES
+        Return
+            Returns 0 if the operation is successful.
+        """
+        now = time.perf_counter()
+        self.started[phase] = now
+        self.phase = phase
+        self.nextReport = now + self.interval
+        self.report('start', phase)
+        return 0
+    def update(self, elements=None, bytes=None):
+        """
+        Report the progress of the current phase, unless the last progress event was less than an interval ago.
+        Parameters
+            elements = the number of elements processed so far in the phase
+            bytes = the number of bytes allocated so far
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if self.active != None and self.phase != None:
+            now = time.perf_counter()
+            if now >= self.nextReport:
+                self.nextReport = now + self.interval
+                self.report('progress', self.phase, elements, bytes)
+        return 0
+    def end(self, phase, elements=None, bytes=None):
+        """
+        Mark the end of a phase and record its duration. A phase that runs more than once for a file adds up.
+        Parameters
+            phase = the name of the phase, one of PHASES
+            elements = the number of elements processed in the phase
+            bytes = the number of bytes allocated at the end of the phase
+        Return
+            Returns 0 if the operation is successful.
+        """
+        if phase in self.started:
+            self.phaseTimes[phase] = self.phaseTimes.get(phase, 0.0) + time.perf_counter() - self.started[phase]
+            if elements != None:
+                self.phaseElements[phase] = self.phaseElements.get(phase, 0) + elements
+            if bytes != None:
+                self.phaseBytes[phase] = bytes
+            self.report('end', phase, elements, bytes)
+            del self.started[phase]
+            if self.phase == phase:
+                self.phase = None
+        return 0
+    def throughput(self, phase='decode'):
+        """
+        Get the elements processed per second in a phase of the last file.
+        Parameters
+            phase = the name of the phase
+        Return
+            Returns the elements per second, or None if the phase did not run or did not count its elements
+        """
+        if phase not in self.phaseElements or self.phaseTimes.get(phase, 0.0) <= 0.0:
+            return None
+        return self.phaseElements[phase] / self.phaseTimes[phase]
+
+def printProgress(event):
+    """
+    Print a ProgressEvent as one line of text, the callback used when progress_enabled is set.
+    Parameters
+        event = the ProgressEvent
+    """
+    if event.kind == 'start':
+        return
+    text = '...' + event.phase + ': ' + ('done in ' if event.kind == 'end' else '') + '%.2f s' % event.elapsed
+    if event.elements != None:
+        text += ', ' + str(event.elements) + ' elements'
+        if event.elapsed > 0:
+            text += ' (' + str(int(event.elements / event.elapsed)) + ' per s)'
+    if event.bytes != None:
+        text += ', %.1f MB allocated' % (event.bytes / 1024**2)
+    print(text)
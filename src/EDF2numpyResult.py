@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code holds the conversion of an EyeLink Data File (EDF) as an object with a named attribute for each data array
+(header, recordings, messages, samples, events and ioevents) in place of the array of readEDF(). Each data array is read
+the first time it is used: one pass over the elements of the EDF decodes only the arrays asked for, so arrays that are
+never used are never allocated or decoded, and arrays disabled in the options are never read at all. The header is read
+on its own with the EDF opened without events and samples. load() reads several arrays with one shared pass,
+memoryUsage() reports the memory held by each array and release() drops an array before the result goes out of scope.
+The result can still be indexed by position like the array returned by readEDF().
+With capture_enabled set the arrays are read from the capture of the EDF (see EDF2numpyCapture), so a pass is cheap.
+'''
+import numpy as np
+from EDF2numpyMessages import MessageArray
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+# attribute, table name, EDF2numpy attribute and enabling option of each data array, in the order readEDF() returns them
+resultTables = [('header','HEADER','HEADERdata',None), ('recordings','RECORDINGS','RECORDINGdata','recinfo_enabled'),
+    ('messages','MESSAGES','MESSAGEdata','messages_enabled'), ('samples','SAMPLES','SAMPLEdata','samples_enabled'),
+    ('events','EVENTS','EVENTdata','events_enabled'), ('ioevents','IOEVENTS','IOEVENTdata','ioevents_enabled')]
+# options changed for the reads of a result, each pass would otherwise write a debug file of only the arrays it reads
+resultOptions = {'output_data_debugflags': 0}
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## EDF2numpyResult functions
+##--------------------------------------------------------------------------------------------------------------------------------
+class EDF2numpyResult:
+    """
+    The data arrays of an EDF file, read when they are first used. Create with EDF2numpy.readResult(edfFilename).
+    An array disabled in the options is None, like in the array returned by readEDF().
+    Parameters
+        converter = the EDF2numpy instance whose EDFACCESSwrapper and options are used to read the EDF
+        edfFilename = the path/filename of the EDF
+    """
+    def __init__(self, converter, edfFilename):
+        self.edfFilename = edfFilename                                      # the EDF the arrays are read from
+        # a converter of its own with a copy of the options, so the result does not change when converter reads another file
+        self.reader = type(converter)(converter.Edfwrapper)
+        self.reader.options = dict(converter.options, **resultOptions)
+        self.reader.consistencyArgs = converter.consistencyArgs
+        self.reader.sampleBlockSize = converter.sampleBlockSize
+        self.reader.eventBlockSize = converter.eventBlockSize
+        self.reader.progress.callback = converter.progress.callback
+        self.tables = {}                                                    # data arrays read so far, by attribute name
+        self.trialCount = None                                              # number of trials, known after the first pass
+        self.passes = 0                                                     # number of passes over the elements of the EDF
+    def __len__(self):
+        return len(resultTables)
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table(i[0]) for i in resultTables[index]]
+        return self.table(resultTables[index][0])
+    def __iter__(self):
+        for i in resultTables:
+            yield self.table(i[0])
+    def __repr__(self):
+        state = ', '.join([name + ('' if name in self.tables else '*') for name in self.enabledTables()])
+        return 'EDF2numpyResult(' + repr(self.edfFilename) + ', ' + state + ') (* not read yet)'
+    @property
+    def header(self):
+        return self.table('header')
+    @property
+    def recordings(self):
+        return self.table('recordings')
+    @property
+    def messages(self):
+        return self.table('messages')
+    @property
+    def samples(self):
+        return self.table('samples')
+    @property
+    def events(self):
+        return self.table('events')
+    @property
+    def ioevents(self):
+        return self.table('ioevents')
+    def enabledTables(self):
+        """
+        Get the data arrays that are enabled in the options of the result, the header is always enabled.
+        Return
+            Returns the list of attribute names
+        """
+        return [name for name, table, attribute, option in resultTables if option == None or self.reader.options[option] == 1]
+    def isLoaded(self, name):
+        """
+        Check if a data array has been read.
+        Parameters
+            name = the attribute name of the data array, e.g. 'samples'
+        Return
+            Returns True if the array is held by the result
+        """
+        return name in self.tables
+    def table(self, name):
+        """
+        Get a data array, reading it first if it has not been read yet.
+        Parameters
+            name = the attribute name of the data array, e.g. 'samples'
+        Return
+            Returns the structured numpy array, or None if the array is disabled in the options
+        """
+        if name not in [i[0] for i in resultTables]:
+            raise Exception('An error has occurred with EDF2numpyResult.table: unknown data array ' + str(name))
+        if name not in self.enabledTables():
+            return None
+        if name not in self.tables:
+            self.load(name)
+        return self.tables[name]
+##--------------------------------------------------------------------------------------------------------------------------------
+## Reading and releasing
+##--------------------------------------------------------------------------------------------------------------------------------
+    def load(self, *names):
+        """
+        Read data arrays with one shared pass over the elements of the EDF, which only decodes these arrays. Arrays that
+        have been read already or are disabled in the options are skipped, and the header alone is read without a pass.
+        Parameters
+            names = the attribute names of the data arrays, e.g. load('samples', 'events'). Every enabled array if none are given.
+        Return
+            Returns the result itself
+        """
+        try:
+            enabled = self.enabledTables()
+            names = [i for i in (names or enabled) if i in enabled and i not in self.tables]
+            if names == ['header']:
+                self.tables['header'] = self.reader.readHeader(self.edfFilename).copy()
+            elif len(names) > 0:
+                self.reader.decodeTables = frozenset([table for name, table, attribute, option in resultTables if name in names and option != None])
+                try:
+                    self.reader.readEDF(self.edfFilename)
+                finally:
+                    self.reader.decodeTables = None
+                self.passes += 1
+                self.trialCount = self.reader.trialCount
+                for name, table, attribute, option in resultTables:
+                    if name in names:
+                        self.tables[name] = getattr(self.reader, attribute)
+                # the header is read by every pass
+                self.tables.setdefault('header', self.reader.HEADERdata.copy())
+                # drop the references of the reader so release() frees the arrays
+                for name, table, attribute, option in resultTables[1:]:
+                    setattr(self.reader, attribute, None)
+                self.reader.MASTERdata = None
+            return self
+        except Exception as e:
+            raise Exception('An error has occurred with EDF2numpyResult.load: ' + str(e))
+        except:
+            raise Exception('An unhandled exception has occurred with EDF2numpyResult.load')
+    def release(self, *names):
+        """
+        Drop data arrays from the result so their memory can be freed. A released array is read again if it is used.
+        Parameters
+            names = the attribute names of the data arrays, every array if none are given
+        Return
+            Returns the result itself
+        """
+        for name in (names or list(self.tables)):
+            self.tables.pop(name, None)
+        return self
+    def memoryUsage(self):
+        """
+        Get the memory held by each data array that has been read, including the text heap of compact messages.
+        Arrays written to options['memmap_output_dir'] are counted at their full size although they live in the page cache.
+        Return
+            Returns a dictionary of the number of bytes by attribute name, 0 for arrays that are not held
+        """
+        usage = {}
+        for name, table, attribute, option in resultTables:
+            data = self.tables.get(name)
+            usage[name] = 0 if data is None else data.nbytes + (len(data.heap) if isinstance(data, MessageArray) else 0)
+        return usage
+    def toArray(self):
+        """
+        Read every enabled data array and return them like readEDF() does.
+        Return
+            Returns a Numpy array of structured numpy arrays: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]
+        """
+        self.load()
+        return np.array(list(self), dtype=object)
@@ -0,0 +1,617 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024, SR Research Ltd., All Rights Reserved
+# Contact: support@sr-research.com
+#
+# Neither name of SR Research Ltd nor the name of contributors may be used
+# to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS ``AS
+# IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE REGENTS OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Edits:
+# WDM - 2024/02/12      Alpha version
+#
+#
+'''
+This code simulates the EDF Access API in Python, so that EDF2numpy can be run, tested and benchmarked on machines without the
+EyeLink Developers Kit. SyntheticEDFAPI implements the functions of the EDF Access C library that EDFACCESSwrapper binds (see
+EDFAPIBackend) and hands out the same ctypes structures, generated from a deterministic model of a recording: trials of
+fixations, saccades and blinks sampled at a chosen rate from the left, right or both eyes, with the parser events, messages,
+button presses, input events and recording blocks of an EyeLink Data File.
+Use it with EDFACCESSwrapper(backend=SyntheticEDFAPI()), or set the environment variable EDFAPI_BACKEND=synthetic.
+Every file is simulated from a spec. writeSyntheticEDF() writes a small file holding a spec, any other file is simulated with the
+spec the backend was created with. The same spec always produces the same data. The elements of a trial are only generated when
+the trial is read, so the memory used does not grow with the length of the recording.
+'''
+import os, json, struct
+from bisect import bisect_right
+from EDFACCESSwrapper import *
+
+##--------------------------------------------------------------------------------------------------------------------------------
+##Constants
+##--------------------------------------------------------------------------------------------------------------------------------
+SPEC_KEY = 'edf2numpy_synthetic'    # key of the spec in a file written by writeSyntheticEDF()
+SPEC_MAX_SIZE = 1 << 16             # larger files are never read as a spec
+# spec of a simulated recording
+syntheticDefaults = {
+    'trials': 10,                   # number of trials
+    'trialDuration': 5000,          # milliseconds recorded in each trial
+    'sampleRate': 1000,             # samples per second: 250, 500, 1000 or 2000
+    'eye': 'BINOCULAR',             # 'LEFT', 'RIGHT' or 'BINOCULAR'
+    'seed': 0,                      # seed of the random number generator
+    'screen': [1920, 1080],         # display size in pixels
+    'ppd': 38.0,                    # pixels per degree of visual angle
+    'blinkRate': 0.25,              # blinks per second
+    'buttonRate': 0.5,              # button presses per second
+    'messages': 4,                  # messages sent during each trial besides the trial markers
+    }
+eyeModes = {'LEFT': [LEFT_EYE], 'RIGHT': [RIGHT_EYE], 'BINOCULAR': [LEFT_EYE, RIGHT_EYE]}
+# FSAMPLE flags
+SAMPLE_LEFT = 0x8000
+SAMPLE_RIGHT = 0x4000
+SAMPLE_PUPILXY = 0x1000
+SAMPLE_HREFXY = 0x0800
+SAMPLE_GAZEXY = 0x0400
+SAMPLE_GAZERES = 0x0200
+SAMPLE_PUPILSIZE = 0x0100
+SAMPLE_STATUS = 0x0080
+SAMPLE_INPUTS = 0x0040
+SAMPLE_BUTTONS = 0x0020
+# kinds of the periods of the gaze model and the parser events that start and end them
+FIXATION, SACCADE, BLINK = 0, 1, 2
+periodEvents = {FIXATION: (STARTFIX, ENDFIX), SACCADE: (STARTSACC, ENDSACC), BLINK: (STARTBLINK, ENDBLINK)}
+# the union of the structures returned by edf_get_float_data(), laid out as ALLF_DATA
+ALLF_DATAtype = np.dtype({'names': ['FSAMPLE', 'FEVENT', 'RECORDINGS', 'IOEVENT'],
+    'formats': [FSAMPLEtype, FEVENTtype, np.dtype(RECORDINGS), np.dtype(IOEVENT)], 'offsets': [0, 0, 0, 0], 'itemsize': sizeof(ALLF_DATA)})
+# sources of the elements of a trial, see trialLayout()
+SOURCE_MARKER, SOURCE_RECORDING, SOURCE_MESSAGE, SOURCE_IO, SOURCE_SAMPLE, SOURCE_EVENT = range(6)
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Spec files
+##--------------------------------------------------------------------------------------------------------------------------------
+def writeSyntheticEDF(filename, **spec):
+    """
+    Write a file that SyntheticEDFAPI simulates as a recording with the given spec. The file can be read by EDF2numpy like
+    any EDF when the synthetic backend is used.
+    Parameters
+        filename = the path/filename of the file, e.g. 'test.edf'
+        spec = the keys of syntheticDefaults to change, e.g. trials=20, sampleRate=500, eye='LEFT'
+    Return
+        Returns the filename
+    """
+    unknown = [i for i in spec if i not in syntheticDefaults]
+    if len(unknown) > 0:
+        raise ValueError('Unknown synthetic spec keys: ' + ', '.join(unknown))
+    with open(filename, 'w') as f:
+        json.dump({SPEC_KEY: spec}, f)
+    return filename
+
+def readSyntheticSpec(filename, defaults=syntheticDefaults):
+    """
+    Get the spec of the recording simulated for a file.
+    Parameters
+        filename = the path/filename of the file
+        defaults = the spec used for the keys the file does not set, and for files that do not hold a spec
+    Return
+        Returns the spec as a dictionary
+    """
+    spec = dict(defaults)
+    if os.path.getsize(filename) <= SPEC_MAX_SIZE:
+        try:
+            with open(filename, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+            if isinstance(data, dict) and isinstance(data.get(SPEC_KEY), dict):
+                spec.update(data[SPEC_KEY])
+        except ValueError:
+            pass
+    if spec['eye'] not in eyeModes:
+        raise ValueError('Unknown eye mode ' + str(spec['eye']) + ', use LEFT, RIGHT or BINOCULAR')
+    return spec
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Recording model
+##--------------------------------------------------------------------------------------------------------------------------------
+def trialModel(spec, trial):
+    """
+    Draw the timeline of a trial: its recording block, the sample times, the fixations, saccades and blinks of the gaze,
+    the messages and the button and input events. The samples themselves are computed by sampleValues().
+    Parameters
+        spec = the spec of the recording
+        trial = the trial number, counting from 0
+    Return
+        Returns a dictionary of the timeline
+    """
+    rng = np.random.default_rng([int(spec['seed']), trial])
+    width, height = spec['screen']
+    duration = int(spec['trialDuration'])
+    trialStart = 1000 + trial * (duration + 1000)
+    start = trialStart + 100                    # start of the recording block
+    end = start + duration                      # end of the recording block
+    times = (start + np.arange(duration * int(spec['sampleRate']) // 1000) * 1000 // int(spec['sampleRate'])).astype(np.uint32)
+    # alternate fixations with saccades or blinks until the end of the recording
+    periods = []
+    t = start
+    position = (rng.uniform(0.1, 0.9) * width, rng.uniform(0.1, 0.9) * height)
+    while t < end:
+        fixation = float(np.clip(rng.gamma(4.0, 60.0), 80.0, 1000.0))
+        periods.append((FIXATION, t, min(end, t + fixation), position, position))
+        t += fixation
+        if t >= end:
+            break
+        target = (rng.uniform(0.05, 0.95) * width, rng.uniform(0.05, 0.95) * height)
+        if rng.random() < spec['blinkRate'] * (fixation + 50.0) / 1000.0:
+            length = rng.uniform(80.0, 200.0)
+            periods.append((BLINK, t, min(end, t + length), position, target))
+        else:
+            amplitude = np.hypot(target[0] - position[0], target[1] - position[1]) / spec['ppd']
+            length = 21.0 + 2.2 * amplitude
+            periods.append((SACCADE, t, min(end, t + length), position, target))
+        t += length
+        position = target
+    # the samples of each period, periods without samples are dropped
+    bounds = np.searchsorted(times, [[p[1], p[2]] for p in periods], side='left')
+    periods = [p + (int(b[0]), int(b[1])) for p, b in zip(periods, bounds) if b[1] > b[0]]
+    messages = []
+    if trial == 0:
+        messages.append((trialStart - 10, 'DISPLAY_COORDS 0 0 ' + str(width - 1) + ' ' + str(height - 1)))
+    messages.append((trialStart, 'TRIALID ' + str(trial)))
+    messages.append((trialStart + 1, '!V TRIAL_VAR condition ' + ('A' if trial % 2 == 0 else 'B')))
+    messages.append((start + 20, 'SYNCTIME'))
+    for i in np.sort(rng.integers(start + 21, end, size=int(spec['messages']))):
+        # messages with an integer offset, as sent ahead of a display change
+        offset = int(rng.integers(0, 20))
+        messages.append((int(i), str(offset) + ' TARGET_ON ' + str(int(rng.integers(0, width))) + ' ' + str(int(rng.integers(0, height)))))
+    messages.append((end + 10, 'TRIAL_RESULT ' + str(int(rng.integers(0, 2)))))
+    io = [(start, INPUTEVENT, trial % 256)]
+    for i in np.sort(rng.integers(start + 1, end - 200, size=rng.poisson(spec['buttonRate'] * duration / 1000.0))):
+        button = int(rng.integers(1, 5))
+        # the low byte is the state of the buttons and the high byte the button that changed
+        io.append((int(i), BUTTONEVENT, (1 << (button + 7)) | (1 << (button - 1))))
+        io.append((int(i) + int(rng.integers(50, 200)), BUTTONEVENT, 1 << (button + 7)))
+    io.sort()
+    return {'trial': trial, 'start': start, 'end': end, 'times': times, 'periods': periods, 'messages': messages, 'io': io,
+        'eyes': eyeModes[spec['eye']]}
+
+def sampleValues(spec, model):
+    """
+    Compute the gaze, head referenced, raw pupil, pupil size and velocity data of each eye at the sample times of a trial.
+    Parameters
+        spec = the spec of the recording
+        model = the timeline of the trial from trialModel()
+    Return
+        Returns a dictionary of float arrays for each eye, with NaN during blinks
+    """
+    rng = np.random.default_rng([int(spec['seed']), model['trial'], 1])
+    times = model['times'].astype(np.float64)
+    width, height = spec['screen']
+    gx = np.full(times.size, np.nan)
+    gy = np.full(times.size, np.nan)
+    for kind, start, end, origin, target, first, last in model['periods']:
+        if kind == FIXATION:
+            gx[first:last] = origin[0]
+            gy[first:last] = origin[1]
+        elif kind == SACCADE:
+            # smooth movement from the origin to the target
+            progress = (1.0 - np.cos(np.pi * np.clip((times[first:last] - start) / max(end - start, 1.0), 0.0, 1.0))) / 2.0
+            gx[first:last] = origin[0] + (target[0] - origin[0]) * progress
+            gy[first:last] = origin[1] + (target[1] - origin[1]) * progress
+    pupil = 1100.0 + 150.0 * np.sin(times / 4000.0 + model['trial'])
+    values = {}
+    for eye in model['eyes']:
+        shift = -1.5 if eye == LEFT_EYE else 1.5
+        x = gx + shift + rng.normal(0.0, 0.4, times.size)
+        y = gy + rng.normal(0.0, 0.4, times.size)
+        velocityX = np.gradient(x) * spec['sampleRate'] / spec['ppd'] if times.size > 1 else np.zeros(times.size)
+        velocityY = np.gradient(y) * spec['sampleRate'] / spec['ppd'] if times.size > 1 else np.zeros(times.size)
+        values[eye] = {'gx': x, 'gy': y, 'hx': (x - width / 2.0) * 8.0, 'hy': (y - height / 2.0) * 8.0,
+            'px': (x - width / 2.0) * 0.6 + 1200.0, 'py': (y - height / 2.0) * 0.6 + 900.0,
+            'pa': np.where(np.isnan(x), 0.0, pupil + rng.normal(0.0, 5.0, times.size)), 'gxvel': velocityX, 'gyvel': velocityY}
+    return values
+
+def trialLayout(model, loadEvents=1, loadSamples=1):
+    """
+    Put the elements of a trial in the order the EDF Access API returns them. Elements at the same time are ordered: recording
+    start, messages and IO events, samples, parser events, recording end.
+    Parameters
+        model = the timeline of the trial from trialModel()
+        loadEvents = 0 to leave out the parser events
+        loadSamples = 0 to leave out the samples
+    Return
+        Returns the numpy arrays (types, times, sources, indices), where sources and indices give the list an element comes from
+        and its position in that list
+    """
+    start, end = model['start'], model['end']
+    rows = []       # (time, rank, type, source, index)
+    rows += [(start, 0, RECORDING_INFO, SOURCE_RECORDING, 0), (start, 1, STARTSAMPLES, SOURCE_MARKER, 0), (start, 2, STARTEVENTS, SOURCE_MARKER, 0)]
+    rows += [(t, 3, MESSAGEEVENT, SOURCE_MESSAGE, i) for i, (t, text) in enumerate(model['messages'])]
+    rows += [(t, 3, kind, SOURCE_IO, i) for i, (t, kind, data) in enumerate(model['io'])]
+    rows += [(end, 7, ENDSAMPLES, SOURCE_MARKER, 0), (end, 8, ENDEVENTS, SOURCE_MARKER, 0), (end, 9, RECORDING_INFO, SOURCE_RECORDING, 1)]
+    columns = [np.array(i, dtype=np.int64).reshape(-1) for i in zip(*rows)]
+    times, ranks, types, sources, indices = columns
+    if loadSamples == 1:
+        count = model['times'].size
+        times = np.concatenate([times, model['times']])
+        ranks = np.concatenate([ranks, np.full(count, 4)])
+        types = np.concatenate([types, np.full(count, SAMPLE_TYPE)])
+        sources = np.concatenate([sources, np.full(count, SOURCE_SAMPLE)])
+        indices = np.concatenate([indices, np.arange(count)])
+    if loadEvents == 1:
+        events = eventTable(model)
+        times = np.concatenate([times, events['time']])
+        ranks = np.concatenate([ranks, np.full(events.size, 5)])
+        types = np.concatenate([types, events['etype']])
+        sources = np.concatenate([sources, np.full(events.size, SOURCE_EVENT)])
+        indices = np.concatenate([indices, np.arange(events.size)])
+    order = np.lexsort((np.arange(times.size), ranks, times))
+    return types[order].astype(np.int16), times[order].astype(np.uint32), sources[order].astype(np.int8), indices[order]
+
+def eventTable(model, values=None, spec=None):
+    """
+    Build the start and end parser events of every period of a trial for each eye. Start events are reported at the first
+    sample of their period and end events at the last.
+    Parameters
+        model = the timeline of the trial from trialModel()
+        values = optional samples from sampleValues(), used to fill in the positions, pupil sizes and velocities of the events
+        spec = the spec of the recording, needed with values
+    Return
+        Returns a numpy array with the FEVENTtype dtype
+    """
+    periods = model['periods']
+    eyes = model['eyes']
+    events = np.zeros(2 * len(periods) * len(eyes), dtype=FEVENTtype)
+    if events.size == 0:
+        return events
+    times = model['times']
+    kinds = np.array([p[0] for p in periods])
+    first = np.array([p[5] for p in periods])
+    last = np.array([p[6] for p in periods]) - 1
+    # events of the same period and eye follow each other: start then end, left eye then right eye
+    for position, eye in enumerate(eyes):
+        for phase in [0, 1]:
+            rows = events[(2 * np.arange(len(periods)) * len(eyes)) + 2 * position + phase]
+            rows['etype'] = [periodEvents[k][phase] for k in kinds]
+            rows['time'] = times[last] if phase == 1 else times[first]
+            rows['sttime'] = times[first]
+            rows['entime'] = times[last] if phase == 1 else 0
+            rows['eye'] = eye
+            rows['parsedby'] = PARSEDBY_GAZE
+            rows['read'] = 0x3FF if phase == 1 else 0x3F
+            if values != None and eye in values:
+                fill = eventValues(values[eye], kinds, first, last + 1, spec, phase)
+                for i in fill:
+                    rows[i] = fill[i]
+            events[(2 * np.arange(len(periods)) * len(eyes)) + 2 * position + phase] = rows
+    return events
+
+def eventValues(values, kinds, first, stop, spec, phase):
+    """
+    Compute the positions, pupil sizes and velocities of the events of one eye from its samples.
+    Return
+        Returns a dictionary of FEVENT field values, one per period
+    """
+    def average(data):
+        valid = ~np.isnan(data)
+        total = np.add.reduceat(np.where(valid, data, 0.0), first)
+        count = np.add.reduceat(valid.astype(np.int64), first)
+        return np.where(count > 0, total / np.maximum(count, 1), MISSING_VALUE)
+    def at(data, index):
+        return np.where(np.isnan(data[index]), MISSING_VALUE, data[index])
+    speed = np.hypot(values['gxvel'], values['gyvel'])
+    fill = {'gstx': at(values['gx'], first), 'gsty': at(values['gy'], first), 'hstx': at(values['hx'], first), 'hsty': at(values['hy'], first),
+        'sta': values['pa'][first], 'svel': at(speed, first), 'supd_x': spec['ppd'], 'supd_y': spec['ppd']}
+    if phase == 1:
+        last = stop - 1
+        fill.update({'genx': at(values['gx'], last), 'geny': at(values['gy'], last), 'henx': at(values['hx'], last), 'heny': at(values['hy'], last),
+            'ena': values['pa'][last], 'evel': at(speed, last), 'eupd_x': spec['ppd'], 'eupd_y': spec['ppd'],
+            'gavx': average(values['gx']), 'gavy': average(values['gy']), 'havx': average(values['hx']), 'havy': average(values['hy']),
+            'ava': average(values['pa']), 'avel': average(speed), 'pvel': np.nan_to_num(np.fmax.reduceat(speed, first), nan=MISSING_VALUE)})
+        # blinks have no positions
+        for i in fill:
+            if np.ndim(fill[i]) > 0:
+                fill[i] = np.where(kinds == BLINK, MISSING_VALUE, fill[i])
+    return fill
+
+def trialRecords(spec, model, types, sources, indices):
+    """
+    Generate the ALLF_DATA structures of the elements of a trial.
+    Parameters
+        spec = the spec of the recording
+        model = the timeline of the trial from trialModel()
+        types, sources, indices = the layout of the trial from trialLayout()
+    Return
+        Returns (records, heap): a numpy array with the ALLF_DATAtype dtype and a numpy uint8 array holding the LSTRING text of
+        the messages, which the message pointers of the records point into
+    """
+    records = np.zeros(types.size, dtype=ALLF_DATAtype)
+    tracked = model['eyes']
+    values = sampleValues(spec, model)
+    # samples
+    rows = np.flatnonzero(sources == SOURCE_SAMPLE)
+    if rows.size > 0:
+        samples = np.zeros(rows.size, dtype=FSAMPLEtype)
+        samples['time'] = model['times'][indices[rows]]
+        for field, name in [('gx','gx'),('gy','gy'),('hx','hx'),('hY','hy'),('px','px'),('py','py'),('pa','pa'),('gxvel','gxvel'),('gyvel','gyvel'),('fgxvel','gxvel'),('fgyvel','gyvel')]:
+            for eye, side in [(LEFT_EYE, 'left'), (RIGHT_EYE, 'right')]:
+                data = values[eye][name][indices[rows]] if eye in tracked else np.full(rows.size, np.nan)
+                samples[field][side] = np.where(np.isnan(data), MISSING_VALUE, data)
+        for field in ['hxvel','hyvel','rxvel','ryvel','fhxvel','fhyvel','frxvel','fryvel']:
+            # head referenced and raw velocities scale with the gaze velocities
+            source = 'gxvel' if 'x' in field else 'gyvel'
+            for eye, side in [(LEFT_EYE, 'left'), (RIGHT_EYE, 'right')]:
+                data = values[eye][source][indices[rows]] * (8.0 if 'h' in field else 0.6) * spec['ppd'] if eye in tracked else np.full(rows.size, np.nan)
+                samples[field][side] = np.where(np.isnan(data), MISSING_VALUE, data)
+        samples['rx'] = spec['ppd']
+        samples['ry'] = spec['ppd']
+        samples['htype'] = MISSING_VALUE
+        samples['flags'] = (SAMPLE_LEFT if LEFT_EYE in tracked else 0) | (SAMPLE_RIGHT if RIGHT_EYE in tracked else 0) | SAMPLE_PUPILXY \
+            | SAMPLE_HREFXY | SAMPLE_GAZEXY | SAMPLE_GAZERES | SAMPLE_PUPILSIZE | SAMPLE_STATUS | SAMPLE_INPUTS | SAMPLE_BUTTONS
+        # the state of the buttons and the input port at each sample
+        buttons = [(t, data & 0xFF) for t, kind, data in model['io'] if kind == BUTTONEVENT]
+        if len(buttons) > 0:
+            change = np.searchsorted([i[0] for i in buttons], samples['time'], side='right') - 1
+            samples['buttons'] = np.where(change >= 0, np.array([i[1] for i in buttons])[np.maximum(change, 0)], 0)
+        samples['inputs'] = model['trial'] % 256
+        records['FSAMPLE'][rows] = samples
+    # parser events
+    rows = np.flatnonzero(sources == SOURCE_EVENT)
+    if rows.size > 0:
+        records['FEVENT'][rows] = eventTable(model, values, spec)[indices[rows]]
+    # recording blocks
+    for row in np.flatnonzero(sources == SOURCE_RECORDING):
+        recording = records['RECORDINGS'][row:row + 1]
+        recording['time'] = model['start'] if indices[row] == 0 else model['end']
+        recording['sample_rate'] = spec['sampleRate']
+        recording['state'] = 1 if indices[row] == 0 else 0
+        recording['record_type'] = 3
+        recording['pupil_type'] = 0
+        recording['recording_mode'] = 1
+        recording['filter_type'] = 1
+        recording['posType'] = np.array(PARSEDBY_GAZE, dtype=np.uint8).view(np.int8)
+        recording['eye'] = {'LEFT': 1, 'RIGHT': 2, 'BINOCULAR': 3}[spec['eye']]
+    # button and input events
+    for row in np.flatnonzero(sources == SOURCE_IO):
+        t, kind, data = model['io'][indices[row]]
+        records['IOEVENT'][row] = (t, kind, data)
+        # EDF2numpy reads the time of IO events from FEVENT.sttime, past the end of the IOEVENT structure
+        records['FEVENT']['sttime'][row] = t
+    # messages, each an LSTRING of its length and its null terminated text in the heap
+    rows = np.flatnonzero(sources == SOURCE_MESSAGE)
+    heap = bytearray()
+    offsets = []
+    for row in rows:
+        text = model['messages'][indices[row]][1].encode('utf-8') + b'\0'
+        if len(heap) % 2:
+            heap += b'\0'
+        offsets.append(len(heap))
+        heap += struct.pack('<H', len(text)) + text
+    heap = np.frombuffer(bytes(heap) + b'\0\0', dtype=np.uint8)
+    if rows.size > 0:
+        messages = records['FEVENT'][rows]
+        messages['time'] = [model['messages'][i][0] for i in indices[rows]]
+        messages['sttime'] = messages['time']
+        messages['entime'] = messages['time']
+        messages['etype'] = MESSAGEEVENT
+        messages['message'] = heap.ctypes.data + np.array(offsets, dtype=np.uintp)
+        records['FEVENT'][rows] = messages
+    return records, heap
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## Simulated files
+##--------------------------------------------------------------------------------------------------------------------------------
+class SyntheticFile:
+    """
+    The state of one simulated EDF file opened with SyntheticEDFAPI.edf_open_file(): the layout of every trial, the current
+    element and trial, the bookmarks and the structures of the trial being read.
+    Parameters
+        filename = the path/filename of the file
+        spec = the spec of the recording
+        loadEvents = 0 to leave out the parser events
+        loadSamples = 0 to leave out the samples
+    """
+    def __init__(self, filename, spec, loadEvents=1, loadSamples=1):
+        self.filename = filename
+        self.spec = spec
+        self.loadEvents = loadEvents
+        self.loadSamples = loadSamples
+        self.segmentStarts = []     # position of the first element of each trial of the model
+        self.segmentTypes = []      # data type of each element of each trial of the model
+        self.segmentTimes = []      # time of each element of each trial of the model
+        self.messages = []          # (position, time, text) of every message
+        count = 0
+        for trial in range(int(spec['trials'])):
+            model = trialModel(spec, trial)
+            types, times, sources, indices = trialLayout(model, loadEvents, loadSamples)
+            self.segmentStarts.append(count)
+            self.segmentTypes.append(types)
+            self.segmentTimes.append(times)
+            for row in np.flatnonzero(sources == SOURCE_MESSAGE):
+                self.messages.append((count + int(row), int(times[row]), model['messages'][indices[row]][1].encode('utf-8')))
+            count += types.size
+        self.count = count
+        self.position = -1          # position of the current element
+        self.segment = None         # the trial of the model being read
+        self.segmentStart = 0
+        self.segmentEnd = 0
+        self.types = []             # data types of the trial being read, as a list for fast access
+        self.records = None         # ALLF_DATA structures of the trial being read, generated on first access
+        self.recordsAddress = 0     # address of the first of the records
+        self.heap = None            # message text of the trial being read
+        self.empty = ALLF_DATA()    # returned before the first and after the last element
+        self.bookmarks = {}
+        self.trial = None           # the current trial, see edf_jump_to_trial()
+        self.setTrialIdentifier(b'', b'')
+    def enter(self, position):
+        """
+        Make the trial of the model holding an element the one being read.
+        """
+        segment = bisect_right(self.segmentStarts, position) - 1
+        if segment != self.segment:
+            self.segment = segment
+            self.segmentStart = self.segmentStarts[segment]
+            self.segmentEnd = self.segmentStart + self.segmentTypes[segment].size
+            self.types = self.segmentTypes[segment].tolist()
+            self.records = None
+            self.heap = None
+    def address(self):
+        """
+        Get the address of the ALLF_DATA structure of the current element, generating the structures of its trial if needed.
+        """
+        if self.position < 0 or self.position >= self.count:
+            return addressof(self.empty)
+        if self.position < self.segmentStart or self.position >= self.segmentEnd:
+            self.enter(self.position)
+        if self.records is None:
+            model = trialModel(self.spec, self.segment)
+            types, times, sources, indices = trialLayout(model, self.loadEvents, self.loadSamples)
+            self.records, self.heap = trialRecords(self.spec, model, types, sources, indices)
+            self.recordsAddress = self.records.ctypes.data
+        return self.recordsAddress + (self.position - self.segmentStart) * ALLF_DATAtype.itemsize
+    def timeAt(self, position):
+        segment = bisect_right(self.segmentStarts, position) - 1
+        return int(self.segmentTimes[segment][position - self.segmentStarts[segment]])
+    def setTrialIdentifier(self, startMarker, endMarker):
+        """
+        Find the trials of the file. A trial starts at the message holding the start marker ('TRIALID' if empty) and ends at
+        the next message holding the end marker, or before the next trial if there is no end marker.
+        """
+        startMarker = startMarker if startMarker else b'TRIALID'
+        starts = [i for i in self.messages if startMarker in i[2]]
+        self.trials = []
+        for number, (position, time, text) in enumerate(starts):
+            stop = starts[number + 1][0] if number + 1 < len(starts) else self.count
+            ends = [i for i in self.messages if endMarker and position < i[0] < stop and endMarker in i[2]]
+            endPosition = ends[0][0] if len(ends) > 0 else stop - 1
+            self.trials.append((position, endPosition, time, self.timeAt(endPosition)))
+        return 0
+
+class SyntheticEDFAPI(EDFAPIBackend):
+    """
+    A simulated EDF Access API. Each file is simulated from the spec it holds (see writeSyntheticEDF()), or from the spec
+    given here.
+    Note: the trial count is reported as two per trial, which EDF2numpy halves like the count of the EDF Access API.
+    Parameters
+        spec = the keys of syntheticDefaults to change for files that do not hold a spec, e.g. trials=20, sampleRate=500
+    """
+    def __init__(self, **spec):
+        unknown = [i for i in spec if i not in syntheticDefaults]
+        if len(unknown) > 0:
+            raise ValueError('Unknown synthetic spec keys: ' + ', '.join(unknown))
+        self.spec = dict(syntheticDefaults)
+        self.spec.update(spec)
+        self.files = {}             # SyntheticFile of each open handle
+        self.nextHandle = 1
+    def file(self, edfData):
+        return self.files[getattr(edfData, '_as_parameter_', edfData)]
+    def edf_open_file(self, fname, consistency, loadevents, loadsamples, errval):
+        filename = fname.decode('utf-8') if isinstance(fname, bytes) else str(fname)
+        if not os.path.isfile(filename):
+            error = getattr(errval, '_obj', None)
+            if error != None:
+                error.value = -1
+            return None
+        handle = self.nextHandle
+        self.nextHandle += 1
+        self.files[handle] = SyntheticFile(filename, readSyntheticSpec(filename, self.spec), argValue(loadevents), argValue(loadsamples))
+        return handle
+    def edf_close_file(self, edfData):
+        self.files.pop(getattr(edfData, '_as_parameter_', edfData), None)
+        return 0
+    def preamble(self, edfData):
+        spec = self.file(edfData).spec
+        return ('** SYNTHETIC EDF FILE GENERATED BY EDFACCESSsynthetic\n** TYPE: EDF_FILE BINARY EVENT SAMPLE TAGGED\n'
+            + '** RECORDED BY SyntheticEDFAPI\n** SPEC: ' + json.dumps(spec, sort_keys=True) + '\n**\n').encode('utf-8')
+    def edf_get_preamble_text_length(self, edfData):
+        return len(self.preamble(edfData))
+    def edf_get_preamble_text(self, edfData, buffer, length):
+        text = self.preamble(edfData)[:max(0, argValue(length) - 1)] + b'\0'
+        memmove(buffer, text, len(text))
+        return 0
+    def edf_get_element_count(self, edfData):
+        return self.file(edfData).count
+    def edf_get_trial_count(self, edfData):
+        return 2 * len(self.file(edfData).trials)
+    def edf_get_next_data(self, edfData):
+        f = self.files[getattr(edfData, '_as_parameter_', edfData)]
+        position = f.position + 1
+        if position < f.segmentStart or position >= f.segmentEnd:
+            if position >= f.count:
+                f.position = f.count
+                return NO_PENDING_ITEMS
+            f.enter(position)
+        f.position = position
+        return f.types[position - f.segmentStart]
+    def edf_get_float_data(self, edfData):
+        return pointer(ALLF_DATA.from_address(self.edf_get_float_data_address(edfData)))
+    def edf_get_float_data_address(self, edfData):
+        return self.files[getattr(edfData, '_as_parameter_', edfData)].address()
+    def edf_set_trial_identifier(self, edfData, start_marker_string, end_marker_string):
+        return self.file(edfData).setTrialIdentifier(start_marker_string, end_marker_string)
+    def edf_get_start_trial_identifier(self, edfData):
+        return 0
+    def edf_get_end_trial_identifier(self, edfData):
+        return 0
+    def edf_jump_to_trial(self, edfData, trial):
+        f = self.file(edfData)
+        trial = argValue(trial)
+        if trial < 0 or trial >= len(f.trials):
+            return -1
+        f.trial = trial
+        f.position = f.trials[trial][0] - 1
+        return 0
+    def edf_get_trial_header(self, edfData, trial):
+        f = self.file(edfData)
+        if f.trial == None:
+            return -1
+        header = cast(trial, POINTER(TRIAL)).contents
+        start, end, startTime, endTime = f.trials[f.trial]
+        header.starttime = startTime
+        header.endtime = endTime
+        header.duration = endTime - startTime
+        return 0
+    def edf_goto_previous_trial(self, edfData):
+        f = self.file(edfData)
+        return self.edf_jump_to_trial(edfData, (f.trial if f.trial != None else len(f.trials)) - 1)
+    def edf_goto_next_trial(self, edfData):
+        f = self.file(edfData)
+        return self.edf_jump_to_trial(edfData, (f.trial if f.trial != None else -1) + 1)
+    def edf_goto_trial_with_start_time(self, edfData, start_time):
+        f = self.file(edfData)
+        matches = [i for i, trial in enumerate(f.trials) if trial[2] == argValue(start_time)]
+        return self.edf_jump_to_trial(edfData, matches[0]) if len(matches) > 0 else -1
+    def edf_goto_trial_with_end_time(self, edfData, end_time):
+        f = self.file(edfData)
+        matches = [i for i, trial in enumerate(f.trials) if trial[3] == argValue(end_time)]
+        return self.edf_jump_to_trial(edfData, matches[0]) if len(matches) > 0 else -1
+    def edf_set_bookmark(self, edfData, bookmark):
+        f = self.file(edfData)
+        mark = cast(bookmark, POINTER(BOOKMARK)).contents
+        mark.id = len(f.bookmarks) + 1
+        f.bookmarks[mark.id] = (f.position, f.trial)
+        return 0
+    def edf_free_bookmark(self, edfData, bookmark):
+        self.file(edfData).bookmarks.pop(cast(bookmark, POINTER(BOOKMARK)).contents.id, None)
+        return 0
+    def edf_goto_bookmark(self, edfData, bookmark):
+        f = self.file(edfData)
+        mark = cast(bookmark, POINTER(BOOKMARK)).contents
+        if mark.id not in f.bookmarks:
+            return -1
+        f.position, f.trial = f.bookmarks[mark.id]
+        return 0
+
+def argValue(value):
+    """
+    Get the python value of an argument that may be passed as a ctypes object, e.g. c_int(1).
+    """
+    return getattr(value, 'value', value)
@@ -27,10 +27,12 @@
 This code wraps the functions and structures defined in the EDFACCESS API C-based DLL into a python format.
 To utilize the code one must first install the EyeLink Developers Kit:https://www.sr-research.com/support/thread-13.html
 Once installed full documentation of the EDFACCESS API functions and structures can be found in the EDF Access C API user manual.pdf packaged with the API.
+The wrapper can also use any other backend that implements the functions of EDFAPIBackend, such as the simulated API of
+EDFACCESSsynthetic that runs without the EyeLink Developers Kit.
 '''
 try:
     from ctypes import *
-    import os, sys, platform, struct
+    import os, sys, platform, struct, threading
     import numpy as np
 except ModuleNotFoundError as e:
     raise ModuleNotFoundError('\n\nIt looks like you have ' + str(e) + ' installed. Please install the following modules for this code to run: '+ str(e) + '\n')
@@ -44,6 +46,8 @@ except:
 edfFilename = None      # placeholder for edf filename
 MISSING_VALUE = -32768  # missing data type
 MISSING_TEXT = '.'      # missing data type
+BACKEND_VARIABLE = 'EDFAPI_BACKEND'     # environment variable choosing the backend when none is given, see EDFACCESSwrapper.loadAPI()
+SYNTHETIC_BACKEND = 'synthetic'         # backend name of the simulated API of EDFACCESSsynthetic
 
 ##-----------------------------------------------------
 ## EDFAPI data types - Do not alter
@@ -134,6 +138,17 @@ class RECORDINGS(Structure):
         ('posType', c_byte),
         ('eye', c_byte) ]
 
+class TRIAL(Structure):
+    '''
+    A structure for storing the EDFaccess API's TRIAL Structure
+    This data is filled by edf_get_trial_header() for the current trial
+    '''
+    _fields_=[
+        ('rec', POINTER(RECORDINGS)),  # recording information of the trial
+        ('duration', c_uint32),        # duration of the trial
+        ('starttime', c_uint32),       # start time of the trial
+        ('endtime', c_uint32)]         # end time of the trial
+
 class IMESSAGE(Structure):
     '''
     A structure for storing the EDFaccess API's IMESSAGE Structure
@@ -242,18 +257,198 @@ class ALLF_DATA(Union):
         ('RECORDINGS',RECORDINGS)]
 
 ##--------------------------------------------------------------------------------------------------------------------------------
+## NumPy mirrors of the EDFACCESS data structures
+##--------------------------------------------------------------------------------------------------------------------------------
+# These dtypes share the memory layout of the ctypes structures above, so raw structures can be copied into a numpy
+# array with ctypes.memmove and decoded in bulk with vectorized field views.
+GAZEDATAtype = np.dtype([
+    ('left',np.float32),
+    ('right',np.float32)
+    ], align=True)
+
+HDATAtype = np.dtype([
+    ('targetX',np.int16),
+    ('targetY',np.int16),
+    ('targetDist',np.int16),
+    ('targetFlags',np.int16),
+    ('hdata5',np.int16),
+    ('hdata6',np.int16),
+    ('hdata7',np.int16),
+    ('hdata8',np.int16)
+    ], align=True)
+
+FSAMPLEtype = np.dtype([
+    ('time',np.uint32),
+    ('px',GAZEDATAtype),
+    ('py',GAZEDATAtype),
+    ('hx',GAZEDATAtype),
+    ('hY',GAZEDATAtype),
+    ('pa',GAZEDATAtype),
+    ('gx',GAZEDATAtype),
+    ('gy',GAZEDATAtype),
+    ('rx',np.float32),
+    ('ry',np.float32),
+    ('gxvel',GAZEDATAtype),
+    ('gyvel',GAZEDATAtype),
+    ('hxvel',GAZEDATAtype),
+    ('hyvel',GAZEDATAtype),
+    ('rxvel',GAZEDATAtype),
+    ('ryvel',GAZEDATAtype),
+    ('fgxvel',GAZEDATAtype),
+    ('fgyvel',GAZEDATAtype),
+    ('fhxvel',GAZEDATAtype),
+    ('fhyvel',GAZEDATAtype),
+    ('frxvel',GAZEDATAtype),
+    ('fryvel',GAZEDATAtype),
+    ('hdata',HDATAtype),
+    ('flags',np.uint16),
+    ('inputs',np.uint16),
+    ('buttons',np.uint16),
+    ('htype',np.int16),
+    ('errors',np.uint16)
+    ], align=True)
+
+FEVENTtype = np.dtype([
+    ('time',np.uint32),
+    ('etype',np.int16),
+    ('read',np.uint16),
+    ('sttime',np.uint32),
+    ('entime',np.uint32),
+    ('hstx',np.float32),
+    ('hsty',np.float32),
+    ('gstx',np.float32),
+    ('gsty',np.float32),
+    ('sta',np.float32),
+    ('henx',np.float32),
+    ('heny',np.float32),
+    ('genx',np.float32),
+    ('geny',np.float32),
+    ('ena',np.float32),
+    ('havx',np.float32),
+    ('havy',np.float32),
+    ('gavx',np.float32),
+    ('gavy',np.float32),
+    ('ava',np.float32),
+    ('avel',np.float32),
+    ('pvel',np.float32),
+    ('svel',np.float32),
+    ('evel',np.float32),
+    ('supd_x',np.float32),
+    ('eupd_x',np.float32),
+    ('supd_y',np.float32),
+    ('eupd_y',np.float32),
+    ('eye',np.int16),
+    ('status',np.uint16),
+    ('flags',np.uint16),
+    ('input',np.uint16),
+    ('buttons',np.uint16),
+    ('parsedby',np.uint16),
+    ('message',np.uintp)                # address of the LSTRING message, 0 if the event has no message
+    ], align=True)
+
+if FSAMPLEtype.itemsize != sizeof(FSAMPLE):
+    raise ImportError('FSAMPLEtype does not match the layout of the FSAMPLE structure')
+if FEVENTtype.itemsize != sizeof(FEVENT):
+    raise ImportError('FEVENTtype does not match the layout of the FEVENT structure')
+
+##--------------------------------------------------------------------------------------------------------------------------------
+## EDF file handle
+##--------------------------------------------------------------------------------------------------------------------------------
+class EDFfile:
+    '''
+    A handle to one open EDF file. The handle owns its EDFFILE pointer and error code, so any number of files can be open at
+    once, each from its own thread. It can be passed to every EDFACCESSwrapper function in place of the raw pointer (ctypes
+    reads the pointer from _as_parameter_) and closes the file it opened when it is used as a context manager:
+        with wrapper.openFile('test.edf') as edfData:
+            wrapper.edf_get_trial_count(edfData)
+    Create handles with EDFACCESSwrapper.openFile().
+    '''
+    def __init__(self, wrapper, edfFilename, consistency=2, loadevents=1, loadsamples=1):
+        self.wrapper = wrapper                  # the EDFACCESSwrapper that loaded the API
+        self.filename = edfFilename             # the path/filename of the EDF
+        self.err = c_int(0)                     # error code reported by edf_open_file for this file
+        self.closeLock = threading.Lock()       # makes close() safe to call from several threads
+        self.pointer = wrapper.EDFlib.edf_open_file(edfFilename.encode('utf-8'), c_int(consistency), c_int(loadevents), c_int(loadsamples), byref(self.err))
+        if self.pointer == None:
+            raise RuntimeError('EDF File could not be opened. EDF API errval= ' + str(self.err.value) + ' Please contact support@sr-research.com')
+    @property
+    def _as_parameter_(self):
+        # the EDFFILE pointer used by ctypes when the handle is passed to a C function
+        if self.pointer == None:
+            raise ValueError('I/O operation on closed EDF file ' + str(self.filename))
+        return self.pointer
+    @property
+    def closed(self):
+        return self.pointer == None
+    def trialCount(self):
+        '''
+        Returns the number of trials in the EDF file.
+        '''
+        return self.wrapper.EDFlib.edf_get_trial_count(self)
+    def elementCount(self):
+        '''
+        Returns the number of elements in the EDF file.
+        '''
+        return self.wrapper.EDFlib.edf_get_element_count(self)
+    def close(self):
+        '''
+        Close the EDF file and release its resources. Closing a handle more than once has no effect.
+        Returns:
+            Returns 0 if the operation is successful.
+        '''
+        with self.closeLock:
+            if self.pointer == None:
+                return 0
+            pointer, self.pointer = self.pointer, None
+            result = self.wrapper.EDFlib.edf_close_file(pointer)
+        if result != 0:
+            raise RuntimeError('Could not close EDF file ' + str(self.filename))
+        return result
+    def __enter__(self):
+        return self
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+##--------------------------------------------------------------------------------------------------------------------------------
+## EDFACCESS API backends
+##--------------------------------------------------------------------------------------------------------------------------------
+class EDFAPIBackend:
+    '''
+    The functions of the EDFACCESS API that EDFACCESSwrapper and EDF2numpy call. The EDFACCESS CDLL is one backend, any object
+    with these functions can be passed to EDFACCESSwrapper(backend=...) in its place.
+    The functions take and return the same values as the C functions: edfData is the handle returned by edf_open_file(), which
+    may arrive wrapped in an EDFfile (see its _as_parameter_), and the structures are passed as ctypes pointers. Besides the C
+    functions a backend has edf_get_float_data_address(edfData), which returns the address of the ALLF_DATA of the current
+    element. A backend must have every function of EDFAPIBackend.functions, loadBackend() checks this before the backend is
+    used, see EDFACCESSsynthetic.SyntheticEDFAPI.
+    '''
+    functions = ['edf_open_file', 'edf_close_file', 'edf_get_preamble_text', 'edf_get_preamble_text_length', 'edf_get_element_count',
+        'edf_get_trial_count', 'edf_get_next_data', 'edf_get_float_data', 'edf_get_float_data_address', 'edf_set_trial_identifier',
+        'edf_get_start_trial_identifier', 'edf_get_end_trial_identifier', 'edf_jump_to_trial', 'edf_get_trial_header',
+        'edf_goto_previous_trial', 'edf_goto_next_trial', 'edf_goto_trial_with_start_time', 'edf_goto_trial_with_end_time',
+        'edf_set_bookmark', 'edf_free_bookmark', 'edf_goto_bookmark']
+##--------------------------------------------------------------------------------------------------------------------------------
 ## EDFACCESS API functions
 ##--------------------------------------------------------------------------------------------------------------------------------
 class EDFACCESSwrapper:
     '''
     A class to wrap all of the functions from the EDFaccess API
+    Parameters:
+        backend = None to load the EDFACCESS CDLL of the EyeLink Developers Kit, the path of an EDFACCESS library to load instead,
+            'synthetic' for the simulated API of EDFACCESSsynthetic, or an EDFAPIBackend object. When None the environment
+            variable EDFAPI_BACKEND can give the path or 'synthetic'.
+        verbose = True to print how the API is loaded, the preamble text and the trial count. Errors are printed regardless.
     '''
-    def __init__(self):
+    def __init__(self, backend=None, verbose=False):
+        self.verbose = verbose #print the status lines of the wrapper
         self.EDFlib = None #placeholder for CDLL once imported
         self.err = c_int(0) #store error data
         self.errmsg = None
-        self.EDFData = None #place holder for the pointer used for the EDFfile once imported
-        self.loadAPI() # Load CDLL
+        self.EDFData = None #pointer of the EDF file most recently opened with edf_open_file, kept for older scripts. The wrapper functions only use the handle passed to them
+        self.EDFfloatAddress = None #edf_get_float_data bound to return the raw address of the data
+        if backend == None:
+            backend = os.environ.get(BACKEND_VARIABLE) or None
+        self.loadAPI(backend) # Load CDLL
     def checkAPI(self):
         '''
         Attempt to find API files and return correct location if found
@@ -262,7 +457,8 @@ class EDFACCESSwrapper:
         '''
         try:
             shared_lib_path = 0
-            print('...Determining Environment...')
+            if self.verbose:
+                print('...Determining Environment...')
             if sys.platform.startswith('win32'):                                             #if windows
                 msg = 'Windows with '
                 windowsEDKpath = os.path.join(os.environ['ProgramFiles(x86)'], 'SR Research','EyeLink')
@@ -274,7 +470,8 @@ class EDFACCESSwrapper:
                         msg = msg + 'python x64 detected'
                         if os.path.exists(libpathx64):
                             shared_lib_path = os.path.join(libpathx64,'edfapi64.dll')
-                            print(msg)
+                            if self.verbose:
+                                print(msg)
                             return shared_lib_path
                         else:
                             raise RuntimeError('We could not find an installation of the EyeLink Developers Kit on your system.\nExpected directory: ' + str(windowsEDKpath) + '.\nPlease make sure that you have the EyeLink Developers Kit installed')
@@ -282,14 +479,16 @@ class EDFACCESSwrapper:
                         msg = msg + 'python x86 detected'
                         if os.path.exists(libpathx86):
                             shared_lib_path = os.path.join(libpathx86,'edfapi.dll')
-                            print(msg)
+                            if self.verbose:
+                                print(msg)
                             return shared_lib_path
                         else:
                             raise RuntimeError('We could not find an installation of the EyeLink Developers Kit on your system.\nExpected directory: ' + str(windowsEDKpath) + '.\nPlease make sure that you have the EyeLink Developers Kit installed')
                 else:
                     self.errmsg = 'We could not find an installation of the EyeLink Developers Kit on your system.\nExpected directory: ' + str(windowsEDKpath) + '.\nPlease make sure that you have the EyeLink Developers Kit installed'
             elif sys.platform.startswith('darwin'):        # if macOS
-                print('macOS detected')
+                if self.verbose:
+                    print('macOS detected')
                 macOSEDKpath = os.sep + os.path.join('Library','Frameworks','edfapi.framework')
                 if os.path.exists(macOSEDKpath):
                             shared_lib_path = os.path.join(macOSEDKpath,'edfapi')
@@ -297,7 +496,8 @@ class EDFACCESSwrapper:
                 else:
                     raise RuntimeError('We could not find an installation of the EyeLink Developers Kit on your system.\nExpected directory: ' + str(macOSEDKpath) + '.\nPlease make sure that you have the EyeLink Developers Kit installed')
             elif sys.platform.startswith('linux'):         # if Linux
-                print('Linux detected')
+                if self.verbose:
+                    print('Linux detected')
                 LinuxEDKpath = os.sep + os.path.join('usr','lib','x86_64-linux-gnu')
                 if os.path.exists(LinuxEDKpath):
                             shared_lib_path = os.path.join(LinuxEDKpath,'libedfapi.so')
@@ -310,17 +510,27 @@ class EDFACCESSwrapper:
             print('An error has occurred in the CheckAPI function: '+ str(e))
         except:
             raise Exception('Unhandled exception with checkAPI function')
-    def loadAPI(self):
+    def loadAPI(self, backend=None):
         '''
         Attempt to load the CDLL from the default EyeLink Developers Kit location
+        Parameters:
+            backend = the path of the CDLL to load instead, 'synthetic' or an EDFAPIBackend object, see EDFACCESSwrapper
         '''
         libpath = None
+        # a backend that is missing functions raises here, when the wrapper is created
+        if backend != None and not isinstance(backend, str):
+            return self.loadBackend(backend)
+        if backend == SYNTHETIC_BACKEND:
+            from EDFACCESSsynthetic import SyntheticEDFAPI
+            return self.loadBackend(SyntheticEDFAPI())
         try:
-            lib_path = self.checkAPI()
+            lib_path = backend if backend != None else self.checkAPI()
             if lib_path != None:
-                print('...Attempting to load EDFAPI from ' + lib_path + ' ...')
+                if self.verbose:
+                    print('...Attempting to load EDFAPI from ' + lib_path + ' ...')
                 self.EDFlib = CDLL(lib_path)
-                print('Successfully loaded API from '+ lib_path)
+                if self.verbose:
+                    print('Successfully loaded API from '+ lib_path)
                 if not self.EDFlib == None:
                     ##-------------------------------------------------------------------------------
                     ##C binds
@@ -349,6 +559,10 @@ class EDFACCESSwrapper:
                     #edf_get_float_data
                     self.EDFlib.edf_get_float_data.restype=POINTER(ALLF_DATA)
                     self.EDFlib.edf_get_float_data.argtypes=[c_void_p]
+                    #edf_get_float_data returning the address of the data instead of a ctypes structure
+                    self.EDFfloatAddress = self.EDFlib['edf_get_float_data']
+                    self.EDFfloatAddress.restype=c_void_p
+                    self.EDFfloatAddress.argtypes=[c_void_p]
                     #edf_set_trial_identifier
                     self.EDFlib.edf_set_trial_identifier.restype=c_int
                     self.EDFlib.edf_set_trial_identifier.argtypes=[c_void_p, c_char_p, c_char_p]
@@ -363,7 +577,7 @@ class EDFACCESSwrapper:
                     self.EDFlib.edf_jump_to_trial.argtypes=[c_void_p, c_int]
                     #edf_get_trial_header
                     self.EDFlib.edf_get_trial_header.restype=c_int
-                    self.EDFlib.edf_get_trial_header.argtypes=[c_void_p, c_int]
+                    self.EDFlib.edf_get_trial_header.argtypes=[c_void_p, c_void_p]
                     #edf_goto_previous_trial
                     self.EDFlib.edf_goto_previous_trial.restype=c_int
                     self.EDFlib.edf_goto_previous_trial.argtypes=[c_void_p]
@@ -394,6 +608,22 @@ class EDFACCESSwrapper:
             print('An error has occurred in the LoadAPI function: '+ str(e))
         except:
             raise Exception('Unhandled exception with LoadAPI function')
+    def loadBackend(self, backend):
+        '''
+        Use a python implementation of the EDFACCESS API in place of the CDLL.
+        Parameters:
+            backend = an object with the functions of EDFAPIBackend, e.g. EDFACCESSsynthetic.SyntheticEDFAPI()
+        Returns:
+            The backend
+        '''
+        missing = [i for i in EDFAPIBackend.functions if not callable(getattr(backend, i, None))]
+        if len(missing) > 0:
+            raise RuntimeError('The EDFACCESS backend ' + type(backend).__name__ + ' is missing: ' + ', '.join(missing))
+        self.EDFlib = backend
+        self.EDFfloatAddress = backend.edf_get_float_data_address
+        if self.verbose:
+            print('Using the ' + type(backend).__name__ + ' EDFACCESS backend')
+        return self.EDFlib
 ##--------------------------------------------------------------------------------------------------------------------------------
 ## EDF Data Access Functions
 ##--------------------------------------------------------------------------------------------------------------------------------
@@ -410,14 +640,36 @@ class EDFACCESSwrapper:
             if successful a pointer to EDFFILE structure is returned. Otherwise NULL is returned.
         '''
         try:
-            self.EDFData = self.EDFlib.edf_open_file(edfFilename.encode('utf-8'), c_int(consistency), c_int(loadevents), c_int(loadsamples),self.err)
-            if self.EDFData == None:
-                raise RuntimeError('EDF File could not be opened. EDF API errval= ' + str(self.err.value) + ' Please contact support@sr-research.com') 
-            return self.EDFData
+            # a new error code for each call so that files opened at the same time do not share it
+            err = c_int(0)
+            edfData = self.EDFlib.edf_open_file(edfFilename.encode('utf-8'), c_int(consistency), c_int(loadevents), c_int(loadsamples),byref(err))
+            self.err = err
+            if edfData == None:
+                raise RuntimeError('EDF File could not be opened. EDF API errval= ' + str(err.value) + ' Please contact support@sr-research.com') 
+            self.EDFData = edfData
+            return edfData
         except Exception as e:
             print('An error has occurred in the edf_open_file function: '+ str(e))
         except:
             raise Exception('Unhandled exception with edf_open_file function')
+    def openFile(self, edfFilename, consistency=2, loadevents=1, loadsamples=1):
+        '''
+        Opens the EDF file passed in by edfFilename and returns an EDFfile handle that owns the pointer to it. Unlike
+        edf_open_file() this raises an exception if the file cannot be opened.
+        Parameters:
+            edfFilename = name of the EDF file to be opened.
+            consistency  = consistency check control, see edf_open_file().
+            loadevents  = load/skip loading events 0, do not load events. 1, load events.
+            loadsamples  = load/skip loading of samples 0, do not load samples. 1, load samples.
+        Returns:
+            An EDFfile handle. Use it as a context manager or call its close() function when you are done with the file.
+        '''
+        try:
+            return EDFfile(self, edfFilename, consistency, loadevents, loadsamples)
+        except Exception as e:
+            raise Exception('An error has occurred in the openFile function: '+ str(e))
+        except:
+            raise Exception('Unhandled exception with openFile function')
     def edf_close_file(self, edfData):
         '''
         Closes an EDF file pointed to by the given EDFFILE pointer and releases all of the resources (memory and physical file) related to this EDF file.
@@ -427,7 +679,9 @@ class EDFACCESSwrapper:
             Returns 0 if the operation is successful.
         '''
         try:
-            result = self.EDFlib.edf_close_file(self.EDFData)
+            if isinstance(edfData, EDFfile):
+                return edfData.close()
+            result = self.EDFlib.edf_close_file(edfData)
             if result != 0:
                 raise RuntimeError('Could not close EDF file')
             return result
@@ -444,7 +698,7 @@ class EDFACCESSwrapper:
             An integer for the length of preamble text
         '''
         try:
-            EDFpreambleLength = self.EDFlib.edf_get_preamble_text_length(self.EDFData)
+            EDFpreambleLength = self.EDFlib.edf_get_preamble_text_length(edfData)
             return EDFpreambleLength
         except Exception as e:
             print('An error has occurred in the edf_get_preamble_text_length function: '+ str(e))
@@ -462,12 +716,14 @@ class EDFACCESSwrapper:
         '''
         try:
             preamble = create_string_buffer(1024)
-            EDFpreamble = self.EDFlib.edf_get_preamble_text(self.EDFData, preamble, c_int(length))
+            EDFpreamble = self.EDFlib.edf_get_preamble_text(edfData, preamble, c_int(length))
             preamble = str(preamble.value.decode()).strip()
             if len(str(preamble).strip()) >= 0:
-                print('Preamble Text:\n####################\n' + str(preamble) + '\n####################')
+                if self.verbose:
+                    print('Preamble Text:\n####################\n' + str(preamble) + '\n####################')
             else:
-                print('Preamble Text Empty')
+                if self.verbose:
+                    print('Preamble Text Empty')
             return preamble
         except Exception as e:
             print('An error has occurred in the edf_get_preamble_text function: '+ str(e))
@@ -483,7 +739,8 @@ class EDFACCESSwrapper:
         '''
         try:
             trialCount = self.EDFlib.edf_get_trial_count(edfData)
-            print(str(int(trialCount/2)) + " trials detected.")
+            if self.verbose:
+                print(str(int(trialCount/2)) + " trials detected.")
             return trialCount
         except Exception as e:
             print('An error has occurred in the edf_get_trial_count function: '+ str(e))
@@ -556,6 +813,58 @@ class EDFACCESSwrapper:
             print('An error has occurred in the edf_get_float_data function: '+ str(e))
         except:
             raise Exception('Unhandled exception with edf_get_float_data function')
+    def edf_get_float_data_address(self, edfData):
+        '''
+        Returns the address of the float data with the type returned by edf_get_next_data(). Unlike edf_get_float_data() no
+        ctypes structure is created, so the data can be copied in bulk with ctypes.memmove.
+        Parameters:
+            edfData = a valid pointer to EDFFILE structure. This handle should be created by calling edf_open_file().
+        Returns:
+            Returns the address of the ALLF_DATA structure as an integer.
+        '''
+        try:
+            EDFaddress = self.EDFfloatAddress(edfData)
+            return EDFaddress
+        except Exception as e:
+            print('An error has occurred in the edf_get_float_data_address function: '+ str(e))
+        except:
+            raise Exception('Unhandled exception with edf_get_float_data_address function')
+    def iterElements(self, edfData, elementTypes=None):
+        '''
+        Generator that steps through the data elements of the EDF file pointed to by edfData with as little Python overhead
+        as possible. The C functions are bound to local names once, so each element costs one call to edf_get_next_data()
+        and, for the elements that are yielded, one call to edf_get_float_data() that returns the raw address of the data.
+        Use ALLF_DATA.from_address() or ctypes.memmove to access the contents of an element.
+        Parameters:
+            edfData = a valid pointer to EDFFILE structure. This handle should be created by calling edf_open_file().
+            elementTypes = optional set of element types (see edf_get_next_data()) to yield. Elements of any other type are
+                skipped without reading their data.
+        Yields:
+            (element type, address of the ALLF_DATA structure) for each element until NO_PENDING_ITEMS is reached.
+        '''
+        try:
+            # bind the C functions locally to avoid the attribute lookups for every element
+            getNextData = self.EDFlib.edf_get_next_data
+            getFloatAddress = self.EDFfloatAddress
+            # pass the raw pointer of an EDFfile handle so ctypes does not look it up for every call
+            edfData = getattr(edfData, '_as_parameter_', edfData)
+            if elementTypes == None:
+                while True:
+                    elementType = getNextData(edfData)
+                    if elementType == NO_PENDING_ITEMS:
+                        return
+                    yield elementType, getFloatAddress(edfData)
+            else:
+                elementTypes = frozenset(elementTypes)
+                while True:
+                    elementType = getNextData(edfData)
+                    if elementType == NO_PENDING_ITEMS:
+                        return
+                    if elementType in elementTypes:
+                        yield elementType, getFloatAddress(edfData)
+        except Exception as e:
+            # only Exception is caught so that closing the generator early still works
+            raise Exception('An error has occurred in the iterElements function: '+ str(e))
 ##--------------------------------------------------------------------------------------------------------------------------------
 ## Trial Related Functions
 ##--------------------------------------------------------------------------------------------------------------------------------
@@ -742,7 +1051,7 @@ class EDFACCESSwrapper:
             Returns 0 if the operation is successful.
         '''
         try:
-            result = self.EDFlib.edf_free_bookmark(self,edfData, bookmark)
+            result = self.EDFlib.edf_free_bookmark(edfData, bookmark)
             return result
         except Exception as e:
             print('An error has occurred in the edf_free_bookmark function: '+ str(e))
@@ -29,6 +29,7 @@ To utilize the code one must first install the EyeLink Developers Kit:https://ww
 import os, sys
 from EDFACCESSwrapper import *
 from EDF2numpy import *
+from EDF2numpyCache import EDF2numpyCache
 
 def main(inputs):
     errmsg = None
@@ -53,7 +54,11 @@ def main(inputs):
                     EDFI.consumeInputArgs(inputs)
                 if os.path.isfile(edfFilename):
                     #read in contents of EDF file
-                    EDFfileData = EDFI.readEDF(edfFilename)
+                    if EDFI.options['cache_enabled'] == 1:
+                        # load the arrays of an earlier conversion with the same options, or convert and store them
+                        EDFfileData = EDF2numpyCache().readEDF(EDFI, edfFilename)
+                    else:
+                        EDFfileData = EDFI.readEDF(edfFilename)
                     print('Your data has been added to a numpyarray: [HEADERdata,RECORDINGdata,MESSAGEdata,SAMPLEdata,EVENTdata,IOEVENTdata]')
                     if EDFfileData[0] is None:
                         print('\tHEADERdata: 0 records;')
@@ -138,6 +143,18 @@ if __name__ == '__main__':
             + '\t\toutput_data_pupilsize:1\t\t[0=Pupil Data disabled;\t\t\t1=Pupil Data enabled]\n'
             + '\t\toutput_data_debugflags:0\t[0=Flag Data disabled;\t\t\t1=Flag Data enabled]\n'
             + '\t\toutput_dataviewer_commands:1\t[0=Mask DV commands from output;\t1=Include DV commands in output]\n'
+            + '\t\tsingle_pass_enabled:1\t\t[0=Open the EDF twice;\t\t\t1=Open the EDF once and rewind]\n'
+            + '\t\tmemmap_output_dir:\t\t[empty=Keep samples and events in memory;\ta directory=Write SAMPLES.npy and EVENTS.npy there]\n'
+            + '\t\tcompact_messages_enabled:0\t[0=Fixed-width message column;\t\t1=Message text in one UTF-8 heap]\n'
+            + '\t\toutput_columns:\t\t\t[empty=All sample and event columns;\tnames separated by spaces=Only these columns]\n'
+            + '\t\tcategorical_columns_enabled:0\t[0=Text label columns;\t\t\t1=Integer coded label columns]\n'
+            + '\t\tbinary_debug_enabled:0\t\t[0=Text debug file;\t\t\t1=Binary debug file (recommended), see debugToText()]\n'
+            + '\t\tprogress_enabled:0\t\t[0=Quiet;\t\t\t\t1=Print the phases and progress of each read]\n'
+            + '\t\tverbose_enabled:0\t\t[0=Quiet;\t\t\t\t1=Print the status lines and preamble of each read]\n'
+            + '\t\tprofile_enabled:0\t\t[0=No profiling;\t\t\t1=Time each element type, write <EDF name>.trace.json]\n'
+            + '\t\tcapture_enabled:0\t\t[0=Read the EDF with the EDF Access API;\t1=Keep a capture next to the EDF and convert from it]\n'
+            + '\t\tindex_enabled:0\t\t\t[0=Count the records on every read;\t1=Keep a sidecar index next to the EDF]\n'
+            + '\t\tcache_enabled:0\t\t\t[0=Always convert the EDF;\t\t1=Reuse cached conversions]\n'
             + '\t\trecinfo_enabled:1\t\t[0=Recording info disabled;\t\t1=recording info Enabled]\n'
             + '\t\tenable_consistency_check:2\t[0=consistency check disabled;\t\t1=enable consistency check and report;\n\t\t\t\t\t\t2=enable consistency check and fix]\n'
             + '\t\tenable_failsafe:0\t\t[0=fail-safe mode disabled;\t\t1=fail-safe enabled]\n'